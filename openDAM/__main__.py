@@ -1,17 +1,175 @@
 import sys
 import os
+import functools
+import multiprocessing
 
 from argparse import ArgumentParser
 
 # Relative import fixes
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from openDAM.model.pun_dam_model import PUN_DAM
+from openDAM.model import decomposition
 from openDAM.model.dam import *
 from openDAM.dataio import dam_db_loader
 from openDAM.dataio import dam_results_csv
+from openDAM.dataio import dam_results_db
+from openDAM.dataio import dam_archive
 
+## Function collecting the results of a day for each results format, see the --results argument.
+RESULTS_FORMATS = dict(csv=dam_results_csv.results_lines, sqlite=dam_results_db.results_rows,
+                       parquet=dam_results_db.results_rows)
 
-def run(path, database, case_list, log_level, pun_strategy):
+
+def set_solver_threads(threads):
+    """
+    Limit the number of threads used by the solver for one day.
+
+    :param threads: maximum number of threads, 0 to let the solver decide.
+    """
+    if threads > 0 and options.SOLVER_NAME == 'cplex':
+        options.SOLVER.options["threads"] = threads
+
+
+def day_results(dam, formats=('csv',)):
+    """
+    :param dam: a solved DAM object.
+    :param formats: results formats, keys of :py:data:`RESULTS_FORMATS`.
+    :return: dict results format -> results of the day in this format.
+    """
+    collected = {}
+    results = {}
+    for f in formats:
+        collect = RESULTS_FORMATS[f]
+        if collect not in collected:
+            collected[collect] = collect(dam)
+        results[f] = collected[collect]
+    return results
+
+
+def results_writer(results_format, path, database, run):
+    """
+    :param results_format: a key of :py:data:`RESULTS_FORMATS`.
+    :param path: path to the database file, under which the results are written.
+    :param database: database file, which also receives the results in the sqlite format.
+    :param run: id of the run in the typed results tables.
+    :return: the writer of the results in this format.
+    """
+    if results_format == 'csv':
+        return dam_results_csv.CSV_writer(path)
+    elif results_format == 'sqlite':
+        return dam_results_db.SQLiteResultsWriter('%s/%s' % (path, database), run)
+    else:
+        return dam_results_db.ParquetResultsWriter('%s/results_parquet' % path, run)
+
+
+def create_loader(path, database, snapshots=None, archive=None):
+    """
+    :param path: path to the database file.
+    :param database: database file.
+    :param snapshots: folder of the snapshots of the days, see :py:class:`day_snapshot.SnapshotCache`.
+    :param archive: folder of a columnar archive under path, see :py:mod:`dam_archive`, read instead of the database
+        if not None.
+    :return: the loader of the days.
+    """
+    if archive is not None:
+        return dam_archive.ArchiveLoader('%s/%s' % (path, archive))
+    return dam_db_loader.Loader(path, database, snapshots)
+
+
+def solve_day(dam, pun_strategy, verbose):
+    """
+    Solve a day whose model is created. PUN days are solved again with looser tolerances if they fail.
+
+    :param dam: a DAM object.
+    :param pun_strategy: Defines the solution strategy used when there is PUN
+    :param verbose: solver verbosity for non PUN days.
+    """
+    if isinstance(dam, PUN_DAM):
+        try:
+            options.SOLVER.options["simplex tolerances optimality"] = 1e-9
+            options.SOLVER.options["simplex tolerances feasibility"] = 1e-9
+            dam.solve(VERBOSE=True, strategy=pun_strategy)
+        except:
+            print("Could not solve %d, loosening tolerances" % dam.day_id)
+            options.SOLVER.options["simplex tolerances optimality"] = 1e-6
+            options.SOLVER.options["simplex tolerances feasibility"] = 1e-6
+            dam.solve(VERBOSE=True, strategy=pun_strategy)
+    else:
+        dam.solve(VERBOSE=verbose)
+
+
+def create_and_solve_day(dam, pun_strategy, verbose):
+    """
+    Create the model of a day, or of a sub-market of a day, and solve it, see :py:func:`solve_day`.
+    """
+    dam.create_model()
+    solve_day(dam, pun_strategy, verbose)
+
+
+def clear_day(loader, case, pun_strategy, verbose, formats=('csv',), decompose=False, pool=None):
+    """
+    Clear one day.
+
+    :param loader: a :py:class:`dam_db_loader.Loader`.
+    :param case: day id.
+    :param pun_strategy: Defines the solution strategy used when there is PUN
+    :param verbose: solver verbosity for non PUN days.
+    :param formats: results formats, keys of :py:data:`RESULTS_FORMATS`.
+    :param decompose: True to clear the independent sub-markets of the day separately, see
+        :py:func:`decomposition.clear`.
+    :param pool: multiprocessing pool in which the sub-markets are cleared, None to clear them in this process.
+    :return: the results of the day, as returned by :py:func:`day_results`, or None if the day could not be solved.
+    """
+    dam = loader.read_day(case)
+    if not decompose:
+        dam.create_model()
+    try:
+        if decompose:
+            decomposition.clear(dam, functools.partial(create_and_solve_day, pun_strategy=pun_strategy,
+                                                       verbose=verbose), pool)
+        else:
+            solve_day(dam, pun_strategy, verbose)
+        if isinstance(dam, PUN_DAM) or (options.PRIMAL and options.DUAL):
+            return day_results(dam, formats)
+    except:
+        print("Could not solve %d" % case)
+    return None
+
+
+# State of a worker process of the pool, see _init_worker.
+_worker = {}
+
+
+def _init_solver_worker(log_level, threads, backend, artifacts, window_search):
+    """
+    Give a worker process the solver settings of the run.
+    """
+    options.BACKEND = backend
+    options.ARTIFACT_CACHE = artifacts
+    options.PUN_WINDOW_SEARCH = window_search
+    logging.basicConfig(level=getattr(logging, log_level))
+    set_solver_threads(threads)
+
+
+def _init_worker(path, database, log_level, threads, pun_strategy, backend, formats, snapshots, archive, artifacts,
+                 window_search):
+    """
+    Give each worker process its own database connection and solver settings.
+    """
+    _init_solver_worker(log_level, threads, backend, artifacts, window_search)
+    num_log_level = getattr(logging, log_level)
+    _worker['loader'] = create_loader(path, database, snapshots, archive)
+    _worker['pun_strategy'] = pun_strategy
+    _worker['verbose'] = num_log_level <= logging.DEBUG
+    _worker['formats'] = formats
+
+
+def _clear_day_in_worker(case):
+    return clear_day(_worker['loader'], case, _worker['pun_strategy'], _worker['verbose'], _worker['formats'])
+
+
+def run(path, database, case_list, log_level, pun_strategy, jobs=1, threads=0, backend=None, results=('csv',),
+        run_id=None, snapshots=None, archive=None, artifacts=None, decompose=False, window_search=None):
     """
     Run a series of cases
 
@@ -20,7 +178,31 @@ def run(path, database, case_list, log_level, pun_strategy):
     :param case_list: list of day ids to run, empty if all must be run
     :param log_level: textual log level.
     :param pun_strategy: Defines the solution strategy used when there is PUN
+    :param jobs: number of days cleared in parallel, each in its own process.
+    :param threads: maximum number of solver threads per day, 0 to let the solver decide, or to share the cores
+        between the jobs when jobs > 1.
+    :param backend: model backend of the days with complex orders, see options.BACKEND, None to keep the option.
+    :param results: results formats, keys of :py:data:`RESULTS_FORMATS`: CSV files, typed tables in the database, or
+        Parquet files.
+    :param run_id: id of the run in the typed results, see :py:func:`dam_results_db.run_id` for the default.
+    :param snapshots: folder of the snapshots of the days, see :py:class:`day_snapshot.SnapshotCache`, None to read
+        the days from the database only.
+    :param archive: folder of a columnar archive under path, see :py:mod:`dam_archive`, from which the days are read
+        instead of the database.
+    :param artifacts: folder of the cache of the artifacts of the resolution of the days, see options.ARTIFACT_CACHE,
+        None to keep the option.
+    :param decompose: True to clear the independent sub-markets of each day separately, see
+        :py:mod:`decomposition`. The days are then cleared one after the other, and the jobs processes clear their
+        sub-markets.
+    :param window_search: number of processes of the search of the PUN price window of the Advanced strategy, see
+        options.PUN_WINDOW_SEARCH, None to keep the option.
     """
+    if backend is not None:
+        options.BACKEND = backend
+    if artifacts is not None:
+        options.ARTIFACT_CACHE = artifacts
+    if window_search is not None:
+        options.PUN_WINDOW_SEARCH = window_search
 
     # Logging config
     num_log_level = getattr(logging, log_level, None)
@@ -29,35 +211,57 @@ def run(path, database, case_list, log_level, pun_strategy):
     logging.basicConfig(level=num_log_level)  # format='%(asctime)s %(message)s'
     VERBOSE = num_log_level <= logging.DEBUG
 
-    loader = dam_db_loader.Loader(path, database)
+    loader = create_loader(path, database, snapshots, archive)
     cases = case_list if case_list else loader.get_all_days()
-    writer = dam_results_csv.CSV_writer(path)
+    run_id = dam_results_db.run_id() if run_id is None else run_id
+    writers = dict((f, results_writer(f, path, database, run_id)) for f in results)
+
+    def write(day):
+        if day is not None:
+            for f, writer in writers.items():
+                writer.write(day[f])
 
     # Run
-    for case in cases:
-        dam = loader.read_day(case)
-        dam.create_model()
-        try:
-            if isinstance(dam, PUN_DAM):
-                try:
-                    options.SOLVER.options["simplex tolerances optimality"] = 1e-9
-                    options.SOLVER.options["simplex tolerances feasibility"] = 1e-9
-                    dam.solve(VERBOSE=True, strategy=pun_strategy)
-                except:
-                    print("Could not solve %d, loosening tolerances" % case)
-                    options.SOLVER.options["simplex tolerances optimality"] = 1e-6
-                    options.SOLVER.options["simplex tolerances feasibility"] = 1e-6
-                    dam.solve(VERBOSE=True, strategy=pun_strategy)
-                writer.update(dam)
+    try:
+        if decompose:
+            pool = None
+            if jobs > 1:
+                if threads <= 0:
+                    threads = max(1, multiprocessing.cpu_count() // jobs)
+                pool = multiprocessing.Pool(jobs, _init_solver_worker, (log_level, threads, options.BACKEND,
+                                                                        options.ARTIFACT_CACHE,
+                                                                        options.PUN_WINDOW_SEARCH))
             else:
-                dam.create_model()
-                dam.solve(VERBOSE=VERBOSE)
-                if options.PRIMAL and options.DUAL:
-                    writer.update(dam)
-        except:
-            print("Could not solve %d" % case)
-
-        writer.close_files()
+                set_solver_threads(threads)
+            try:
+                for case in cases:
+                    write(clear_day(loader, case, pun_strategy, VERBOSE, results, True, pool))
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+        elif jobs <= 1 or len(cases) <= 1:
+            set_solver_threads(threads)
+            for case in cases:
+                write(clear_day(loader, case, pun_strategy, VERBOSE, results))
+        else:
+            if loader.conn is not None:
+                loader.conn.close()
+            if threads <= 0:
+                threads = max(1, multiprocessing.cpu_count() // jobs)
+            pool = multiprocessing.Pool(jobs, _init_worker, (path, database, log_level, threads, pun_strategy,
+                                                          options.BACKEND, results, snapshots, archive,
+                                                          options.ARTIFACT_CACHE, options.PUN_WINDOW_SEARCH))
+            try:
+                # imap returns the results in the order of the cases, as soon as they are available.
+                for day in pool.imap(_clear_day_in_worker, cases):
+                    write(day)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        for writer in writers.values():
+            writer.close_files()
 
 
 if __name__ == "__main__":
@@ -74,6 +278,35 @@ if __name__ == "__main__":
     parser.add_argument("--log", help="Print more details.", default='INFO')
     parser.add_argument("--pun_strategy", help="How to solve the ", default='Advanced',
                         choices=['Simple', 'NEOS', 'Advanced'])
+    parser.add_argument("-j", "--jobs", type=int, help="Number of days cleared in parallel.", default=1)
+    parser.add_argument("--threads", type=int,
+                        help="Maximum number of solver threads per day, 0 for the solver default, or to share the "
+                             "cores between the jobs.", default=0)
+    parser.add_argument("--backend", help="Model backend of the days with complex orders: Pyomo, or a matrix model "
+                                          "solved with HiGHS.", default=None, choices=['pyomo', 'matrix'])
+    parser.add_argument("--results", nargs='+', help="Results formats: CSV files, typed tables in the database, "
+                                                     "or Parquet files under the results_parquet folder.",
+                        default=['csv'], choices=sorted(RESULTS_FORMATS))
+    parser.add_argument("--run_id", help="Id of the run in the typed results, the current time by default.",
+                        default=None)
+    parser.add_argument("--snapshots", help="Folder of binary snapshots of the days, created on the first read of "
+                                            "each day and refreshed when the database changes.", default=None)
+    parser.add_argument("--archive", help="Folder of a columnar archive under the folder of the --path argument, "
+                                          "created with dam_archive.py, from which the days are read instead of the "
+                                          "database.", default=None)
+    parser.add_argument("--artifacts", help="Folder of the cache of the model files, relaxed PUN prices, incumbents "
+                                            "and solutions of the days, reused by the runs that only differ by the "
+                                            "solver settings.", default=None)
+    parser.add_argument("--decompose", help="Clear the independent sub-markets of each day separately, e.g. the "
+                                            "periods not coupled by block or complex orders and the zones not "
+                                            "connected by lines, in the processes of the --jobs argument.",
+                        action="store_true")
+    parser.add_argument("--window_search", type=int,
+                        help="Number of processes solving candidate PUN price windows concurrently in the Advanced "
+                             "strategy, 1 to solve them one after the other, 0 to solve the single window around the "
+                             "relaxed PUN prices.", default=None)
     args = parser.parse_args()
 
-    run(args.path, args.database, [args.case] if not args.all else [], args.log.upper(), args.pun_strategy)
+    run(args.path, args.database, [args.case] if not args.all else [], args.log.upper(), args.pun_strategy,
+        args.jobs, args.threads, args.backend, args.results, args.run_id, args.snapshots, args.archive,
+        args.artifacts, args.decompose, args.window_search)
@@ -0,0 +1,95 @@
+"""
+Benchmark of the insertion of rows in the CURVE_DATA table at the scale of the GME data, about 700000 rows per day:
+row by row inserts committed per day, bulk inserts with :py:func:`create_dam_db_from_csv.bulk_insert`, with the
+index created before or after the load, with and without the pragmas of
+:py:func:`create_dam_db_from_csv.set_offline_pragmas`.
+
+Run from the master directory, e.g. ``python openDAM/benchmark/bulk_insert.py -p /tmp --days 2``.
+"""
+import sys
+import os
+import time
+import sqlite3
+
+from argparse import ArgumentParser
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from openDAM.dataio.create_dam_db_from_csv import create_tables, create_indexes, get_col_names, bulk_insert, \
+    set_offline_pragmas
+
+TABLE = 'CURVE_DATA'
+
+
+def curve_data(n_days, rows_per_day, seed):
+    """
+    Generate the rows of step curves of rows_per_day points per day, 200 points per curve.
+    """
+    rng = np.random.RandomState(seed)
+    for day in range(1, n_days + 1):
+        prices = np.round(rng.uniform(0, 3000, rows_per_day), 2).tolist()
+        volumes = np.round(rng.uniform(0, 100, rows_per_day), 3).tolist()
+        for i in range(rows_per_day):
+            yield (20180100 + day, i // 200 + 1, i % 200 + 1, volumes[i], prices[i])
+
+
+def row_by_row(conn, rows, rows_per_day):
+    """
+    Former insertion: one statement built and executed per row, committed per day.
+    """
+    col_names = get_col_names(TABLE)
+    cursor = conn.cursor()
+    for i, row in enumerate(rows):
+        cmd = "INSERT INTO %s (%s) values (%s)" % (TABLE, ','.join(col_names), ', '.join('?' * len(col_names)))
+        cursor.execute(cmd, row)
+        if (i + 1) % rows_per_day == 0:
+            conn.commit()
+    conn.commit()
+
+
+def run(path, name, n_days, rows_per_day, seed, bulk, deferred_index, offline):
+    """
+    :return: the number of rows inserted per second, including the creation of the index.
+    """
+    db_file = "%s/%s" % (path, name)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    conn = sqlite3.connect(db_file)
+    if offline:
+        set_offline_pragmas(conn)
+    create_tables(conn, [TABLE], indexes=not deferred_index)
+    conn.commit()
+
+    rows = list(curve_data(n_days, rows_per_day, seed))
+    t0 = time.time()
+    if bulk:
+        bulk_insert(conn, TABLE, rows)
+    else:
+        row_by_row(conn, rows, rows_per_day)
+    if deferred_index:
+        create_indexes(conn, [TABLE])
+        conn.commit()
+    t = time.time() - t0
+    conn.close()
+    os.remove(db_file)
+    return n_days * rows_per_day / t
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark of the insertion of curve data in the database')
+    parser.add_argument("-p", "--path", help="Folder where the databases are created", default='.')
+    parser.add_argument("--days", type=int, help="Number of days inserted.", default=2)
+    parser.add_argument("--rows", type=int, help="Number of rows per day.", default=700000)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    args = parser.parse_args()
+
+    for label, bulk, deferred_index, offline in [('row by row', False, False, False),
+                                                 ('bulk', True, False, False),
+                                                 ('bulk, deferred index', True, True, False),
+                                                 ('bulk, deferred index, offline', True, True, True)]:
+        rate = run(args.path, 'bulk_insert_benchmark.sqlite3', args.days, args.rows, args.seed, bulk, deferred_index,
+                   offline)
+        print("%-30s: %10.0f rows/s" % (label, rate))
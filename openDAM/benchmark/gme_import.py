@@ -0,0 +1,152 @@
+"""
+Benchmark of the reading of the GME public offers by :py:class:`GME_xml_importer.GMEImporter`, parsing the whole XML
+file in memory or streaming it from the zip archive, on a synthetic file of several hundred MB.
+
+Each mode runs in its own process, so that its peak memory is measured independently.
+
+Run from the master directory, e.g. ``python openDAM/benchmark/gme_import.py -p /tmp --size 300``.
+"""
+import sys
+import os
+import time
+import zipfile
+import subprocess
+
+from argparse import ArgumentParser
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from openDAM.dataio.GME_xml_importer import GMEImporter, OrdersList, PUN_ZONES
+
+DATE = '20180110'
+
+RECORD = u'''  <OfferteOperatori>
+    <PURPOSE_CD>%s</PURPOSE_CD>
+    <TYPE_CD>REG</TYPE_CD>
+    <STATUS_CD>%s</STATUS_CD>
+    <MARKET_CD>MGP</MARKET_CD>
+    <UNIT_REFERENCE_NO>%s</UNIT_REFERENCE_NO>
+    <MARKET_PARTECIPANT_XREF_NO>OP_%d</MARKET_PARTECIPANT_XREF_NO>
+    <INTERVAL_NO>%d</INTERVAL_NO>
+    <BID_OFFER_DATE_DT>%s</BID_OFFER_DATE_DT>
+    <TRANSACTION_REFERENCE_NO>%d</TRANSACTION_REFERENCE_NO>
+    <QUANTITY_NO>%.3f</QUANTITY_NO>
+    <AWARDED_QUANTITY_NO>%.3f</AWARDED_QUANTITY_NO>
+    <ENERGY_PRICE_NO>%.2f</ENERGY_PRICE_NO>
+    <MERIT_ORDER_NO>%d</MERIT_ORDER_NO>
+    <PARTIAL_QTY_ACCEPTED_IN>N</PARTIAL_QTY_ACCEPTED_IN>
+    <ADJ_QUANTITY_NO>%.3f</ADJ_QUANTITY_NO>
+    <ADJ_ENERGY_PRICE_NO>%.2f</ADJ_ENERGY_PRICE_NO>
+    <ZONE_CD>%s</ZONE_CD>
+    <AWARDED_PRICE_NO>%.2f</AWARDED_PRICE_NO>
+    <SUBMITTED_DT>2018-01-09T09:00:00</SUBMITTED_DT>
+    <BILATERAL_IN>false</BILATERAL_IN>
+  </OfferteOperatori>
+'''
+
+
+def write_offers(path, size, pun_share, seed, batch=10000):
+    """
+    Write a synthetic yyyymmddMGPOffertePubbliche.zip archive of about size MB of uncompressed XML, with demand,
+    supply and PUN orders in the Italian zones.
+
+    :param pun_share: share of the demand orders which are PUN orders, i.e. not from a UP_ unit.
+    :return: the number of orders.
+    """
+    rng = np.random.RandomState(seed)
+    xml_file_path = path + u'/%sMGPOffertePubbliche.xml' % DATE
+    n_orders = 0
+    with open(xml_file_path, 'w') as f:
+        f.write(u'<?xml version="1.0" standalone="yes"?>\n<NewDataSet>\n')
+        while f.tell() < size * 1024 * 1024:
+            purposes = rng.choice(['BID', 'OFF'], batch)
+            statuses = rng.choice(['ACC', 'REJ', 'REP'], batch, p=[0.5, 0.45, 0.05])
+            units = rng.choice(['UP_%d', 'UC_%d'], batch, p=[1 - pun_share, pun_share])
+            zones = rng.choice(PUN_ZONES, batch)
+            periods = rng.randint(1, 25, batch)
+            prices = rng.uniform(0, 200, batch)
+            volumes = rng.uniform(0, 100, batch)
+            f.write(u''.join(RECORD % (purposes[i], statuses[i], units[i] % (i % 500), i % 300, periods[i], DATE,
+                                       n_orders + i, volumes[i], volumes[i] if statuses[i] == 'ACC' else 0.0,
+                                       prices[i], n_orders + i, volumes[i], prices[i], zones[i], prices[i])
+                             for i in range(batch)))
+            n_orders += batch
+        f.write(u'</NewDataSet>\n')
+
+    with zipfile.ZipFile(path + u'/%sMGPOffertePubbliche.zip' % DATE, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.write(xml_file_path, os.path.basename(xml_file_path))
+    os.remove(xml_file_path)
+    return n_orders
+
+
+class OffersImporter(GMEImporter):
+    """
+    Importer reading the public offers only.
+    """
+
+    def __init__(self, path, date, streaming=False):
+        self.path = path
+        self.date = date
+        self.streaming = streaming
+        self.all_periods = set()
+        self.all_zones = set()
+        self.demand_orders = OrdersList()
+        self.pun_orders = OrdersList()
+        self.supply_orders = OrdersList()
+
+
+def peak_memory():
+    """
+    :return: the peak resident memory of the process in MB, or nan if it cannot be measured on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KB on Linux
+
+
+def measure(path, streaming):
+    """
+    Read the offers and print the time, the peak memory and the number of orders read.
+    """
+    importer = OffersImporter(path, DATE, streaming=streaming)
+    t0 = time.time()
+    importer.read_bids()
+    importer.awarded_pun_quantities = importer.awarded_pun_frame()
+    t = time.time() - t0
+    n = len(importer.demand_orders) + len(importer.supply_orders) + len(importer.pun_orders)
+    print("%f %f %d" % (t, peak_memory(), n))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark of the import of GME public offers on a synthetic file')
+    parser.add_argument("-p", "--path", help="Folder where the synthetic archive is created", default='.')
+    parser.add_argument("--size", type=int, help="Size of the uncompressed XML file, in MB.", default=300)
+    parser.add_argument("--pun_share", type=float, help="Share of the demand orders which are PUN orders.",
+                        default=0.1)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    parser.add_argument("--measure", help=u"Internal: measure one mode in this process.",
+                        choices=['tree', 'stream'])
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        measure(args.path, args.measure == 'stream')
+        sys.exit(0)
+
+    zip_file_path = args.path + u'/%sMGPOffertePubbliche.zip' % DATE
+    if not os.path.exists(zip_file_path):
+        print("Creating %s" % zip_file_path)
+        t0 = time.time()
+        n_orders = write_offers(args.path, args.size, args.pun_share, args.seed)
+        print("Created %d orders in %.2fs" % (n_orders, time.time() - t0))
+    size = sum(i.file_size for i in zipfile.ZipFile(zip_file_path).infolist()) / 1024.0 / 1024.0
+
+    for mode in ['tree', 'stream']:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '-p', args.path,
+                                          '--measure', mode])
+        t, memory, n = output.decode().split('\n')[-2].split()
+        print("%-6s: %8.2fs, %8.1f MB/s, peak memory %8.1f MB, %s orders read" % (
+            mode, float(t), size / float(t), float(memory), n))
@@ -0,0 +1,158 @@
+"""
+Benchmark of :py:class:`dam_db_loader.Loader` on a synthetic multi-year database, with and without the indexes of
+the schema, with the snapshots of :py:class:`day_snapshot.SnapshotCache`, and from the columnar archive of
+:py:mod:`dam_archive`.
+
+Run from the master directory, e.g. ``python openDAM/benchmark/loader.py -p /tmp --days 730``.
+"""
+import sys
+import os
+import time
+import logging
+import shutil
+import sqlite3
+import tempfile
+
+from argparse import ArgumentParser
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from openDAM.dataio.create_dam_db_from_csv import TABLES, create_tables, create_indexes, insert_in_table
+from openDAM.dataio import dam_db_loader
+from openDAM.dataio import dam_archive
+
+
+def populate(conn, n_days, n_zones, n_periods, n_steps, n_blocks, n_complex, seed):
+    """
+    Fill a database with n_days synthetic days. Each day has a chain of zones, a supply and a demand curve per zone
+    and period, block orders and complex orders.
+    """
+    rng = np.random.RandomState(seed)
+    zones = range(1, n_zones + 1)
+    periods = range(1, n_periods + 1)
+
+    for day in range(1, n_days + 1):
+        rows = dict((table, []) for table in TABLES)
+        rows['DAYS'].append([day, n_periods])
+        for z in zones:
+            rows['ZONES'].append([day, z, 'Z%d' % z, 0.0, 3000.0])
+        for l in range(1, n_zones):
+            rows['LINES'].append([day, l, l, l + 1])
+            for t in periods:
+                rows['LINE_DATA'].append([day, l, t, rng.uniform(0, 500), rng.uniform(0, 500)])
+
+        curve_id = 0
+        for z in zones:
+            for t in periods:
+                for curve_type in ['SUPPLY', 'DEMAND']:
+                    curve_id += 1
+                    rows['CURVES'].append([day, curve_id, z, t, curve_type])
+                    prices = np.sort(rng.uniform(0, 200, n_steps)).tolist()
+                    volume = 0.0
+                    for position, price in enumerate(prices if curve_type == 'SUPPLY' else prices[::-1]):
+                        rows['CURVE_DATA'].append([day, curve_id, 2 * position + 1, volume, price])
+                        volume += rng.uniform(1, 100)
+                        rows['CURVE_DATA'].append([day, curve_id, 2 * position + 2, volume, price])
+
+        for b in range(1, n_zones * n_blocks + 1):
+            rows['BLOCKS'].append([day, b, zones[b % n_zones], rng.uniform(20, 80), 0.0])
+            for t in periods:
+                rows['BLOCK_DATA'].append([day, b, t, rng.uniform(0, 50)])
+
+        for c in range(1, n_zones * n_complex + 1):
+            rows['COMPLEXORDERS'].append([day, c, zones[c % n_zones], 'SUPPLY', 100.0, 10.0, None, None, 0])
+            for t in periods:
+                price = rng.uniform(0, 100)
+                rows['COMPLEXORDER_DATA'].append([day, c, t, 1, 0.0, price])
+                rows['COMPLEXORDER_DATA'].append([day, c, t, 2, rng.uniform(1, 100), price])
+
+        for table, data in rows.items():
+            insert_in_table(conn, table, data)
+    conn.commit()
+
+
+def time_days(loader, days):
+    """
+    :return: the average time in seconds to read one of the days.
+    """
+    t0 = time.time()
+    for day in days:
+        loader.read_day(day)
+    return (time.time() - t0) / len(days)
+
+
+def time_days_rows(loader, days):
+    """
+    :return: the average time in seconds to query the rows of one of the days, without creating the objects.
+    """
+    t0 = time.time()
+    for day in days:
+        loader.read_day_rows(day)
+    return (time.time() - t0) / len(days)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark of the database loader on a synthetic multi-year database')
+    parser.add_argument("-p", "--path", help="Folder where the database is created", default='.')
+    parser.add_argument("-d", "--database", help="Name of the sqlite database file, reused if it exists.",
+                        default='loader_benchmark.sqlite3')
+    parser.add_argument("--days", type=int, help="Number of days in the database.", default=730)
+    parser.add_argument("--zones", type=int, help="Number of zones.", default=4)
+    parser.add_argument("--periods", type=int, help="Number of periods.", default=24)
+    parser.add_argument("--steps", type=int, help="Number of steps per curve.", default=4)
+    parser.add_argument("--blocks", type=int, help="Number of block orders per zone.", default=2)
+    parser.add_argument("--complex", type=int, help="Number of complex orders per zone.", default=2)
+    parser.add_argument("--sample", type=int, help="Number of days read for timing.", default=20)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    db_file = "%s/%s" % (args.path, args.database)
+    if not os.path.exists(db_file):
+        print("Creating %s" % db_file)
+        conn = sqlite3.connect(db_file)
+        create_tables(conn)
+        t0 = time.time()
+        populate(conn, args.days, args.zones, args.periods, args.steps, args.blocks, args.complex, args.seed)
+        print("Created %d days in %.2fs" % (args.days, time.time() - t0))
+        conn.close()
+
+    conn = sqlite3.connect(db_file)
+    loader = dam_db_loader.Loader(args.path, args.database)
+    all_days = loader.get_all_days()
+    days = np.random.RandomState(args.seed).choice(all_days, min(args.sample, len(all_days)), replace=False).tolist()
+
+    for table in TABLES:
+        conn.execute("DROP INDEX IF EXISTS %s_IDX" % table)
+    print("Without indexes: %8.2f ms per day" % (1000 * time_days(loader, days)))
+
+    create_indexes(conn)
+    print("With indexes:    %8.2f ms per day" % (1000 * time_days(loader, days)))
+    conn.close()
+
+    snapshots = tempfile.mkdtemp()
+    try:
+        loader = dam_db_loader.Loader(args.path, args.database, snapshots)
+        print("Snapshots, cold: %8.2f ms per day" % (1000 * time_days(loader, days)))
+        print("Snapshots, warm: %8.2f ms per day" % (1000 * time_days(loader, days)))
+        t0 = time.time()
+        for day in days:
+            loader.snapshots.rows(day, loader.read_day_rows)
+        print("Snapshot rows:   %8.2f ms per day, %8.2f ms for the SQL rows" % (
+            1000 * (time.time() - t0) / len(days), 1000 * time_days_rows(loader, days)))
+    finally:
+        shutil.rmtree(snapshots)
+
+    archive = tempfile.mkdtemp()
+    try:
+        t0 = time.time()
+        dam_archive.convert(db_file, archive + '/archive')
+        print("Archive created in %.2fs" % (time.time() - t0))
+        loader = dam_archive.ArchiveLoader(archive + '/archive')
+        print("Archive:         %8.2f ms per day" % (1000 * time_days(loader, days)))
+        print("Archive rows:    %8.2f ms per day" % (1000 * time_days_rows(loader, days)))
+    finally:
+        shutil.rmtree(archive)
@@ -0,0 +1,141 @@
+"""
+Benchmark of the generation of the :py:class:`PUN_DAM` model on randomly generated large orders books.
+
+Run from the master directory, e.g. ``python openDAM/benchmark/model_build.py --zones 20 --steps 50``.
+"""
+import sys
+import os
+import time
+import logging
+
+from argparse import ArgumentParser
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import openDAM.conf.options as options
+from openDAM.model.Zone import Zone
+from openDAM.model.Line import Line
+from openDAM.model.StepCurve import StepCurve
+from openDAM.model.BlockBid import BlockBid
+from openDAM.model.PunOrder import PunOrder
+from openDAM.model.pun_dam_model import PUN_DAM
+
+MAXIMUM_PRICE = 3000.0
+
+
+def random_curve_points(n_steps, supply, rng):
+    """
+    Points of a random step curve with n_steps steps, in the format expected by :py:class:`StepCurve`.
+    """
+    prices = np.sort(rng.uniform(0.0, 200.0, n_steps))
+    if not supply:
+        prices = prices[::-1]
+    quantities = rng.uniform(1.0, 100.0, n_steps) * (1 if supply else -1)
+
+    points = []
+    volume = 0.0
+    for q, p in zip(quantities.tolist(), prices.tolist()):
+        points.append((volume, p))
+        volume += q
+        points.append((volume, p))
+    return points
+
+
+def random_pun_day(n_zones=20, n_periods=24, n_steps=50, n_pun=30, n_blocks=10, pun_price_tick=0.0, seed=1984):
+    """
+    Generate a PUN day with a chain of zones, each zone being also linked to a random other zone.
+
+    :param n_zones: number of zones, the first half are PUN zones.
+    :param n_periods: number of periods.
+    :param n_steps: number of steps of each supply and demand curve, one curve of each per zone and period.
+    :param n_pun: number of PUN orders per PUN zone and period.
+    :param n_blocks: number of block orders per zone.
+    :param pun_price_tick: if positive, PUN prices are rounded to a multiple of this value, which creates PUN orders
+        at the money in several zones and hence market split constraints.
+    :param seed: seed of the random generator.
+    :return: a :py:class:`PUN_DAM` object, with its order book created.
+    """
+    rng = np.random.RandomState(seed)
+    periods = range(1, n_periods + 1)
+
+    zones = dict((z, Zone(z, "Z%d" % z, 0.0, MAXIMUM_PRICE)) for z in range(1, n_zones + 1))
+    pun_zones = range(1, n_zones // 2 + 1)
+
+    links = set((z, z + 1) for z in range(1, n_zones))
+    for z in range(1, n_zones + 1):
+        other = rng.randint(1, n_zones + 1)
+        if other != z and (other, z) not in links:
+            links.add((z, other))
+    lines = []
+    for l, (f, t) in enumerate(sorted(links)):
+        capacities = rng.uniform(0.0, 1000.0, (2, n_periods)).tolist()
+        lines.append(Line(l + 1, f, t, dict(zip(periods, capacities[0])), dict(zip(periods, capacities[1]))))
+
+    curves = []
+    for z in zones:
+        for t in periods:
+            curves.append(StepCurve(points=random_curve_points(n_steps, True, rng), period=t, location=z))
+            curves.append(StepCurve(points=random_curve_points(n_steps, False, rng), period=t, location=z))
+
+    blocks = []
+    for z in zones:
+        for b in range(n_blocks):
+            volumes = dict(zip(periods, rng.uniform(0.0, 50.0, n_periods).tolist()))
+            blocks.append(BlockBid(len(blocks) + 1, volumes=volumes, price=rng.uniform(20.0, 80.0), location=z,
+                                   min_acceptance_ratio=0.1))
+
+    pun_orders = []
+    for z in pun_zones:
+        for t in periods:
+            prices = np.sort(rng.uniform(0.0, 200.0, n_pun))[::-1]
+            if pun_price_tick > 0:
+                prices = np.round(prices / pun_price_tick) * pun_price_tick
+            for merit_order, price in enumerate(prices.tolist()):
+                pun_orders.append(PunOrder(len(pun_orders) + 1, z, t, merit_order + 1, rng.uniform(1.0, 100.0),
+                                           price))
+
+    return PUN_DAM(1, zones, curves, blocks, pun_orders, lines)
+
+
+def run(ladder, n_periods, n_pun, n_blocks, pun_price_tick, seed):
+    """
+    Time the order book and model generation for each instance size of the ladder.
+
+    :param ladder: list of (number of zones, number of steps) pairs.
+    :return: a list of (zones, steps, number of bids, book time, model time) tuples.
+    """
+    results = []
+    for n_zones, n_steps in ladder:
+        t0 = time.time()
+        dam = random_pun_day(n_zones, n_periods, n_steps, n_pun, n_blocks, pun_price_tick, seed)
+        t_book = time.time() - t0
+
+        t0 = time.time()
+        dam.create_model()
+        t_model = time.time() - t0
+
+        results.append((n_zones, n_steps, len(dam.orders.bids), t_book, t_model))
+        print("%6d zones %6d steps %9d bids: book %8.2fs, model %8.2fs" % results[-1])
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark of the PUN model generation on random orders books')
+    parser.add_argument("--zones", type=int, nargs='+', help="Number of zones, one run per value.", default=[20])
+    parser.add_argument("--steps", type=int, nargs='+', help="Number of steps per curve, one run per value.",
+                        default=[10, 50, 100])
+    parser.add_argument("--periods", type=int, help="Number of periods.", default=24)
+    parser.add_argument("--pun", type=int, help="Number of PUN orders per PUN zone and period.", default=30)
+    parser.add_argument("--blocks", type=int, help="Number of block orders per zone.", default=10)
+    parser.add_argument("--pun_price_tick", type=float, help="Rounding of PUN prices, 0 for no rounding.",
+                        default=0.0)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    options.DEBUG = False
+
+    run([(z, s) for z in args.zones for s in args.steps], args.periods, args.pun, args.blocks, args.pun_price_tick,
+        args.seed)
@@ -0,0 +1,304 @@
+"""
+End-to-end benchmark of the clearing of a day, stage by stage, on a ladder of synthetic instances generated with
+:py:mod:`generate_market`: load of the rows of the day, creation of the DAM object and of its order book, generation
+of the model, LP file writing, solve, storage of the solution, and update of the CSV results.
+
+Complex days use the matrix backend solved with HiGHS, or the Pyomo model and PUN days are solved with the Simple
+strategy by the Pyomo solver of the --solver argument, appsi_highs by default, so that no commercial solver is
+needed. Each run is appended to a JSON history, and the stage times can be compared with those of a baseline run to
+flag regressions, in which case the exit status is 1.
+
+Run from the master directory, e.g. ``python openDAM/benchmark/suite.py -p /tmp --sizes complex_s pun_s --memory``,
+then ``python openDAM/benchmark/suite.py -p /tmp --baseline /tmp/baseline.json`` after a change.
+"""
+import sys
+import os
+import json
+import time
+import logging
+import platform
+import resource
+import shutil
+import sqlite3
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+
+from argparse import ArgumentParser
+
+from pyomo.opt import SolverFactory
+import pyomo.environ  # Registers the solvers
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import openDAM.conf.options as options
+from openDAM.dataio.create_dam_db_from_csv import create_tables
+from openDAM.dataio.dam_db_loader import Loader
+from openDAM.dataio.dam_results_csv import CSV_writer
+from openDAM.dataio.generate_market import generate
+from openDAM.model.pun_dam_model import PUN_DAM
+
+## Stages timed for each day, in order.
+STAGES = ['load', 'book', 'model', 'write', 'solve', 'solution', 'results']
+
+## Ladder of instance sizes, see generate_market.generate_day. complex_m reaches the default time limit with HiGHS,
+#  with or without its block orders. The PUN_DAM model is much harder to solve: pun_m takes seconds and pun_l reaches
+#  the time limit.
+LADDER = OrderedDict([
+    ('complex_xs', dict(zones=2, periods=4, steps=5, blocks=1, complex_orders=1)),
+    ('complex_s', dict(zones=4, periods=24, steps=20, blocks=2, complex_orders=2)),
+    ('complex_m', dict(zones=10, periods=24, steps=50, blocks=5, complex_orders=5, topology='mesh', extra_lines=5)),
+    ('complex_l', dict(zones=20, periods=96, steps=100, blocks=10, complex_orders=5, topology='mesh',
+                       extra_lines=10)),
+    ('pun_xs', dict(zones=2, periods=2, steps=3, blocks=0, pun_orders=4)),
+    ('pun_s', dict(zones=2, periods=4, steps=3, blocks=0, pun_orders=4)),
+    ('pun_m', dict(zones=3, periods=2, steps=5, blocks=0, pun_orders=6)),
+    ('pun_l', dict(zones=4, periods=24, steps=10, blocks=2, pun_orders=10)),
+])
+
+## Name of the time limit option of the Pyomo solvers.
+TIME_LIMIT_OPTION = {'appsi_highs': 'time_limit', 'highs': 'time_limit', 'cbc': 'seconds', 'glpk': 'tmlim',
+                     'cplex': 'timelimit', 'gurobi': 'TimeLimit'}
+
+## Sizes run by default.
+DEFAULT_SIZES = ['complex_xs', 'complex_s', 'pun_xs', 'pun_s']
+
+## A stage is a regression if it is slower than its baseline time by this ratio...
+REGRESSION_RATIO = 0.2
+## ...and by this number of seconds, so that the noise on short stages is not flagged.
+REGRESSION_SECONDS = 0.05
+
+
+def set_solver(name, time_limit):
+    """
+    Use a Pyomo solver for the Pyomo models, with a time limit.
+
+    :param name: name of the Pyomo solver.
+    :param time_limit: time limit in seconds of the solves, also with the matrix backend.
+    """
+    options.MATRIX_SOLVER_OPTIONS['time_limit'] = float(time_limit)
+    options.SOLVER_NAME = name
+    options.SOLVER = SolverFactory(name)
+    if name in TIME_LIMIT_OPTION:
+        options.SOLVER.options[TIME_LIMIT_OPTION[name]] = float(time_limit)
+    else:
+        logging.warning("No time limit known for the solver %s." % name)
+
+
+class Stages:
+    """
+    Times, and optionally peaks of the Python allocations, of the stages of a day.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.times = OrderedDict()
+        self.peaks = OrderedDict()  #: Peak of the Python allocations during each stage, in KB
+        self.errors = OrderedDict()
+        self._name = None
+        self._t = None
+
+    def start(self, name):
+        self._name = name
+        if self.memory:
+            tracemalloc.reset_peak()
+        self._t = time.time()
+
+    def stop(self):
+        self.times[self._name] = time.time() - self._t
+        if self.memory:
+            self.peaks[self._name] = tracemalloc.get_traced_memory()[1] / 1024.0
+
+
+def clear_day(loader, day, path, backend, stages):
+    """
+    Clear a day stage by stage. A stage that fails is recorded in stages.errors and stops the day.
+
+    :return: the number of bids of the day, None if its order book could not be created.
+    """
+    writer = None
+    bids = None
+    try:
+        stages.start('load')
+        rows = loader.read_day_rows(day)
+        stages.stop()
+
+        stages.start('book')
+        dam = loader.create_day(day, rows)
+        stages.stop()
+        bids = len(dam.orders.bids)
+
+        stages.start('model')
+        options.BACKEND = backend
+        dam.create_model()
+        stages.stop()
+
+        stages.start('write')
+        dam.exportModel('%s/model.lp' % path)
+        stages.stop()
+
+        stages.start('solve')
+        if isinstance(dam, PUN_DAM):
+            dam.solve(strategy='Simple')
+        else:
+            dam.solve()
+        stages.stop()
+        # The solution is stored in the order book by solve, timed apart in the timings of the day.
+        stages.times['solve'] -= dam.timings.get('load', 0.0)
+        stages.times['solution'] = dam.timings.get('load', 0.0)
+
+        stages.start('results')
+        writer = CSV_writer(path, flush_days=0)
+        writer.update(dam)
+        writer.close_files()
+        stages.stop()
+    except Exception as e:
+        stages.errors[stages._name] = '%s: %s' % (type(e).__name__, e)
+    finally:
+        if writer is not None:
+            writer.close_files()
+    return bids
+
+
+def run_size(name, size, path, days, seed, backend, memory):
+    """
+    Generate the days of a size of the ladder and clear them.
+
+    :return: an OrderedDict with the size, the number of bids, the median time and the maximum peak of each stage
+        over the days, and the errors.
+    """
+    folder = tempfile.mkdtemp(dir=path)
+    try:
+        conn = sqlite3.connect('%s/days.sqlite3' % folder)
+        create_tables(conn)
+        generate(conn, days, seed, **size)
+        conn.close()
+
+        loader = Loader(folder, 'days.sqlite3')
+        all_stages = []
+        bids = None
+        for day in loader.get_all_days():
+            stages = Stages(memory)
+            bids = clear_day(loader, day, folder, backend, stages)
+            all_stages.append(stages)
+        loader.conn.close()
+    finally:
+        shutil.rmtree(folder)
+
+    result = OrderedDict([('size', size), ('bids', bids), ('stages', OrderedDict()), ('errors', OrderedDict())])
+    for stage in STAGES:
+        times = sorted(s.times[stage] for s in all_stages if stage in s.times)
+        if times:
+            result['stages'][stage] = OrderedDict([('time', times[len(times) // 2])])
+            if memory:
+                result['stages'][stage]['peak_kb'] = max(s.peaks.get(stage, 0.0) for s in all_stages)
+        for s in all_stages:
+            if stage in s.errors:
+                result['errors'][stage] = s.errors[stage]
+    result['maxrss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def run(path, sizes, days=1, seed=1984, backend='matrix', memory=False):
+    """
+    Run the sizes of the ladder.
+
+    :param path: folder in which the days are generated, in temporary folders.
+    :param sizes: names of sizes of :py:data:`LADDER`.
+    :param days: number of days generated for each size, the median stage times are recorded.
+    :param seed: seed of the generator of the days.
+    :param backend: backend of the complex days, see options.BACKEND.
+    :param memory: True to trace the peak of the Python allocations of each stage, which slows down the stages.
+    :return: the record of the run, as stored in the history.
+    """
+    record = OrderedDict([('date', time.strftime("%Y-%m-%d %H:%M:%S")), ('python', platform.python_version()),
+                          ('machine', platform.machine()), ('solver', options.SOLVER_NAME), ('backend', backend),
+                          ('days', days), ('seed', seed), ('sizes', OrderedDict())])
+    if memory:
+        tracemalloc.start()
+    try:
+        for name in sizes:
+            record['sizes'][name] = result = run_size(name, LADDER[name], path, days, seed, backend, memory)
+            print("%-11s %8s bids: %s%s" % (name, result['bids'], ', '.join(
+                '%s %.3fs' % (stage, v['time']) for stage, v in result['stages'].items()),
+                ''.join('\n    %s failed: %s' % e for e in result['errors'].items())))
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return record
+
+
+def regressions(record, baseline, ratio=REGRESSION_RATIO, seconds=REGRESSION_SECONDS):
+    """
+    Compare the stage times of a run with those of a baseline run, for the sizes and stages of both.
+
+    :return: list of (size, stage, baseline time, time) of the stages slower than the baseline by more than ratio
+        and seconds.
+    """
+    slower = []
+    for name, result in record['sizes'].items():
+        base = baseline['sizes'].get(name)
+        if base is None:
+            continue
+        for stage, v in result['stages'].items():
+            if stage in base['stages']:
+                t0, t = base['stages'][stage]['time'], v['time']
+                if t > t0 * (1 + ratio) and t - t0 > seconds:
+                    slower.append((name, stage, t0, t))
+    return slower
+
+
+def append_history(file_name, record):
+    """
+    Append the record of a run to a JSON history file, a list of records.
+    """
+    history = []
+    if os.path.exists(file_name):
+        with open(file_name) as f:
+            history = json.load(f)
+    history.append(record)
+    with open(file_name + '.tmp', 'w') as f:
+        json.dump(history, f, indent=1)
+    os.rename(file_name + '.tmp', file_name)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='End-to-end benchmark of the clearing of synthetic days')
+    parser.add_argument("-p", "--path", help="Folder where the days are generated and the history is stored",
+                        default='.')
+    parser.add_argument("--sizes", nargs='+', help="Sizes of the ladder to run.", default=DEFAULT_SIZES,
+                        choices=list(LADDER))
+    parser.add_argument("--days", type=int, help="Number of days per size.", default=1)
+    parser.add_argument("--solver", help="Pyomo solver of the PUN days, and of the complex days with the pyomo "
+                                         "backend.", default='appsi_highs')
+    parser.add_argument("--backend", help="Model backend of the complex days.", default='matrix',
+                        choices=['pyomo', 'matrix'])
+    parser.add_argument("--time_limit", type=float, help="Time limit of each solve, in seconds.", default=60.0)
+    parser.add_argument("--memory", help="Trace the peak of the Python allocations of each stage.",
+                        action="store_true")
+    parser.add_argument("--history", help="JSON history file, under the folder of the --path argument.",
+                        default='benchmark_history.json')
+    parser.add_argument("--baseline", help="JSON record of a baseline run, to flag the regressions.", default=None)
+    parser.add_argument("--save_baseline", help="Write the record of the run in this file, as baseline of the "
+                                                "next runs.", default=None)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    options.DEBUG = False
+    set_solver(args.solver, args.time_limit)
+
+    record = run(args.path, args.sizes, args.days, args.seed, args.backend, args.memory)
+    append_history('%s/%s' % (args.path, args.history), record)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(record, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(record, json.load(f))
+        for name, stage, t0, t in slower:
+            print("REGRESSION %-11s %-8s %.3fs -> %.3fs" % (name, stage, t0, t))
+        if slower:
+            sys.exit(1)
+    print("DONE")
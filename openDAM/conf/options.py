@@ -18,6 +18,10 @@ BINARY_EXP_NUMBER = 19
 DEBUG = True
 LOG_FOLDER = '../debug'
 
+## Trace the Python allocations of each block of the model generation, see BuildProfile.
+#  Slows down the generation.
+PROFILE_ALLOCATIONS = False
+
 ## Solver.
 SOLVER_NAME = 'cplex'
 
@@ -45,9 +49,25 @@ if SOLVER_NAME == 'cplex':
         # SOLVER.options["mip strategy branch"] = -1
         # SOLVER.options["mip strategy variableselect"] = -1
 
+## Persistent interfaces of the solvers, keeping the model loaded in the solver between solves.
+#  Solvers without one (e.g. GLPK, CBC) are always called through SOLVER.
+PERSISTENT_SOLVERS = {'cplex': 'cplex_persistent'}
+
 if SOLVER is None:
     raise Exception('Unable to instanciate the solver.')
 
+## Backend of the COMPLEX_DAM model: 'pyomo', or 'matrix' to assemble it directly in matrix form and solve it
+#  with HiGHS, see MatrixModel.
+BACKEND = 'pyomo'
+
+## HiGHS options of the matrix backend.
+MATRIX_SOLVER_OPTIONS = {'mip_rel_gap': 1e-6, 'time_limit': 1500.0}
+
+## Folder of the cache of the artifacts of the resolution of the days (model files, relaxed PUN prices, incumbents
+#  and solutions), reused by the runs whose model options and order books are the same, see
+#  solve_artifacts.ArtifactCache. None to disable the cache.
+ARTIFACT_CACHE = None
+
 ## Numerical accuracy.
 EPS = 1e-4
 
@@ -58,6 +78,15 @@ NO_EXCHANGE_CAPACITY = False
 PUN_IMBALACE_TOL_LB = -1
 PUN_IMBALACE_TOL_UB = 5
 
+## Search of the PUN price window of phase 2 of the Advanced strategy, see PUN_DAM.window_search: number of worker
+#  processes solving the candidate windows of a round concurrently, 1 to solve them in the process of the day, or 0
+#  to solve the single window [v - 1, v + 1] around the relaxed PUN price v of each period.
+PUN_WINDOW_SEARCH = 0
+# Number of candidate windows solved in each round of the search.
+PUN_WINDOW_CANDIDATES = 4
+# Maximum number of rounds of the search, the windows of each round being wider and around the best incumbent.
+PUN_WINDOW_ROUNDS = 3
+
 ## options for COMPLEX_DAM
 
 # General
@@ -68,3 +97,13 @@ DUAL = True
 APPLY_LOAD_GRADIENT = True
 APPLY_SCHEDULED_STOP = True
 APPLY_MIC = True and PRIMAL and DUAL
+
+## options of the results files, see dam_results_csv.CSV_writer
+
+# Size in bytes of the write buffer of each results file.
+RESULTS_BUFFER = 1 << 20
+# Number of days whose results are held in memory before being written, 0 to write them only when the files are
+# closed.
+RESULTS_FLUSH_DAYS = 1
+# Force the written results to disk with fsync, so that they also survive a crash of the machine.
+RESULTS_FSYNC = False
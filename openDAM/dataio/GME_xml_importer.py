@@ -2,38 +2,61 @@
 # -*- coding: utf-8 -*-
 
 import sqlite3
+import multiprocessing
 from argparse import ArgumentParser
+from array import array
+from collections import OrderedDict, deque
 from lxml import etree
 import zipfile
 import os
+import numpy as np
 import pandas as pd
 
-from openDAM.dataio.create_dam_db_from_csv import create_tables, insert_in_table
+from openDAM.dataio.create_dam_db_from_csv import create_tables, create_indexes, insert_in_table, \
+    set_offline_pragmas, restore_pragmas
 
 PUN_ZONES = ("NORD", "CNOR", "CSUD", "SUD", "SICI", "SARD")
 COUPLING_ZONES = ("XFRA", "XAUS", "BSP")
+BID_FIELDS = ("STATUS_CD", "PURPOSE_CD", "INTERVAL_NO", "ENERGY_PRICE_NO", "ADJ_QUANTITY_NO", "ZONE_CD",
+              "MERIT_ORDER_NO", "UNIT_REFERENCE_NO", "AWARDED_QUANTITY_NO")  # Fields of the public offers used
 MAXIMUM_PRICE = 3000.0
 MINIMUM_PRICE = 0.0
 
 
+## Typecode of the array buffer of each numerical field of the orders stored by an OrdersList.
+ORDER_COLUMNS = (('id', 'l'), ('period', 'l'), ('price', 'd'), ('volume', 'd'), ('merit_order', 'l'),
+                 ('awarded_quantity', 'd'))
+
+
 class OrdersList:
+    """
+    Orders of one type. The fields of the orders are accumulated in typed column buffers, one value per order, and
+    are materialized as NumPy arrays by :py:meth:`columns`.
+    """
+
     def __init__(self):
         self.zones = set()
         self.periods = set()
-        self.orders = {}
         self.last_id_given = 0
+        self._buffers = dict((name, array(typecode)) for name, typecode in ORDER_COLUMNS)
+        self._zones = []  # zone of each order
+
+    def __len__(self):
+        return len(self._zones)
 
     def add(self, order):
         order.id = self.get_next_available_id()
 
-        if order.zone not in self.orders:
-            self.orders[order.zone] = {}
-            self.zones.add(order.zone)
-        if order.period not in self.orders[order.zone]:
-            self.orders[order.zone][order.period] = [order]
-            self.periods.add(order.period)
-        else:
-            self.orders[order.zone][order.period].append(order)
+        self.zones.add(order.zone)
+        self.periods.add(order.period)
+        self._zones.append(order.zone)
+        buffers = self._buffers
+        buffers['id'].append(order.id)
+        buffers['period'].append(order.period)
+        buffers['price'].append(order.price)
+        buffers['volume'].append(order.volume)
+        buffers['merit_order'].append(order.merit_order if order.merit_order is not None else 0)
+        buffers['awarded_quantity'].append(order.awarded_quantity)
 
         return order.id
 
@@ -41,6 +64,16 @@ class OrdersList:
         self.last_id_given += 1
         return self.last_id_given
 
+    def columns(self):
+        """
+        :return: a dict of NumPy arrays with one value per order, in the order they were added: zone, and the fields
+            in :py:data:`ORDER_COLUMNS`. The merit order is 0 for orders which have none.
+        """
+        columns = dict((name, np.frombuffer(buffer, dtype=buffer.typecode) if len(buffer) else
+                        np.zeros(0, dtype=buffer.typecode)) for name, buffer in self._buffers.items())
+        columns['zone'] = np.array(self._zones, dtype=object)
+        return columns
+
 
 class Order:
     def __init__(self):
@@ -52,21 +85,59 @@ class Order:
         self.zone = u''
         self.merit_order = None
         self.accepted = None
+        self.awarded_quantity = 0.0
 
     def __str__(self):
         return u'%s, %d, %.3f, %.3f, %d' % (
             self.zone, self.period, self.volume, self.price, self.merit_order)
 
 
+def record_fields(record):
+    """
+    :param record: a record element, e.g. OfferteOperatori.
+    :return: a dict mapping the tag of each child element of the record to its text.
+    """
+    return dict((field.tag, field.text) for field in record.iterchildren(tag=etree.Element))
+
+
+def iter_records(source, tag, fields=None):
+    """
+    Stream the records of an XML file without building its whole tree. Each record is cleared, and removed from the
+    root, once its fields are extracted, so that the memory used does not grow with the size of the file.
+
+    :param source: path or file object of the XML file, e.g. a member of a zip archive.
+    :param tag: tag of the records.
+    :param fields: tags of the fields to extract, None for all the fields. Selecting the fields only filters the
+        events of iterparse, lxml still builds an element for every tag of the record: the fields are read as their
+        events arrive, instead of iterating over all the children of the record.
+    :return: an iterator of dicts as returned by :py:func:`record_fields`.
+    """
+    tags = tag if fields is None else (tag,) + tuple(fields)
+    record = {}
+    for _, element in etree.iterparse(source, events=('end',), tag=tags):
+        if element.tag != tag:
+            record[element.tag] = element.text
+            continue
+
+        yield record if fields is not None else record_fields(element)
+        record = {}
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
 class GMEImporter:
-    def __init__(self, path, date):
+    def __init__(self, path, date, streaming=False):
         """
 
         :param path: Path to directory containing raw data files
         :param date: Date of the day to import
+        :param streaming: if True, stream the XML files with iterparse instead of parsing them into memory, and read
+            the public offers directly from their zip archive.
         """
         self.path = path
         self.date = date
+        self.streaming = streaming
 
         # Determine zones, connections between zones, and transmission limits
         self.all_periods = set()
@@ -78,15 +149,15 @@ class GMEImporter:
         # Read bids, create pun orders, demand and supply curves
         self.demand_orders = OrdersList()
         self.pun_orders = OrdersList()
-        self.awarded_pun_quantities = pd.DataFrame(columns=["DAY_ID", "PERIOD", "PUN_ID", "AWARDED_QUANTITY"])
         self.supply_orders = OrdersList()
         self.read_bids()
+        self.awarded_pun_quantities = self.awarded_pun_frame()
         self.read_cross_border_exchanges()  # Actually creates bids in COUPLING_ZONES
         self.all_periods = self.all_periods.union(self.merge_bid_periods())
         self.all_zones = self.all_zones.union(self.merge_bid_zones())
 
-        # Assign a unique ID to each zone.
-        self.zone_id = dict(zip(self.all_zones, range(1, len(self.all_zones) + 1)))
+        # Assign a unique ID to each zone, in alphabetical order so that IDs do not depend on the process.
+        self.zone_id = dict(zip(sorted(self.all_zones), range(1, len(self.all_zones) + 1)))
 
         # Prices
         self.real_prices = self.read_prices()
@@ -105,77 +176,106 @@ class GMEImporter:
         zones = zones.union(self.supply_orders.zones)
         return zones
 
+    def records(self, file_name, tag):
+        """
+        Iterate over the records of an XML file of the raw data.
+
+        :param file_name: name of the file in the folder of the raw data.
+        :param tag: tag of the records, children of the root element.
+        :return: an iterator of dicts mapping the tag of each field of a record to its text.
+        """
+        file_path = self.path + u'/' + file_name
+        if self.streaming:
+            return iter_records(file_path, tag)
+
+        tree = etree.parse(file_path)
+        return (record_fields(r) for r in tree.xpath(u'/NewDataSet/%s' % tag))
+
     def read_bids(self):
         """
         Read bids contained in file yyyymmddMGPOffertePubbliche.xml and dispatch by type (PUN, demand, supply)
 
+        In streaming mode, the file is read directly from the zip archive.
         """
-
-        # Unzip
         zip_file_path = self.path + u'/%sMGPOffertePubbliche.zip' % self.date
-        zip_ref = zipfile.ZipFile(zip_file_path, 'r')
-        zip_ref.extractall(self.path)
-        zip_ref.close()
-
-        # Parse
-        xml_file_path = self.path + u'/%sMGPOffertePubbliche.xml' % self.date
-        tree = etree.parse(xml_file_path)
-
-        for order in tree.xpath(u'/NewDataSet/OfferteOperatori'):
-
-            if order.find(u'STATUS_CD').text in ("INC", "REP", "REV"):
-                continue
-
-            o = Order()
-            o.order_type = u'DEMAND' if order.find(u'PURPOSE_CD').text == u'BID' else u'SUPPLY'
-            o.period = int(order.find(u'INTERVAL_NO').text)
-            o.price = float(order.find(u'ENERGY_PRICE_NO').text)
-            o.volume = float(order.find(u'ADJ_QUANTITY_NO').text)
-            o.zone = order.find(u'ZONE_CD').text
-            o.merit_order = int(order.find(u'MERIT_ORDER_NO').text)
-            o.accepted = (order.find(u'STATUS_CD').text == u'ACC')
-            name = order.find(u'UNIT_REFERENCE_NO').text
-
-            if o.order_type == u'DEMAND':
-                if o.price == 0.0 and o.accepted:
-                    o.price = MAXIMUM_PRICE
-
-                if o.zone in PUN_ZONES and not name.startswith(u'UP_'):
-                    o.order_type = u'PUN'
-
-            if o.order_type == u'DEMAND':
-                self.demand_orders.add(o)
-            elif o.order_type == u'PUN':
-                last_pun_id = self.pun_orders.add(o)
-                q = float(order.find(u'AWARDED_QUANTITY_NO').text)
-                self.awarded_pun_quantities = self.awarded_pun_quantities.append(dict(DAY_ID=self.date,
-                                                                                      PERIOD=o.period,
-                                                                                      PUN_ID=last_pun_id,
-                                                                                      AWARDED_QUANTITY=q),
-                                                                                 ignore_index=True)
-            elif o.order_type == u'SUPPLY':
-                self.supply_orders.add(o)
-            else:
-                raise ("Order %s cannot be affected to an OrdersList of a known type" % o)
+        xml_file_name = u'%sMGPOffertePubbliche.xml' % self.date
+
+        if self.streaming:
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                with zip_ref.open(xml_file_name) as xml_file:
+                    for record in iter_records(xml_file, u'OfferteOperatori', BID_FIELDS):
+                        self.add_bid(record)
+        else:
+            # Unzip
+            zip_ref = zipfile.ZipFile(zip_file_path, 'r')
+            zip_ref.extractall(self.path)
+            zip_ref.close()
 
-        # Delete unzipped xml
-        del tree
-        os.remove(xml_file_path)
+            # Parse
+            for record in self.records(xml_file_name, u'OfferteOperatori'):
+                self.add_bid(record)
+
+            # Delete unzipped xml
+            os.remove(self.path + u'/' + xml_file_name)
         print("Done for bids")
 
+    def add_bid(self, order):
+        """
+        Create an order from a record of the public offers and add it to the list of its type (PUN, demand, supply)
+
+        :param order: dict of the fields of an OfferteOperatori element.
+        """
+        if order[u'STATUS_CD'] in ("INC", "REP", "REV"):
+            return
+
+        o = Order()
+        o.order_type = u'DEMAND' if order[u'PURPOSE_CD'] == u'BID' else u'SUPPLY'
+        o.period = int(order[u'INTERVAL_NO'])
+        o.price = float(order[u'ENERGY_PRICE_NO'])
+        o.volume = float(order[u'ADJ_QUANTITY_NO'])
+        o.zone = order[u'ZONE_CD']
+        o.merit_order = int(order[u'MERIT_ORDER_NO'])
+        o.accepted = (order[u'STATUS_CD'] == u'ACC')
+        name = order[u'UNIT_REFERENCE_NO']
+
+        if o.order_type == u'DEMAND':
+            if o.price == 0.0 and o.accepted:
+                o.price = MAXIMUM_PRICE
+
+            if o.zone in PUN_ZONES and not name.startswith(u'UP_'):
+                o.order_type = u'PUN'
+
+        if o.order_type == u'DEMAND':
+            self.demand_orders.add(o)
+        elif o.order_type == u'PUN':
+            o.awarded_quantity = float(order[u'AWARDED_QUANTITY_NO'])
+            self.pun_orders.add(o)
+        elif o.order_type == u'SUPPLY':
+            self.supply_orders.add(o)
+        else:
+            raise ("Order %s cannot be affected to an OrdersList of a known type" % o)
+
+    def awarded_pun_frame(self):
+        """
+        :return: the quantity awarded to each PUN order, as a DataFrame with the columns of the AWARDED_PUN table.
+        """
+        columns = self.pun_orders.columns()
+        return pd.DataFrame(dict(DAY_ID=[self.date] * len(self.pun_orders), PERIOD=columns['period'],
+                                 PUN_ID=columns['id'], AWARDED_QUANTITY=columns['awarded_quantity']),
+                            columns=["DAY_ID", "PERIOD", "PUN_ID", "AWARDED_QUANTITY"])
+
     def read_network_data(self):
         line_id = 1
         connections = {}
         connection_data = {}
-        tree = etree.parse(self.path + u'/%sMGPLimitiTransito.xml' % self.date)
-        for l in tree.xpath(u'/NewDataSet/LimitiTransito'):
-            period = int(l.find(u'Ora').text)
+        for l in self.records(u'%sMGPLimitiTransito.xml' % self.date, u'LimitiTransito'):
+            period = int(l[u'Ora'])
             self.all_periods.add(period)
-            from_zone = l.find(u'Da').text
-            to_zone = l.find(u'A').text
+            from_zone = l[u'Da']
+            to_zone = l[u'A']
             self.all_zones.add(from_zone)
             self.all_zones.add(to_zone)
-            limit = float(l.find(u'Limite').text.replace(u',', u'.'))
+            limit = float(l[u'Limite'].replace(u',', u'.'))
 
             if (from_zone, to_zone) in connections:  # Capacity up
                 lid = connections[(from_zone, to_zone)]
@@ -197,18 +297,17 @@ class GMEImporter:
                 connection_data[line_id][period] = [0, limit]
                 line_id += 1
 
-        self.connections = {v: k for (k, v) in connections.iteritems()}
+        self.connections = {v: k for (k, v) in connections.items()}
         self.connection_data = connection_data
 
         print(u'Done reading lines')
 
     def read_cross_border_exchanges(self):
-        tree = etree.parse(self.path + u'/%sMGPQuantita.xml' % self.date)
-        for l in tree.xpath(u'/NewDataSet/Quantita'):
+        for l in self.records(u'%sMGPQuantita.xml' % self.date, u'Quantita'):
             for zone in COUPLING_ZONES:
-                period = int(l.find("Ora").text)
-                demand = float(l.find("%s_ACQUISTI" % zone).text.replace(',', '.'))
-                supply = float(l.find("%s_VENDITE" % zone).text.replace(',', '.'))
+                period = int(l["Ora"])
+                demand = float(l["%s_ACQUISTI" % zone].replace(',', '.'))
+                supply = float(l["%s_VENDITE" % zone].replace(',', '.'))
 
                 demand_order = Order()
                 demand_order.period = period
@@ -229,17 +328,20 @@ class GMEImporter:
         print(u'Done reading cross border exchanges')
 
     def read_prices(self):
-        all_zones_plus_PUN = list(self.all_zones)
+        all_zones_plus_PUN = sorted(self.all_zones)
         all_zones_plus_PUN.extend([u'PUN', u'NAT'])
 
-        prices = pd.DataFrame(columns=["DAY_ID", "Period"] + all_zones_plus_PUN)
-        tree = etree.parse(self.path + u'/%sMGPPrezzi.xml' % self.date)
-        for l in tree.xpath(u'/NewDataSet/Prezzi'):
-            zone_price = dict(Period=int(l.find("Ora").text), DAY_ID=self.date)
+        periods = array('l')
+        zone_prices = dict((zone, array('d')) for zone in all_zones_plus_PUN)
+        for l in self.records(u'%sMGPPrezzi.xml' % self.date, u'Prezzi'):
+            periods.append(int(l["Ora"]))
             for zone in all_zones_plus_PUN:
-                price = float(l.find(zone).text.replace(u',', u'.'))
-                zone_price[zone] = price
-            prices = prices.append(zone_price, ignore_index=True)
+                price = float(l[zone].replace(u',', u'.'))
+                zone_prices[zone].append(price)
+
+        prices = dict((zone, list(zone_prices[zone])) for zone in all_zones_plus_PUN)
+        prices.update(DAY_ID=[self.date] * len(periods), Period=list(periods))
+        prices = pd.DataFrame(prices, columns=["DAY_ID", "Period"] + all_zones_plus_PUN)
 
         print("Done reading and exporting price results")
         return prices
@@ -251,10 +353,22 @@ class GMEImporter:
         :param split_by_period: if True, generate a day_id by period instead one single day_id and n_periods periods
         :return:
         """
+        write_tables(conn, self.tables(split_by_period))
+        conn.commit()
+
+    def tables(self, split_by_period=False):
+        """
+        Rows of the imported data, by table, independent of any database so that they can be produced in a worker
+        process and written by another one.
+
+        :param split_by_period: see :py:meth:`to_sql`.
+        :return: an OrderedDict mapping each table name to its list of rows, or to a DataFrame for REAL_PRICES and
+            AWARDED_PUN.
+        """
+        tables = OrderedDict()
 
         # DAYS
         table = u'DAYS'
-        print("%s to sql" % table)
         data = []
         if split_by_period:
             for period in self.all_periods:
@@ -266,14 +380,12 @@ class GMEImporter:
             n_periods = len(self.all_periods)
             data.append([day_id, n_periods])
 
-        insert_in_table(conn, table, data)
-        conn.commit()
+        tables[table] = data
 
         # ZONES
         table = u'ZONES'
-        print("%s to sql" % table)
         data = []
-        for zone_name in self.all_zones:
+        for zone_name in sorted(self.all_zones):
             zone_id = self.zone_id[zone_name]
             if split_by_period:
                 for period in self.all_periods:
@@ -283,14 +395,12 @@ class GMEImporter:
                 day_id = int(self.date)
                 data.append([day_id, zone_id, zone_name, MINIMUM_PRICE, MAXIMUM_PRICE])
 
-        insert_in_table(conn, table, data)
-        conn.commit()
+        tables[table] = data
 
         # LINES
         table = u'LINES'
-        print("%s to sql" % table)
         data = []
-        for connection_id, value in self.connections.iteritems():
+        for connection_id, value in self.connections.items():
             id_from_zone = self.zone_id[value[0]]
             id_to_zone = self.zone_id[value[1]]
             if split_by_period:
@@ -301,16 +411,14 @@ class GMEImporter:
                 day_id = int(self.date)
                 data.append([day_id, connection_id, id_from_zone, id_to_zone])
 
-        insert_in_table(conn, table, data)
-        conn.commit()
+        tables[table] = data
 
         #  LINE_DATA
         table = u'LINE_DATA'
-        print("%s to sql" % table)
         data = []
 
-        for connection_id, periods in self.connection_data.iteritems():
-            for period, capacities in periods.iteritems():
+        for connection_id, periods in self.connection_data.items():
+            for period, capacities in periods.items():
                 if split_by_period:
                     day_id = self.pun_decomposition_day_id(period)
                     data.append([day_id, connection_id, 1, capacities[0], capacities[1]])
@@ -318,86 +426,78 @@ class GMEImporter:
                     day_id = int(self.date)
                     data.append([day_id, connection_id, period, capacities[0], capacities[1]])
 
-        insert_in_table(conn, table, data)
-        conn.commit()
+        tables[table] = data
 
         # PUN_ORDERS
         table = u'PUNORDERS'
-        print("%s to sql" % table)
+        orders = self.pun_orders.columns()
+        pun_zone = dict((zone, i) for i, zone in enumerate(PUN_ZONES))
+        zone_rank = np.array([pun_zone.get(zone, -1) for zone in orders['zone']], dtype=int)
+        rows = np.lexsort((orders['id'], orders['period'], zone_rank))
+        rows = rows[zone_rank[rows] >= 0]
+        periods = orders['period'][rows].tolist()
+        day_ids = [self.pun_decomposition_day_id(period) if split_by_period else int(self.date) for period in periods]
+        data = list(zip(day_ids, orders['id'][rows].tolist(), [self.zone_id[zone] for zone in orders['zone'][rows]],
+                        [1] * len(rows) if split_by_period else periods, orders['merit_order'][rows].tolist(),
+                        orders['volume'][rows].tolist(), orders['price'][rows].tolist()))
+
+        tables[table] = data
 
-        for zone in PUN_ZONES:
-            data = []
-            for period in self.all_periods:
-                for o in self.pun_orders.orders[zone][period]:
-                    if split_by_period:
-                        day_id = self.pun_decomposition_day_id(period)
-                        data.append([day_id, o.id, self.zone_id[zone], 1, o.merit_order, o.volume, o.price])
-                    else:
-                        day_id = int(self.date)
-                        data.append([day_id, o.id, self.zone_id[zone], period, o.merit_order, o.volume, o.price])
+        # CURVES
+        curves, curve_data = self.curves(self.demand_orders, u'DEMAND', 0, split_by_period)
+        supply_curves, supply_curve_data = self.curves(self.supply_orders, u'SUPPLY', len(curves), split_by_period)
+        tables[u'CURVES'] = curves + supply_curves
+        tables[u'CURVE_DATA'] = curve_data + supply_curve_data
 
-            insert_in_table(conn, table, data)
-            conn.commit()
+        # Realized prices and PUN quantities
+        tables[u'REAL_PRICES'] = self.real_prices
+        tables[u'AWARDED_PUN'] = self.awarded_pun_quantities
 
-        # CURVES
-        print("Curves and curve data to sql")
-
-        # DEMAND
-        curve_id = 0
-        for zone in self.all_zones:
-            curves = []
-            curve_data = []
-            demandeOrders = self.demand_orders.orders
-            if zone not in demandeOrders:
-                continue
-            for period in demandeOrders[zone]:
-                curve_id += 1
-                day_id = self.pun_decomposition_day_id(period) if split_by_period else int(self.date)
-                sql_period = 1 if split_by_period else period
-                curves.append([day_id, curve_id, self.zone_id[zone], sql_period, u'DEMAND'])
-                volume = 0
-                position = 0
-                for o in sorted(demandeOrders[zone][period], key=lambda x: -x.price):
-                    position += 1
-                    curve_data.append([day_id, curve_id, position, volume, o.price])
-                    position += 1
-                    volume += o.volume
-                    curve_data.append([day_id, curve_id, position, volume, o.price])
-
-            insert_in_table(conn, u'CURVES', curves)
-            insert_in_table(conn, u'CURVE_DATA', curve_data)
-            conn.commit()
-
-        # SUPPLY
-        for zone in self.all_zones:
-            curves = []
-            curve_data = []
-            supply_orders = self.supply_orders.orders
-            if zone not in supply_orders:
-                continue
-            for period in supply_orders[zone]:
+        return tables
+
+    def curves(self, orders, curve_type, first_curve_id, split_by_period):
+        """
+        Build the step curve of each zone and period from the orders of one type. The orders of a curve are sorted by
+        decreasing price for demand and increasing price for supply, each order giving two points of the curve.
+
+        :param orders: an :py:class:`OrdersList`.
+        :param curve_type: DEMAND or SUPPLY.
+        :param first_curve_id: the curves are numbered from first_curve_id + 1.
+        :param split_by_period: see :py:meth:`to_sql`.
+        :return: the rows of the CURVES and CURVE_DATA tables.
+        """
+        columns = orders.columns()
+        zone_ids = np.array([self.zone_id[zone] for zone in columns['zone']], dtype=int)
+        prices = -columns['price'] if curve_type == u'DEMAND' else columns['price']
+        rows = np.lexsort((prices, columns['period'], zone_ids))
+        zone_ids = zone_ids[rows]
+        periods = columns['period'][rows]
+        prices = columns['price'][rows].tolist()
+        volumes = columns['volume'][rows].tolist()
+
+        # Each curve is a run of orders with the same zone and period
+        new_curve = np.ones(len(rows), dtype=bool)
+        new_curve[1:] = (zone_ids[1:] != zone_ids[:-1]) | (periods[1:] != periods[:-1])
+        zone_ids = zone_ids.tolist()
+        periods = periods.tolist()
+
+        curves = []
+        curve_data = []
+        curve_id = first_curve_id
+        for i, new in enumerate(new_curve.tolist()):
+            if new:
                 curve_id += 1
-                day_id = self.pun_decomposition_day_id(period) if split_by_period else int(self.date)
-                sql_period = 1 if split_by_period else period
-                curves.append([day_id, curve_id, self.zone_id[zone], sql_period, u'SUPPLY'])
+                day_id = self.pun_decomposition_day_id(periods[i]) if split_by_period else int(self.date)
+                sql_period = 1 if split_by_period else periods[i]
+                curves.append([day_id, curve_id, zone_ids[i], sql_period, curve_type])
                 volume = 0
                 position = 0
-                for o in sorted(supply_orders[zone][period], key=lambda x: x.price):
-                    position += 1
-                    curve_data.append([day_id, curve_id, position, volume, o.price])
-                    position += 1
-                    volume += o.volume
-                    curve_data.append([day_id, curve_id, position, volume, o.price])
-
-            insert_in_table(conn, u'CURVES', curves)
-            insert_in_table(conn, u'CURVE_DATA', curve_data)
-            conn.commit()
-
-        # Realized prices
-        self.real_prices.to_sql("REAL_PRICES", conn, if_exists="append")
-
-        # Realized PUN quantities
-        self.awarded_pun_quantities.to_sql("AWARDED_PUN", conn, if_exists="append", index=False)
+            position += 1
+            curve_data.append([day_id, curve_id, position, volume, prices[i]])
+            position += 1
+            volume += volumes[i]
+            curve_data.append([day_id, curve_id, position, volume, prices[i]])
+        return curves, curve_data
 
     def pun_decomposition_day_id(self, period):
         """
@@ -409,6 +509,87 @@ class GMEImporter:
         return int(self.date) * 100 + period
 
 
+def write_tables(conn, tables):
+    """
+    Write the rows returned by :py:meth:`GMEImporter.tables`, without committing.
+
+    :param conn: a database connection.
+    :param tables: rows by table.
+    """
+    for table, data in tables.items():
+        print("%s to sql" % table)
+        if isinstance(data, pd.DataFrame):
+            data.to_sql(table, conn, if_exists="append", index=(table == u'REAL_PRICES'))
+        else:
+            insert_in_table(conn, table, data)
+
+
+def import_date(path, date, split_by_period=False, streaming=False):
+    """
+    Import the data of one date.
+
+    :return: the rows by table, see :py:meth:`GMEImporter.tables`.
+    """
+    print("Importing PUN data for day %s " % date)
+    return GMEImporter(path, date, streaming=streaming).tables(split_by_period)
+
+
+def _import_date(args):
+    return import_date(*args)
+
+
+def import_dates(conn, path, dates, split_by_period=False, streaming=False, jobs=1, batch=10):
+    """
+    Import a series of dates into a database.
+
+    With jobs > 1, the dates are read by a pool of worker processes and the rows are written by the calling process
+    only, in the order of the dates. All the IDs of a date are given by its own importer, so the database does not
+    depend on the number of jobs.
+
+    :param conn: a database connection.
+    :param path: path to the directory containing the raw data files.
+    :param dates: list of dates, as YYYYMMDD strings.
+    :param split_by_period: see :py:meth:`GMEImporter.to_sql`.
+    :param streaming: see :py:class:`GMEImporter`.
+    :param jobs: number of dates read in parallel.
+    :param batch: number of dates written per transaction.
+    """
+    tasks = [(path, date, split_by_period, streaming) for date in dates]
+    pool = None
+    if jobs <= 1 or len(dates) <= 1:
+        results = (_import_date(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        results = _ordered_results(pool, _import_date, tasks, 2 * jobs)
+
+    try:
+        for i, tables in enumerate(results):
+            write_tables(conn, tables)
+            if (i + 1) % batch == 0:
+                conn.commit()
+        conn.commit()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _ordered_results(pool, func, tasks, window):
+    """
+    Apply func to the tasks in the pool, with at most window tasks submitted and not consumed, so that the results
+    waiting to be written do not pile up in memory.
+
+    :return: an iterator of the results, in the order of the tasks.
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
 if __name__ == "__main__":
 
     parser = ArgumentParser(description='Utility for importing GME data.')
@@ -429,6 +610,15 @@ if __name__ == "__main__":
                         help="Split daily data hour by hour",
                         action="store_true",
                         default=False)
+    parser.add_argument("--stream",
+                        help="Stream the XML files instead of loading them in memory",
+                        action="store_true",
+                        default=False)
+    parser.add_argument("-j", "--jobs", type=int, help="Number of days read in parallel.", default=1)
+    parser.add_argument("--batch", type=int, help="Number of days written per transaction.", default=10)
+    parser.add_argument("--offline",
+                        help="Faster writes, without crash safety: write-ahead log and no sync to disk.",
+                        action="store_true")
 
     args = parser.parse_args()
 
@@ -439,15 +629,21 @@ if __name__ == "__main__":
         os.remove(database_name)
 
     conn = sqlite3.connect(database_name)
+    if args.offline:
+        set_offline_pragmas(conn)
 
     if not args.append:
-        create_tables(conn)
+        create_tables(conn, indexes=False)
+
+    dates = [str(date) for date in range(int(args.from_date), int(args.to_date)+1)]
+    import_dates(conn, path, dates, split_by_period=args.split, streaming=args.stream, jobs=args.jobs,
+                 batch=args.batch)
 
-    for date in range(int(args.from_date), int(args.to_date)+1):
-        date_str = str(date)
-        print("Importing PUN data for day %s " % date_str)
-        importer = GMEImporter(path, date_str)
-        importer.to_sql(conn, split_by_period=args.split)
+    if not args.append:
+        create_indexes(conn)
+        conn.commit()
+    if args.offline:
+        restore_pragmas(conn)
 
     conn.close()
 
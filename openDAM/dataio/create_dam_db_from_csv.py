@@ -1,8 +1,17 @@
 import os
+import time
+import threading
 from argparse import ArgumentParser
+from itertools import islice
+from multiprocessing.pool import ThreadPool
 import pandas
 import sqlite3
 
+try:
+    from queue import Queue, Full, Empty
+except ImportError:  # Python 2
+    from Queue import Queue, Full, Empty
+
 
 TABLES = dict(
     BLOCKS='DAY_ID INTEGER, BLOCK_ID INTEGER, ZONE_ID INTEGER, PRICE NUMBER, MIN_RATIO NUMBER',
@@ -17,11 +26,36 @@ TABLES = dict(
     ZONES='DAY_ID INTEGER, ZONE_ID INTEGER, NAME TEXT, MINIMUMPRICE NUMBER, MAXIMUMPRICE NUMBER',
     DAYS='DAY_ID INTEGER, NPERIODS INTEGER')
 
+## Columns of the index of each table, matching the order in which dam_db_loader reads them.
+INDEXES = dict(
+    BLOCKS='DAY_ID, BLOCK_ID',
+    BLOCK_DATA='DAY_ID, BLOCK_ID, PERIOD',
+    PUNORDERS='DAY_ID, ZONE_ID, PRICE',
+    LINE_DATA='DAY_ID, LINE_ID, PERIOD',
+    LINES='DAY_ID, LINE_ID',
+    COMPLEXORDER_DATA='DAY_ID, COMPLEX_ID, PERIOD, POSITION',
+    COMPLEXORDERS='DAY_ID, COMPLEX_ID',
+    CURVE_DATA='DAY_ID, CURVE_ID, POSITION',
+    CURVES='DAY_ID, CURVE_ID',
+    ZONES='DAY_ID, ZONE_ID',
+    DAYS='DAY_ID')
+
+## Number of rows inserted per transaction by bulk_insert.
+BULK_BATCH = 100000
+
+## Number of rows read at once from a CSV file by read_csv_chunks.
+CSV_CHUNK = 100000
+
+## pandas dtype of each SQL type of the columns in TABLES. Integers are nullable, so that empty cells become NULL.
+DTYPES = dict(INTEGER='Int64', NUMBER='float64', REAL='float64', TEXT='object')
 
-def create_tables(conn, tables=None):
+
+def create_tables(conn, tables=None, indexes=True):
     """
 
     :param conn: a connection to the database.
+    :param indexes: False to defer the creation of the indexes, with :py:func:`create_indexes`, after the tables are
+        loaded, which is faster than updating the indexes at each insert.
     """
     curs = conn.cursor()
 
@@ -29,6 +63,22 @@ def create_tables(conn, tables=None):
     for table in TABLES.keys() if not tables else tables:
         curs.execute("CREATE TABLE %s (%s);" % (table, TABLES[table]))
 
+    if indexes:
+        create_indexes(conn, tables)
+
+
+def create_indexes(conn, tables=None):
+    """
+    Create the indexes of the tables, if they do not exist yet. Can be applied to an existing database.
+
+    :param conn: a connection to the database.
+    :param tables: list of table names, all the tables if None.
+    """
+    curs = conn.cursor()
+
+    for table in TABLES.keys() if not tables else tables:
+        curs.execute("CREATE INDEX IF NOT EXISTS %s_IDX ON %s (%s);" % (table, table, INDEXES[table]))
+
 
 def load_csv_data(conn, path):
     """
@@ -43,21 +93,178 @@ def load_csv_data(conn, path):
         df = pandas.read_csv('%s/%s.csv' % (path, table), index_col="DAY_ID")
         df.to_sql(table, conn, if_exists="append")
 
-def insert_in_table(conn, table_name, data):
-    cursor = conn.cursor()
 
+def read_csv_chunks(path, table_name, chunksize=CSV_CHUNK):
+    """
+    Read the CSV file of a table by chunks of rows, with the types of the columns of the table.
+
+    :param path: path to the CSV file.
+    :param table_name: name of the table.
+    :param chunksize: number of rows per chunk.
+    :return: an iterator of lists of rows, with the values of the columns of the table in order, as Python values,
+        None for missing values.
+    """
     col_names = get_col_names(table_name)
+    dtypes = dict((name, DTYPES[col_type]) for name, col_type in get_col_types(table_name))
+    for df in pandas.read_csv('%s/%s.csv' % (path, table_name), usecols=col_names, dtype=dtypes,
+                              chunksize=chunksize):
+        columns = []
+        for name in col_names:
+            values = df[name]
+            if values.isnull().any():
+                values = values.astype(object).where(values.notnull(), None)
+            columns.append(values.tolist())
+        yield list(zip(*columns))
+
+
+def load_csv_chunks(conn, path, tables=None, jobs=2, chunksize=CSV_CHUNK):
+    """
+    Create table content from input files in CSV format, streaming each file by chunks instead of loading it in
+    memory, see :py:func:`read_csv_chunks`.
+
+    The files are read concurrently by a pool of jobs threads, and the chunks are inserted as they come by the
+    calling thread, SQLite allowing a single writer, each chunk in its own transaction.
 
-    for row in data:
-        cmd = "INSERT INTO %s (%s) values (%s)" % (table_name, ','.join(col_names), ', '.join('?'*len(col_names)))
-        #print(cmd)
-        cursor.execute(cmd, row)
+    :param conn: a connection to the database.
+    :param path: path to the CSV files.
+    :param tables: list of table names, all the tables if None.
+    :param jobs: number of files read concurrently.
+    :param chunksize: number of rows per chunk.
+    :return: a dict mapping each table to its number of rows and the time from the start of its reading to the end
+        of its insertion.
+    """
+    tables = list(TABLES.keys()) if not tables else tables
+    chunks = Queue(maxsize=2 * jobs)
+    stop = threading.Event()
+    started = {}
+
+    def put(item):
+        # The readers give up when the insertion stopped, instead of waiting forever for room in the queue.
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def read(table):
+        started[table] = time.time()
+        try:
+            for rows in read_csv_chunks(path, table, chunksize):
+                if not put((table, rows)):
+                    return
+        except Exception as e:
+            put((table, e))
+        else:
+            put((table, None))
+
+    pool = ThreadPool(jobs)
+    result = None
+    try:
+        result = pool.map_async(read, tables)
+        statement = dict((table, insert_statement(table)) for table in tables)
+        stats = dict((table, [0, 0.0]) for table in tables)
+        remaining = len(tables)
+        while remaining:
+            table, rows = chunks.get()
+            if isinstance(rows, Exception):
+                raise rows
+            if rows is None:
+                stats[table][1] = time.time() - started[table]
+                remaining -= 1
+                continue
+            with conn:
+                conn.executemany(statement[table], rows)
+            stats[table][0] += len(rows)
+    finally:
+        stop.set()
+        while True:
+            try:
+                chunks.get_nowait()
+            except Empty:
+                break
+        if result is not None:
+            result.wait()
+        pool.terminate()
+
+    return dict((table, tuple(stat)) for table, stat in stats.items())
+
+
+def set_offline_pragmas(conn):
+    """
+    Speed up the writes of a database built offline: write-ahead log, and no sync to disk, so that the database may
+    be corrupted if the machine crashes during the build. Call :py:func:`restore_pragmas` once the build is done.
+
+    :param conn: a connection to the database.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+
+def restore_pragmas(conn):
+    """
+    Undo :py:func:`set_offline_pragmas` at the end of the build. The journal mode is stored in the database file, and
+    the readers and writers of a WAL database would keep its -wal and -shm side files.
+
+    :param conn: a connection to the database, with no open transaction.
+    """
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA synchronous=FULL")
+
+
+def insert_statement(table_name):
+    """
+    :return: the parameterized INSERT statement of a table.
+    """
+    col_names = get_col_names(table_name)
+    return "INSERT INTO %s (%s) values (%s)" % (table_name, ','.join(col_names), ', '.join('?'*len(col_names)))
+
+
+def insert_in_table(conn, table_name, data):
+    """
+    Insert rows in a table, in the current transaction.
+
+    :param conn: a connection to the database.
+    :param table_name: name of the table.
+    :param data: list of rows, each row being a sequence of values of the columns of the table.
+    """
+    conn.executemany(insert_statement(table_name), data)
+
+
+def bulk_insert(conn, table_name, rows, batch=BULK_BATCH):
+    """
+    Insert rows in a table and commit them, one transaction per batch of rows.
+
+    :param conn: a connection to the database.
+    :param table_name: name of the table.
+    :param rows: iterable of rows, e.g. a generator, consumed batch by batch.
+    :param batch: number of rows per transaction.
+    :return: the number of rows inserted.
+    """
+    statement = insert_statement(table_name)
+    rows = iter(rows)
+    n = 0
+    while True:
+        data = list(islice(rows, batch))
+        if not data:
+            return n
+        with conn:
+            conn.executemany(statement, data)
+        n += len(data)
 
 
 def get_col_names(table_name):
     return [col.split(u' ')[0] for col in TABLES[table_name].split(u', ')]
 
 
+def get_col_types(table_name):
+    """
+    :return: the list of (name, SQL type) of the columns of a table.
+    """
+    return [tuple(col.split(u' ')[:2]) for col in TABLES[table_name].split(u', ')]
+
+
 if __name__ == "__main__":
     parser = ArgumentParser(
         description='Utility for day-ahead electricity market clearing algorithm: store CSV files in DB')
@@ -66,6 +273,16 @@ if __name__ == "__main__":
     parser.add_argument("-d", "--database",
                         help="Name of the sqlite database file, under the folder of the --path argument.",
                         default='tests.sqlite3')
+    parser.add_argument("--offline",
+                        help="Faster build, without crash safety: write-ahead log and no sync to disk.",
+                        action="store_true")
+    parser.add_argument("--stream",
+                        help="Read the CSV files by chunks with the column types of the tables, instead of loading "
+                             "them in memory.",
+                        action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of CSV files read concurrently with --stream.",
+                        default=2)
+    parser.add_argument("--chunksize", type=int, help="Number of rows per chunk with --stream.", default=CSV_CHUNK)
 
     args = parser.parse_args()
 
@@ -76,8 +293,21 @@ if __name__ == "__main__":
     if dbName in os.listdir(path):
         os.remove(absolute_db_path)
     conn = sqlite3.connect(absolute_db_path)
+    if args.offline:
+        set_offline_pragmas(conn)
 
-    create_tables(conn)
-    load_csv_data(conn, path)
+    create_tables(conn, indexes=False)
+    if args.stream:
+        stats = load_csv_chunks(conn, path, jobs=args.jobs, chunksize=args.chunksize)
+        for table in sorted(stats):
+            rows, t = stats[table]
+            print("%-17s: %10d rows in %8.2fs, %10.0f rows/s" % (table, rows, t, rows / t if t > 0 else 0.0))
+    else:
+        load_csv_data(conn, path)
+    create_indexes(conn)
+    conn.commit()
+    if args.offline:
+        restore_pragmas(conn)
+    conn.close()
 
     print("DONE")
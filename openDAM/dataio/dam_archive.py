@@ -0,0 +1,194 @@
+"""
+Columnar archive of the days of a database, as an alternative input to the SQLite database for long back-tests.
+
+The archive is a folder with a sub-folder per table of :py:data:`dam_db_loader.DAY_TABLES`. It holds one .npy file
+per column read by the loader, with the rows of all the days sorted by day and in the order of the loader queries,
+and a _days.npy and an _offsets.npy file giving the rows of each day. Columns with NULL values have a boolean mask in
+a .null.npy file. The files are memory-mapped by :py:class:`ArchiveLoader`, which slices the rows of a day by offset
+instead of querying the database.
+
+Create an archive from the master directory, e.g.
+``python openDAM/dataio/dam_archive.py -p data/tests -d tests.sqlite3 -a tests_archive``.
+"""
+import os
+import sys
+import json
+import shutil
+import sqlite3
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from openDAM.dataio.create_dam_db_from_csv import get_col_types
+from openDAM.dataio.dam_db_loader import Loader, DAY_TABLES
+
+## Version of the archive format, stored in the archive.json file of the archive.
+FORMAT = 1
+
+## dtype of the columns of the archive for each SQL type of the columns in TABLES, the strings being sized when
+#  the archive is created.
+ARCHIVE_DTYPES = dict(INTEGER=np.int64, NUMBER=np.float64, TEXT=np.str_)
+
+## Number of rows fetched at once from the database during the conversion.
+CONVERT_CHUNK = 100000
+
+
+def convert(db_file, archive_path, chunksize=CONVERT_CHUNK):
+    """
+    Create the archive of all the days of a database. An existing archive is replaced.
+
+    :param db_file: path to the database file.
+    :param archive_path: folder of the archive.
+    :param chunksize: number of rows converted at once, which bounds the memory used by the conversion.
+    :return: a dict mapping each table to its number of rows.
+    """
+    if os.path.exists(archive_path):
+        shutil.rmtree(archive_path)
+    os.makedirs(archive_path)
+
+    conn = sqlite3.connect(db_file)
+    counts = {}
+    meta = OrderedDict(format=FORMAT, tables=OrderedDict())
+    for table, colnames, order in DAY_TABLES:
+        folder = '%s/%s' % (archive_path, table)
+        os.makedirs(folder)
+        col_types = dict(get_col_types(table))
+
+        days, sizes = [], []
+        for day, size in conn.execute('select DAY_ID, count(*) from %s group by DAY_ID order by DAY_ID' % table):
+            days.append(day)
+            sizes.append(size)
+        n = sum(sizes)
+        counts[table] = n
+        np.save('%s/_days.npy' % folder, np.array(days, dtype=np.int64))
+        np.save('%s/_offsets.npy' % folder, np.cumsum([0] + sizes).astype(np.int64))
+
+        columns = []
+        for name in colnames:
+            dtype = ARCHIVE_DTYPES[col_types[name]]
+            if dtype is np.str_:
+                width = conn.execute('select max(length(%s)) from %s' % (name, table)).fetchone()[0] or 1
+                dtype = np.dtype((np.str_, width))
+            values = new_column('%s/%s.npy' % (folder, name), dtype, n)
+            nulls = None
+            if conn.execute('select count(*) from %s where %s is null' % (table, name)).fetchone()[0]:
+                nulls = new_column('%s/%s.null.npy' % (folder, name), bool, n)
+            columns.append((values, nulls))
+
+        curs = conn.execute('select %s from %s order by DAY_ID%s' % (', '.join(colnames), table,
+                                                                    ', %s' % order if order else ''))
+        start = 0
+        rows = curs.fetchmany(chunksize)
+        while rows:
+            end = start + len(rows)
+            for i, (values, nulls) in enumerate(columns):
+                column = [r[i] for r in rows]
+                if nulls is not None:
+                    nulls[start:end] = [v is None for v in column]
+                    fill = u'' if values.dtype.kind == 'U' else (0 if values.dtype.kind == 'i' else np.nan)
+                    column = [fill if v is None else v for v in column]
+                values[start:end] = column
+            start = end
+            rows = curs.fetchmany(chunksize)
+        for values, nulls in columns:
+            if isinstance(values, np.memmap):
+                values.flush()
+            if isinstance(nulls, np.memmap):
+                nulls.flush()
+        meta['tables'][table] = colnames
+    conn.close()
+
+    with open('%s/archive.json' % archive_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    return counts
+
+
+def new_column(file_name, dtype, n):
+    """
+    :return: a writable column of n values of the given dtype, memory-mapped to a new .npy file if n > 0.
+    """
+    if n == 0:
+        np.save(file_name, np.zeros(0, dtype=dtype))
+        return np.zeros(0, dtype=dtype)
+    return np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=(n,))
+
+
+class ArchiveLoader(Loader):
+    """
+    Loader reading the days from an archive created by :py:func:`convert` instead of the database.
+    """
+
+    def __init__(self, archive_path):
+        """
+
+        :param archive_path: folder of the archive.
+        """
+        with open('%s/archive.json' % archive_path) as f:
+            meta = json.load(f)
+        if meta['format'] != FORMAT:
+            raise ValueError('Archive %s has format %s, expected %d' % (archive_path, meta['format'], FORMAT))
+
+        self.conn = None
+        self._init_reader()
+
+        self.path = archive_path
+        self.tables = OrderedDict()  #: table -> (days, offsets, list of (values, nulls) memory-mapped columns)
+        for table, _, _ in DAY_TABLES:
+            folder = '%s/%s' % (archive_path, table)
+            columns = []
+            for name in meta['tables'][table]:
+                null_file = '%s/%s.null.npy' % (folder, name)
+                columns.append((np.load('%s/%s.npy' % (folder, name), mmap_mode='r'),
+                                np.load(null_file, mmap_mode='r') if os.path.exists(null_file) else None))
+            self.tables[table] = (np.load('%s/_days.npy' % folder), np.load('%s/_offsets.npy' % folder), columns)
+
+    def get_all_days(self):
+        """
+        Returns a list of  all the days present in the archive.
+        """
+        return self.tables['DAYS'][0].tolist()
+
+    def read_day_rows(self, day):
+        """
+        Slice the rows of a day in the columns of the archive.
+
+        :param day: the day to read.
+        :return: an OrderedDict mapping the names of :py:data:`dam_db_loader.DAY_QUERIES` to the lists of rows of
+            the day.
+        """
+        rows = OrderedDict()
+        for table, (days, offsets, columns) in self.tables.items():
+            i = np.searchsorted(days, day)
+            if i == len(days) or days[i] != day:
+                rows[table] = []
+                continue
+            start, end = offsets[i], offsets[i + 1]
+            values = []
+            for column, nulls in columns:
+                v = column[start:end].tolist()
+                if nulls is not None:
+                    v = [None if null else x for x, null in zip(v, nulls[start:end].tolist())]
+                values.append(v)
+            rows[table] = list(zip(*values))
+        return rows
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Utility for day-ahead electricity market clearing algorithm: convert a '
+                                        'database into a columnar archive')
+    parser.add_argument("-p", "--path", help="Folder where data is located", default='data')
+    parser.add_argument("-d", "--database",
+                        help="Name of the sqlite database file, under the folder of the --path argument.",
+                        default='tests.sqlite3')
+    parser.add_argument("-a", "--archive", help="Name of the archive folder, under the folder of the --path argument.",
+                        default='archive')
+    parser.add_argument("--chunksize", type=int, help="Number of rows converted at once.", default=CONVERT_CHUNK)
+    args = parser.parse_args()
+
+    counts = convert("%s/%s" % (args.path, args.database), "%s/%s" % (args.path, args.archive), args.chunksize)
+    for table in sorted(counts):
+        print("%-17s: %10d rows" % (table, counts[table]))
+    print("DONE")
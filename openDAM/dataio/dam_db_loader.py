@@ -1,8 +1,13 @@
+import hashlib
 import logging
 import sqlite3
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
 
 import openDAM.conf.options as options
-from openDAM.dataio.create_dam_db_from_csv import get_col_names, TABLES
+from openDAM.dataio.create_dam_db_from_csv import get_col_names, get_col_types, TABLES
+from openDAM.dataio.day_snapshot import SnapshotCache
 from openDAM.model.ComplexOrder import *
 from openDAM.model.Line import *
 from openDAM.model.PunOrder import PunOrder
@@ -11,10 +16,64 @@ from openDAM.model.Zone import *
 from openDAM.model.complex_order_model import COMPLEX_DAM
 from openDAM.model.pun_dam_model import PUN_DAM
 
+## Number of rows fetched at once from the database.
+FETCH_SIZE = 10000
+
+ZONE_COLNAMES = ['ZONE_ID', 'NAME', 'MINIMUMPRICE', 'MAXIMUMPRICE']
+ZONE_COLS = dict(zip(ZONE_COLNAMES, range(len(ZONE_COLNAMES))))
+CURVES_COLNAMES = ['CURVE_ID', 'ZONE_ID', 'PERIOD', 'TYPE']
+CURVE_DATA_COLNAMES = ['CURVE_ID', 'QUANTITY', 'PRICE']
+COMPLEX_ORDERS_COLNAMES = ['COMPLEX_ID', 'ZONE_ID', 'TYPE', 'FIXED_TERM', 'VARIABLE_TERM', 'RAMP_UP', 'RAMP_DOWN',
+                           'SCHEDULED_STOP_PERIODS']
+COMPLEX_ORDERS_COLS = dict(zip(COMPLEX_ORDERS_COLNAMES, range(len(COMPLEX_ORDERS_COLNAMES))))
+PUN_ORDERS_COLNAMES = ['PUN_ID', 'ZONE_ID', 'PERIOD', 'MERIT_ORDER', 'VOLUME', 'PRICE']
+PUN_ORDERS_COLS = dict(zip(PUN_ORDERS_COLNAMES, range(len(PUN_ORDERS_COLNAMES))))
+BLOCK_DATA_COLNAMES = get_col_names('BLOCK_DATA')
+BLOCK_DATA_COLS = dict(zip(BLOCK_DATA_COLNAMES, range(len(BLOCK_DATA_COLNAMES))))
+BLOCKS_COLNAMES = get_col_names('BLOCKS')
+BLOCKS_COLS = dict(zip(BLOCKS_COLNAMES, range(len(BLOCKS_COLNAMES))))
+
+## Tables read for a day, in the order in which their rows are consumed by Loader.create_day: name, columns read and
+#  order of the rows.
+DAY_TABLES = [
+    ('DAYS', ['NPERIODS'], None),
+    ('ZONES', ZONE_COLNAMES, 'ZONE_ID'),
+    ('CURVES', CURVES_COLNAMES, 'CURVE_ID'),
+    ('CURVE_DATA', CURVE_DATA_COLNAMES, 'CURVE_ID, POSITION'),
+    ('COMPLEXORDERS', COMPLEX_ORDERS_COLNAMES, 'COMPLEX_ID'),
+    ('COMPLEXORDER_DATA', ['COMPLEX_ID', 'PERIOD', 'QUANTITY', 'PRICE'], 'COMPLEX_ID, PERIOD, POSITION'),
+    ('BLOCKS', BLOCKS_COLNAMES, 'BLOCK_ID'),
+    ('BLOCK_DATA', BLOCK_DATA_COLNAMES, 'BLOCK_ID, PERIOD'),
+    ('LINES', ['LINE_ID', 'ZONE_FROM', 'ZONE_TO'], 'LINE_ID'),
+    ('LINE_DATA', ['LINE_ID', 'PERIOD', 'CAPACITY_UP', 'CAPACITY_DOWN'], 'LINE_ID, PERIOD'),
+    ('PUNORDERS', PUN_ORDERS_COLNAMES, 'ZONE_ID, PRICE DESC')]
+
+## Queries reading a day, by table, see DAY_TABLES.
+DAY_QUERIES = [(table, 'select %s from %s where DAY_ID = ?%s' % (', '.join(colnames), table,
+                                                                 ' order by %s' % order if order else ''))
+               for table, colnames, order in DAY_TABLES]
+
+
+def _signature_terms(table, colnames):
+    types = dict(get_col_types(table))
+    terms = ['count(*)', 'total(rowid)']
+    for col in colnames:
+        if types[col] == 'TEXT':
+            terms += ['total(length(%s))' % col, 'group_concat(%s)' % col]
+        else:
+            terms += ['total(%s)' % col, 'total(%s * rowid)' % col]
+    return terms
+
+
+## Queries summarizing the rows of a day in each table of DAY_TABLES, computed by the database without returning the
+#  rows: their number, the sums of their row ids and of each column, plain and weighted by the row ids.
+DAY_SIGNATURE_QUERIES = ['select %s from %s where DAY_ID = ?' % (', '.join(_signature_terms(table, colnames)), table)
+                         for table, colnames, order in DAY_TABLES]
+
 
 class Loader:
 
-    def __init__(self, db_path, db_name):
+    def __init__(self, db_path, db_name, snapshots=None):
         """
         Generate an instance of the :py:class:DAM from a sqlite database.
 
@@ -23,85 +82,128 @@ class Loader:
 
         :param db_path: Path to the folder containing the sqlite database.
         :param db_name: name of the sqlite3 file.
+        :param snapshots: folder of a :py:class:`day_snapshot.SnapshotCache` of the days of the database, None to
+            always read the days from the database.
         """
 
         self.conn = sqlite3.connect("%s/%s" % (db_path, db_name))  #: connection to the database
         self.curs = self.conn.cursor()  #: cursor to the database
+        self._init_reader()
+        if snapshots is not None:
+            self.snapshots = SnapshotCache(snapshots, "%s/%s" % (db_path, db_name))
+
+    def _init_reader(self):
+        """
+        Initialize the state used to build the days from their rows, whatever the source of the rows.
+        """
         self.day_id = None  #: the day that is considered
         self.n_periods = None  #: The number of periods of that day
-        self.curves_colnames = ['CURVE_ID', 'ZONE_ID', 'PERIOD', 'TYPE']
+        self.curves_colnames = CURVES_COLNAMES
         self.curves_cols = dict(zip(self.curves_colnames, range(len(self.curves_colnames))))
-        self.curve_data_colnames = ['CURVE_ID', 'QUANTITY', 'PRICE']
+        self.curve_data_colnames = CURVE_DATA_COLNAMES
         self.curve_data_cols = dict(zip(self.curve_data_colnames, range(len(self.curve_data_colnames))))
+        self.snapshots = None  #: :py:class:`day_snapshot.SnapshotCache` of the days, if any
 
     def get_all_days(self):
         """
         Returns a list of  all the days present in the database.
         """
-        self.curs.execute('select day_id from DAYS order by day_id')
-        all_days = [x[0] for x in self.curs.fetchall()]
-        return all_days
+        return [x[0] for x in self._select('select DAY_ID from DAYS order by DAY_ID')]
+
+    def _select(self, query, *params):
+        """
+        Execute a parameterized query and stream the resulting rows, FETCH_SIZE at a time.
+
+        Each call uses its own cursor, so that several result sets can be consumed in parallel.
+
+        :param query: sql query, with ? placeholders.
+        :param params: values of the placeholders.
+        """
+        curs = self.conn.cursor()
+        curs.execute(query, params)
+        rows = curs.fetchmany(FETCH_SIZE)
+        while rows:
+            for row in rows:
+                yield row
+            rows = curs.fetchmany(FETCH_SIZE)
 
     def read_day(self, day):
         """
-        Read a particular day in the database.
+        Read a particular day in the database, or in the snapshot cache if the loader has one.
 
         :param day: the day to read.
         :return: a DAM object.
         """
 
-        self.day_id = day
+        logging.info('Reading day %d' % day)
+
+        if self.snapshots is not None:
+            rows = self.snapshots.rows(day, self.read_day_rows, self.day_signature)
+        else:
+            rows = self.read_day_rows(day)
+        return self.create_day(day, rows)
+
+    def day_signature(self, day):
+        """
+        Summarize the rows of a day in the tables it is read from, so that a snapshot of the day remains valid when
+        only other days or other tables, e.g. the results of a run, are modified.
+
+        :param day: the day.
+        :return: the sha1 hex digest of the results of :py:data:`DAY_SIGNATURE_QUERIES`.
+        """
+        h = hashlib.sha1()
+        for query in DAY_SIGNATURE_QUERIES:
+            h.update(repr(self.curs.execute(query, (day,)).fetchone()).encode())
+        return h.hexdigest()
+
+    def read_day_rows(self, day):
+        """
+        Execute the queries of a day.
+
+        :param day: the day to read.
+        :return: an OrderedDict mapping the names of :py:data:`DAY_QUERIES` to the lists of rows of the day.
+        """
+        return OrderedDict((name, list(self._select(query, day))) for name, query in DAY_QUERIES)
 
-        logging.info('Reading day %d' % self.day_id)
+    def create_day(self, day, rows):
+        """
+        Create the DAM object of a day from its rows.
 
-        self._read_day_info(day)
-        zones = self._read_zones()
-        curves = self._read_curves()
-        complex_orders = self._read_complex_orders()
-        block_orders = self._read_block_orders()
-        lines = self._read_lines()
-        pun_orders = self._read_PUN_orders()
+        :param day: the day.
+        :param rows: the rows of the day, as returned by :py:meth:`read_day_rows`.
+        :return: a DAM object.
+        """
+
+        self.day_id = day
+        self.n_periods = int(rows['DAYS'][0][0])
+        zones = self._create_zones(rows['ZONES'])
+        curves = self._create_curves(rows['CURVES'], rows['CURVE_DATA'])
+        complex_orders = self._create_complex_orders(rows['COMPLEXORDERS'], rows['COMPLEXORDER_DATA'])
+        block_orders = self._create_block_orders(rows['BLOCKS'], rows['BLOCK_DATA'])
+        lines = self._create_lines(rows['LINES'], rows['LINE_DATA'])
+        pun_orders = self._create_PUN_orders(rows['PUNORDERS'])
 
         assert (not (complex_orders and pun_orders))
 
         if pun_orders:
             return PUN_DAM(day, zones, curves, block_orders, pun_orders, lines, loader=self)
         else:
-            return COMPLEX_DAM(day, zones, curves, block_orders, pun_orders, lines)
-
-    def _read_day_info(self, day):
-        self.curs.execute('select NPERIODS from DAYS where day_id = %d' % day)
-        self.n_periods = int(self.curs.fetchall()[0][0])
-
-    def _read_zones(self):
-        zone_colnames = ['ZONE_ID', 'NAME', 'MINIMUMPRICE', 'MAXIMUMPRICE']
-        zone_cols = dict(zip(zone_colnames, range(len(zone_colnames))))
-        self.curs.execute(
-            'select %s from ZONES where day_id = %d order by ZONE_ID' % (', '.join(zone_colnames), self.day_id))
+            return COMPLEX_DAM(day, zones, curves, block_orders, complex_orders, lines)
 
+    def _create_zones(self, zones):
         all_zones = {}
-        for z in self.curs.fetchall():
-            all_zones[z[zone_cols['ZONE_ID']]] = Zone(z[zone_cols['ZONE_ID']], z[zone_cols['NAME']],
-                                                      z[zone_cols['MINIMUMPRICE']], z[zone_cols['MAXIMUMPRICE']])
+        for z in zones:
+            all_zones[z[ZONE_COLS['ZONE_ID']]] = Zone(z[ZONE_COLS['ZONE_ID']], z[ZONE_COLS['NAME']],
+                                                      z[ZONE_COLS['MINIMUMPRICE']], z[ZONE_COLS['MAXIMUMPRICE']])
         return all_zones
 
-    def _read_curves(self):
-        self.curs.execute('select %s from CURVES where day_id = %d order by CURVE_ID' % (
-            ', '.join(self.curves_colnames), self.day_id))
-        curves = self.curs.fetchall()
-
-        self.curs.execute('select %s from CURVE_DATA where day_id = %d order by CURVE_ID, POSITION' % (
-            ', '.join(self.curve_data_colnames), self.day_id))
-        curve_data = self.curs.fetchall()
-
-        return self._create_curves(curves, curve_data)
-
     def _create_curves(self, list_of_curves, points):
         """
         Note: no check whether a step curve could contain non flat segments
 
-        :param list_of_curves: contains definition of curves as a list
-        :param points: points contains coordinates defining the curves, for all the curves in list_of_curves
+        :param list_of_curves: contains definition of curves, sorted by curve id
+        :param points: points contains coordinates defining the curves, for all the curves in list_of_curves,
+            sorted by curve id
         :return: a list of StepCurve
         """
 
@@ -109,42 +211,33 @@ class Loader:
         d_cols = self.curve_data_cols
 
         curves = []
-        point_index = 0  # Index to iterate over all the points
+        points_by_curve = groupby(points, key=itemgetter(d_cols['CURVE_ID']))
+        p_id, p_group = next(points_by_curve, (None, None))
         for curve in list_of_curves:
             c_id = curve[c_cols['CURVE_ID']]
-            c_type = curve[c_cols['TYPE']]
+            sign = 1 if curve[c_cols['TYPE']] == 'SUPPLY' else -1
+
+            # Skip points of curves that are not in the list
+            while p_id is not None and p_id < c_id:
+                p_id, p_group = next(points_by_curve, (None, None))
+
             c_points = []
-            while point_index < len(points):
-                p = points[point_index]
-                if p[d_cols['CURVE_ID']] == c_id:
-                    quantity = p[d_cols['QUANTITY']]
-                    price = p[d_cols['PRICE']]
-                    c_points.append((quantity if c_type == 'SUPPLY' else -quantity, price))
-                    point_index += 1
-                else:
-                    break
+            if p_id == c_id:
+                c_points = [(sign * p[d_cols['QUANTITY']], p[d_cols['PRICE']]) for p in p_group]
+                p_id, p_group = next(points_by_curve, (None, None))
             sc = StepCurve(points=c_points, period=curve[c_cols['PERIOD']],
                            location=curve[c_cols['ZONE_ID']])
             curves.append(sc)
 
         return curves
 
-    def _read_complex_orders(self):
-        complex_orders_colnames = ['COMPLEX_ID', 'ZONE_ID', 'TYPE', 'FIXED_TERM', 'VARIABLE_TERM', 'RAMP_UP',
-                                   'RAMP_DOWN', 'SCHEDULED_STOP_PERIODS']
-        complex_orders_cols = dict(zip(complex_orders_colnames, range(len(complex_orders_colnames))))
-        self.curs.execute('select %s from COMPLEXORDERS where day_id = %d order by COMPLEX_ID' % (
-            ', '.join(complex_orders_colnames), self.day_id))
-        complex_orders = self.curs.fetchall()
-
-        self.curs.execute(
-            'select COMPLEX_ID, PERIOD, QUANTITY, PRICE from COMPLEXORDER_DATA where day_id = %d order by COMPLEX_ID, PERIOD, POSITION' % self.day_id)
-        all_complex_points = self.curs.fetchall()
-        if len(all_complex_points) == 0:
+    def _create_complex_orders(self, complex_orders, all_complex_points):
+        complex_orders_cols = COMPLEX_ORDERS_COLS
+        points_by_order = dict((complex_id, [p[1:] for p in points])  # Keep only period, quantity and price
+                               for complex_id, points in groupby(all_complex_points, key=itemgetter(0)))
+        if not points_by_order:
             return []
 
-        cur_point = all_complex_points.pop(0)
-
         # For each complex order, create the curves for each period and append it to the
         orders = []
         for co in complex_orders:
@@ -154,15 +247,7 @@ class Loader:
             list_of_curves = [(p, location, p, type) for p in range(1,
                                                                     self.n_periods + 1)]  # Create artificial curves so that period replaces the curve_id
 
-            complex_points = []
-            while cur_point[0] == complex_id:
-                complex_points.append(cur_point[1:])  # Remove complex_id, keep only period, quantity and price
-                if len(all_complex_points) > 0:
-                    cur_point = all_complex_points.pop(0)
-                else:
-                    break
-
-            curves = self._create_curves(list_of_curves, complex_points)
+            curves = self._create_curves(list_of_curves, points_by_order.get(complex_id, []))
 
             orders.append(ComplexOrder(complex_id,
                                        dict(zip(range(1, self.n_periods + 1), curves)),
@@ -175,13 +260,8 @@ class Loader:
                                        location=location))
         return orders
 
-    def _read_PUN_orders(self):
-        pun_orders_colnames = ['PUN_ID', 'ZONE_ID', 'PERIOD', 'MERIT_ORDER', 'VOLUME', 'PRICE']
-        pun_orders_cols = dict(zip(pun_orders_colnames, range(len(pun_orders_colnames))))
-        self.curs.execute('select %s from PUNORDERS where day_id = %d order by ZONE_ID, PRICE DESC' % (
-            ', '.join(pun_orders_colnames), self.day_id))
-        pun_orders = self.curs.fetchall()
-
+    def _create_PUN_orders(self, pun_orders):
+        pun_orders_cols = PUN_ORDERS_COLS
         return [PunOrder(id=po[pun_orders_cols['PUN_ID']],
                          location=po[pun_orders_cols['ZONE_ID']],
                          period=po[pun_orders_cols['PERIOD']],
@@ -189,69 +269,34 @@ class Loader:
                          volume=po[pun_orders_cols['VOLUME']],
                          price=po[pun_orders_cols['PRICE']]) for po in pun_orders]
 
-    def _read_lines(self):
+    def _create_lines(self, lines, line_data):
         if options.NO_EXCHANGE_CAPACITY:
             return []
 
-        lines_colnames = ['LINE_ID', 'ZONE_FROM', 'ZONE_TO']
-        lines_cols = dict(zip(lines_colnames, range(len(lines_colnames))))
-        self.curs.execute(
-            'select %s from LINES where day_id = %d order by LINE_ID' % (', '.join(lines_colnames), self.day_id))
-        lines = self.curs.fetchall()
-
-        line_data_colnames = ['LINE_ID', 'PERIOD', 'CAPACITY_UP', 'CAPACITY_DOWN']
-        line_data_cols = dict(zip(line_data_colnames, range(len(line_data_colnames))))
-        self.curs.execute('select %s from LINE_DATA where day_id = %d order by LINE_ID, PERIOD' % (
-            ', '.join(line_data_colnames), self.day_id))
-        line_data = self.curs.fetchall()
-
-        # Generate two lists (one per direction) containing line capacities for all the periods and append
-        # it to the line information
-        all_lines = []
-        if lines:
-            lc = line_data.pop(0)
-            for l in lines:
-                c_up = {}
-                c_down = {}
-                while lc[0] == l[0]:  # same line id
-                    c_up[lc[1]] = lc[2]
-                    c_down[lc[1]] = lc[3]
-                    if len(line_data) > 0:
-                        lc = line_data.pop(0)
-                    else:
-                        break
-
-                all_lines.append(Line(l[0], l[1], l[2], c_up, c_down))
-
-        return all_lines
-
-    def _read_block_orders(self):
+        # Generate two dicts (one per direction) containing line capacities for all the periods
+        capacities = {}
+        for line_id, data in groupby(line_data, key=itemgetter(0)):
+            c_up = {}
+            c_down = {}
+            for lc in data:
+                c_up[lc[1]] = lc[2]
+                c_down[lc[1]] = lc[3]
+            capacities[line_id] = (c_up, c_down)
 
-        # Get block volumes
-        TABLE = 'BLOCK_DATA'
-        block_data_colnames = get_col_names(TABLE)
-        block_data_cols = dict(zip(block_data_colnames, range(len(block_data_colnames))))
-        self.curs.execute('select %s from %s where day_id = %d order by BLOCK_ID, PERIOD' % (
-            ', '.join(block_data_colnames), TABLE, self.day_id))
-        block_data = self.curs.fetchall()
+        return [Line(l[0], l[1], l[2], *capacities.get(l[0], ({}, {}))) for l in lines]
 
-        block_volumes = dict()
-        for b in block_data:
-            block_id = b[block_data_cols['BLOCK_ID']]
-            if block_id not in block_volumes.keys():
-                block_volumes[block_id] = {}
+    def _create_block_orders(self, blocks, block_data):
 
-            block_volumes[block_id][b[block_data_cols['PERIOD']]] = b[block_data_cols['QUANTITY']]
+        # Get block volumes
+        block_data_cols = BLOCK_DATA_COLS
+        block_volumes = dict()
+        for block_id, data in groupby(block_data, key=itemgetter(block_data_cols['BLOCK_ID'])):
+            block_volumes[block_id] = dict((b[block_data_cols['PERIOD']], b[block_data_cols['QUANTITY']])
+                                           for b in data)
 
         # Create blocks
         all_blocks = []
-        TABLE = 'BLOCKS'
-        blocks_colnames = get_col_names(TABLE)
-        blocks_cols = dict(zip(blocks_colnames, range(len(blocks_colnames))))
-        blocks_query = 'select %s from %s where day_id = %d order by BLOCK_ID'
-        self.curs.execute(blocks_query % (', '.join(blocks_colnames), TABLE, self.day_id))
-        blocks = self.curs.fetchall()
-
+        blocks_cols = BLOCKS_COLS
         for block in blocks:
             block_id = block[blocks_cols['BLOCK_ID']]
             all_blocks.append(BlockBid(block_id,
@@ -3,17 +3,46 @@ import time
 import os
 import errno
 
+import numpy as np
+
+import openDAM.conf.options as options
 from openDAM.model.complex_order_model import COMPLEX_DAM
 from openDAM.model.pun_dam_model import PUN_DAM
+from openDAM.model import BuildProfile
+
+RESULTS_FILES = ['welfare', 'prices', 'line', 'complex', 'block', 'pun', 'build']  #: attributes of the results files
+
+## File name of each results file.
+FILE_NAMES = dict(welfare='welfare_PD.csv', prices='prices_PD.csv', line='line_results_PD.csv',
+                  complex='complex_results_PD.csv', block='block_results_PD.csv', pun='pun_results_PD.csv',
+                  build='build_profile_PD.csv')
+
+## Header of each results file.
+HEADERS = dict(welfare='DAY_ID,WELFARE,TIME,NBIN,EXPANSION,ABSOLUTE_GAP\n',
+               prices='DAY_ID,ZONE_ID,ZONE_NAME,PERIOD,PRICE,MATCHED_SUPPLY_VOLUME,MATCHED_DEMAND_VOLUME\n',
+               line='DAY_ID,LINE_ID, descritption, direction, value\n',
+               complex='DAY_ID,COMPLEX_ID,ACCEPT,SURPLUS,\n',
+               block='DAY_ID,BLOCK_ID,ACCEPT,SURPLUS,\n',
+               pun='DAY_ID,PUN_ID,ACCEPT\n',
+               build='%s\n' % ','.join(BuildProfile.FIELDS))
 
 
 class CSV_writer:
+    """
+    Writer of the results files of a run.
+
+    The files stay open for the whole run. The results of the days are held in memory and written every
+    options.RESULTS_FLUSH_DAYS days, the welfare file last: a day whose line is in the welfare file is complete in all
+    the files, and :py:func:`repair` removes the days written partially if the process is killed while writing.
+    """
 
-    def __init__(self, output_path):
+    def __init__(self, output_path, flush_days=None, buffering=None, fsync=None):
         """
 
-        :param output_path:
-        :param pun: PUN model or not PUN model
+        :param output_path: folder in which the results folder of the run is created.
+        :param flush_days: see options.RESULTS_FLUSH_DAYS, None to use the option.
+        :param buffering: see options.RESULTS_BUFFER, None to use the option.
+        :param fsync: see options.RESULTS_FSYNC, None to use the option.
         """
 
         self.path = output_path+'/results'+time.strftime("%Y%m%d_%H%M")
@@ -23,91 +52,214 @@ class CSV_writer:
             if exception.errno != errno.EEXIST:
                 raise
 
+        self.flush_days = options.RESULTS_FLUSH_DAYS if flush_days is None else flush_days
+        self.buffering = options.RESULTS_BUFFER if buffering is None else buffering
+        self.fsync = options.RESULTS_FSYNC if fsync is None else fsync
+
         self.welfare = None
         self.prices = None
         self.line = None
         self.complex = None
+        self.block = None
         self.pun = None
+        self.build = None
+
+        self._pending = dict((name, []) for name in RESULTS_FILES)  #: Text not written yet, per file
+        self._pending_days = 0
 
         self._open_files('w')
         self.write_headers()
-        self.close_files()
+        self.flush()
 
     def _open_files(self, status='w'):
-        self.welfare = open('%s/welfare_PD.csv' % self.path, status)
-        self.prices = open('%s/prices_PD.csv' % self.path, status)
-        self.line = open('%s/line_results_PD.csv' % self.path, status)
-        self.complex = open('%s/complex_results_PD.csv' % self.path, status)
-        self.block = open('%s/block_results_PD.csv' % self.path, status)
-        self.pun = open('%s/pun_results_PD.csv' % self.path, status)
+        for name in RESULTS_FILES:
+            setattr(self, name, open('%s/%s' % (self.path, FILE_NAMES[name]), status, self.buffering))
 
     def write_headers(self):
-        self.welfare.write('DAY_ID,WELFARE,TIME,NBIN,EXPANSION,ABSOLUTE_GAP\n')
-        self.prices.write('DAY_ID,ZONE_ID,ZONE_NAME,PERIOD,PRICE,MATCHED_SUPPLY_VOLUME,MATCHED_DEMAND_VOLUME\n')
-        self.line.write('DAY_ID,LINE_ID, descritption, direction, value\n')
-        self.complex.write('DAY_ID,COMPLEX_ID,ACCEPT,SURPLUS,\n')
-        self.block.write('DAY_ID,BLOCK_ID,ACCEPT,SURPLUS,\n')
-        self.pun.write('DAY_ID,PUN_ID,ACCEPT\n')
+        for name in RESULTS_FILES:
+            self._pending[name].append(HEADERS[name])
 
     def update(self, dam):
+        """
+        Append the results of a cleared day to the results files.
 
-        self._open_files('a')
-        day = dam.day_id
-        logging.info('Updating results for day %d' % day)
-
-        if not hasattr(dam, "solver_message"):
-            self.welfare.write('%d,%f,%.2f,%d,%d, %.2f\n' % (day, dam.welfare, dam.t_solve, dam.nbinvar, dam.expansion, dam.absolute_gap))
-        else:
-            self.welfare.write('%d,%f,%.2f,%d,%d, %s\n' % (day, dam.welfare, dam.t_solve, dam.nbinvar, dam.expansion, dam.solver_message))
-
-        # WRITE price results
-        all_zones = dam.zones.keys()
-        for zone in all_zones:
-            p = dam.prices(zone)
-            v_s = dam.volumes("SUPPLY", zone)
-            v_d = dam.volumes("DEMAND", zone)
-            for period in sorted(p.keys()):
-                self.prices.write('%d,%d,%s,%d,%.6f,%.3f,%.3f\n' % (day, zone, dam.zones[zone].name, period, p[period], v_s[period], v_d[period]))
-
-        if isinstance(dam, PUN_DAM):
-            zone = 0
-            p = dam.prices(zone)
-            for period in sorted(p.keys()):
-                tot_pun_q = sum(
-                    dam.orders.bids[b].volume*dam.orders.bids[b].acceptance
-                    for b in dam.model.punBids if (dam.orders.bids[b].period == period))
-                self.prices.write('%d,%d,%s,%d,%.6f,%.3f,%.3f\n' % (day, 0, "PUN", period, p[period], 0, -tot_pun_q))
-
-        # WRITE flows
-        for l in dam.connections:
-            self.line.write('%d,%d,flow,UP,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.flow_up])))
-            self.line.write('%d,%d,flow,DOWN,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.flow_down])))
-            self.line.write('%d,%d,shadow,UP,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.congestion_up])))
-            self.line.write('%d,%d,shadow,DOWN,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.congestion_down])))
-
-        for b in dam.block_orders:
-            V = b.total_volume()
-            l = b.location
-            P = b.price
-            zonal_prices = dam.prices(l)
-            surplus = sum([zonal_prices[t] * v for t, v in b.volumes.items()]) - P * V
-            self.block.write('%d,%d,%.6f,%.2f\n' % (day, b.id, b.acceptance, surplus))
-
-        # WRITE results related to complex orders
-        if isinstance(dam, COMPLEX_DAM):
-            for c in dam.complexOrders:
-                self.complex.write('%d,%d,%d,%.2f,%s,%s\n' % (day, c.complex_id, round(c.acceptance), c.surplus,
-                                                              ','.join([str(v) for v in c.volumes]),
-                                                              ','.join([str(v) for v in c.pi_lg])))
-        if isinstance(dam, PUN_DAM):
-            for p in dam.punOrders:
-                self.pun.write(u'%d,%d,%.6f\n' % (day, p.id, p.acceptance*p.volume))
+        :param dam: a solved DAM object.
+        """
+        self.write(results_lines(dam))
 
-        self.close_files()
+    def write(self, lines):
+        """
+        Append lines of results of a day to the results files.
+
+        :param lines: dict file attribute name -> list of lines, as returned by :py:func:`results_lines`.
+        """
+        for name in RESULTS_FILES:
+            self._pending[name].append(''.join(lines.get(name, [])))
+        self._pending_days += 1
+        if self.flush_days > 0 and self._pending_days >= self.flush_days:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the results held in memory, one write per file, the welfare file last.
+        """
+        for name in RESULTS_FILES[1:] + RESULTS_FILES[:1]:
+            f = getattr(self, name)
+            f.write(''.join(self._pending[name]))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self._pending[name] = []
+        self._pending_days = 0
 
     def close_files(self):
-        self.welfare.close()
-        self.prices.close()
-        self.line.close()
-        self.complex.close()
-        self.pun.close()
\ No newline at end of file
+        """
+        Write the remaining results and close the files. Can be called several times.
+        """
+        if self.welfare.closed:
+            return
+        self.flush()
+        for name in RESULTS_FILES:
+            getattr(self, name).close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_files()
+
+
+def repair(path):
+    """
+    Remove from the results files of a run the days that were not completely written, e.g. because the process was
+    killed while writing them. A day is complete once its line is in the welfare file, which is written last.
+
+    :param path: results folder of the run, see :py:attr:`CSV_writer.path`.
+    :return: the set of complete days.
+    """
+    def read(name):
+        with open('%s/%s' % (path, FILE_NAMES[name])) as f:
+            return f.readlines()
+
+    def day(line):
+        try:
+            return int(line.split(',', 1)[0])
+        except ValueError:
+            return None
+
+    days = set(day(l) for l in read('welfare')[1:] if l.endswith('\n'))
+    for name in RESULTS_FILES:
+        lines = read(name)
+        kept = lines[:1] + [l for l in lines[1:] if l.endswith('\n') and day(l) in days]
+        if len(kept) < len(lines):
+            file_name = '%s/%s' % (path, FILE_NAMES[name])
+            with open(file_name + '.tmp', 'w') as f:
+                f.writelines(kept)
+            os.rename(file_name + '.tmp', file_name)
+    return days
+
+
+def results_lines(dam):
+    """
+    Format the results of a cleared day, without writing them.
+    
+    :param dam: a solved DAM object.
+    :return: dict file attribute name -> list of lines. The dict only holds strings and can be sent between processes.
+    """
+    lines = dict((name, []) for name in RESULTS_FILES)
+    day = dam.day_id
+    logging.info('Updating results for day %d' % day)
+
+    # The COMPLEX_DAM model has no expansion and does not report its gap.
+    expansion = getattr(dam, 'expansion', False)
+    if not hasattr(dam, "solver_message"):
+        lines['welfare'].append('%d,%f,%.2f,%d,%d, %.2f\n' % (day, dam.welfare, dam.t_solve, dam.nbinvar, expansion,
+                                                               getattr(dam, 'absolute_gap', float('nan'))))
+    else:
+        lines['welfare'].append('%d,%f,%.2f,%d,%d, %s\n' % (day, dam.welfare, dam.t_solve, dam.nbinvar, expansion, dam.solver_message))
+
+    # WRITE price results
+    for zone in dam.zones.keys():
+        p = dam.prices(zone)
+        v_s = dam.volumes("SUPPLY", zone)
+        v_d = dam.volumes("DEMAND", zone)
+        name = dam.zones[zone].name
+        lines['prices'].extend('%d,%d,%s,%d,%.6f,%.3f,%.3f\n' % (day, zone, name, period, p[period], v_s[period],
+                                                                 v_d[period]) for period in sorted(p.keys()))
+
+    if isinstance(dam, PUN_DAM):
+        p = dam.prices(0)
+        tot_pun_q = pun_matched_volumes(dam)
+        lines['prices'].extend('%d,%d,%s,%d,%.6f,%.3f,%.3f\n' % (day, 0, "PUN", period, p[period], 0, -tot_pun_q[period])
+                               for period in sorted(p.keys()))
+
+    # WRITE flows
+    for l in dam.connections:
+        lines['line'].append('%d,%d,flow,UP,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.flow_up])))
+        lines['line'].append('%d,%d,flow,DOWN,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.flow_down])))
+        lines['line'].append('%d,%d,shadow,UP,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.congestion_up])))
+        lines['line'].append('%d,%d,shadow,DOWN,%s\n' % (day, l.line_id, ','.join([str(v) for v in l.congestion_down])))
+
+    # WRITE block results
+    lines['block'].extend('%d,%d,%.6f,%.2f\n' % ((day,) + r) for r in block_results(dam))
+
+    # WRITE results related to complex orders
+    if isinstance(dam, COMPLEX_DAM):
+        lines['complex'].extend('%d,%d,%d,%.2f,%s,%s\n' % (day, c.complex_id, round(c.acceptance), c.surplus,
+                                                            ','.join([str(v) for v in c.volumes]),
+                                                            ','.join([str(v) for v in c.pi_lg]))
+                                for c in dam.complexOrders)
+    if isinstance(dam, PUN_DAM):
+        lines['pun'].extend(u'%d,%d,%.6f\n' % ((day,) + r) for r in pun_results(dam))
+
+    # WRITE the profile of the model generation
+    if dam.build_profile is not None:
+        lines['build'] = dam.build_profile.lines('PUN' if isinstance(dam, PUN_DAM) else 'COMPLEX')
+
+    return lines
+
+
+def pun_matched_volumes(dam):
+    """
+    :param dam: a solved PUN_DAM object.
+    :return: an array indexed by period of the total volume matched by the PUN orders, negative as for demand.
+    """
+    book = dam.orders
+    ids = book.ids('PO')
+    periods = book.column('period')[ids]
+    return np.bincount(periods, weights=book.column('volume')[ids] * book.column('acceptance')[ids],
+                       minlength=max(book.periods) + 1)
+
+
+def block_results(dam):
+    """
+    Compute the results of the block orders from the block columns of the order book.
+
+    :param dam: a solved DAM object.
+    :return: list of (block id, acceptance, surplus), in the order of dam.block_orders.
+    """
+    if not dam.block_orders:
+        return []
+    book = dam.orders
+    block_ids = book.column('block_ids')
+    offsets = book.column('block_offsets')
+    zones = np.repeat(book.column('zone')[block_ids], np.diff(offsets))
+    zonal_prices = dict((l, dam.prices(l)) for l in set(zones.tolist()))
+    prices = np.array([zonal_prices[l][t] for l, t in zip(zones.tolist(), book.column('block_periods').tolist())])
+    surplus = np.add.reduceat(prices * book.column('block_volumes'), offsets[:-1]) \
+        - book.column('price')[block_ids] * book.column('volume')[block_ids]
+    acceptance = book.column('acceptance')[block_ids]
+    position = dict((i, k) for k, i in enumerate(block_ids.tolist()))
+    rows = [position[dam.block_orders_ids[b]] for b in dam.block_orders]
+    return [(b.id, float(acceptance[k]), float(surplus[k])) for b, k in zip(dam.block_orders, rows)]
+
+
+def pun_results(dam):
+    """
+    :param dam: a solved PUN_DAM object.
+    :return: list of (PUN order id, accepted volume), in the order of dam.punOrders.
+    """
+    book = dam.orders
+    ids = [dam.pun_orders_ids[p] for p in dam.punOrders]
+    matched = book.column('acceptance')[ids] * book.column('volume')[ids]
+    return [(p.id, v) for p, v in zip(dam.punOrders, matched.tolist())]
@@ -0,0 +1,255 @@
+"""
+Typed results store, as an alternative or a complement to the CSV files of :py:mod:`dam_results_csv`.
+
+The results of each day are stored in the tables of :py:data:`RESULTS_TABLES`, one row per value, either in an SQLite
+database, e.g. the input database next to the REAL_PRICES and AWARDED_PUN tables of the GME importer, or in Parquet
+files partitioned by run and day. All the tables start with the RUN_ID and DAY_ID columns, so that the results of
+several runs can be stored together and compared. The numbers are stored as REAL, not NUMBER as in the input tables,
+so that SQLite keeps them as floats even when they are integral.
+"""
+import os
+import sqlite3
+import time
+import errno
+
+import pandas
+
+from openDAM.dataio.dam_results_csv import pun_matched_volumes, block_results, pun_results
+from openDAM.model.complex_order_model import COMPLEX_DAM
+from openDAM.model.pun_dam_model import PUN_DAM
+
+RESULTS_TABLES = dict(
+    RESULTS_DAYS='RUN_ID TEXT, DAY_ID INTEGER, MODEL TEXT, WELFARE REAL, SOLVE_TIME REAL, NBIN INTEGER, EXPANSION INTEGER, ABSOLUTE_GAP REAL, SOLVER_MESSAGE TEXT',
+    RESULTS_PRICES='RUN_ID TEXT, DAY_ID INTEGER, ZONE_ID INTEGER, ZONE_NAME TEXT, PERIOD INTEGER, PRICE REAL, MATCHED_SUPPLY_VOLUME REAL, MATCHED_DEMAND_VOLUME REAL',
+    RESULTS_FLOWS='RUN_ID TEXT, DAY_ID INTEGER, LINE_ID INTEGER, PERIOD INTEGER, FLOW_UP REAL, FLOW_DOWN REAL, SHADOW_UP REAL, SHADOW_DOWN REAL',
+    RESULTS_BLOCKS='RUN_ID TEXT, DAY_ID INTEGER, BLOCK_ID INTEGER, ACCEPTANCE REAL, SURPLUS REAL',
+    RESULTS_COMPLEX='RUN_ID TEXT, DAY_ID INTEGER, COMPLEX_ID INTEGER, ACCEPTANCE REAL, SURPLUS REAL',
+    RESULTS_COMPLEX_DATA='RUN_ID TEXT, DAY_ID INTEGER, COMPLEX_ID INTEGER, PERIOD INTEGER, VOLUME REAL, PRICE REAL',
+    RESULTS_PUN='RUN_ID TEXT, DAY_ID INTEGER, PUN_ID INTEGER, ACCEPTED_VOLUME REAL',
+    RESULTS_BUILD='RUN_ID TEXT, DAY_ID INTEGER, MODEL TEXT, BLOCK TEXT, TIME REAL, ALLOCATED_KB REAL, COMPONENTS INTEGER, CONSTRAINTS INTEGER, VARIABLES INTEGER')
+
+## pandas dtype of each SQL type of the columns of the results tables, for columns without missing values.
+FRAME_DTYPES = dict(INTEGER='int64', REAL='float64')
+
+
+def get_col_names(table_name):
+    return [col.split(u' ')[0] for col in RESULTS_TABLES[table_name].split(u', ')]
+
+
+def get_col_types(table_name):
+    """
+    :return: the list of (name, SQL type) of the columns of a results table.
+    """
+    return [tuple(col.split(u' ')[:2]) for col in RESULTS_TABLES[table_name].split(u', ')]
+
+
+def run_id():
+    """
+    :return: the default id of a run, the timestamp also used in the name of the CSV results folder.
+    """
+    return time.strftime("%Y%m%d_%H%M")
+
+
+def results_rows(dam):
+    """
+    Collect the results of a cleared day as typed rows, without writing them.
+
+    :param dam: a solved DAM object.
+    :return: dict table name -> list of rows, each row holding the values of the columns of the table after RUN_ID.
+        The dict only holds Python values and can be sent between processes.
+    """
+    rows = dict((table, []) for table in RESULTS_TABLES)
+    day = dam.day_id
+    model_name = 'PUN' if isinstance(dam, PUN_DAM) else 'COMPLEX'
+    periods = sorted(dam.orders.periods)
+
+    expansion = getattr(dam, 'expansion', None)
+    rows['RESULTS_DAYS'].append((day, model_name, dam.welfare, dam.t_solve, dam.nbinvar,
+                                 None if expansion is None else int(expansion), getattr(dam, 'absolute_gap', None),
+                                 getattr(dam, 'solver_message', None)))
+
+    for zone in dam.zones.keys():
+        p = dam.prices(zone)
+        v_s = dam.volumes("SUPPLY", zone)
+        v_d = dam.volumes("DEMAND", zone)
+        name = dam.zones[zone].name
+        rows['RESULTS_PRICES'].extend((day, zone, name, t, p[t], v_s[t], v_d[t]) for t in sorted(p.keys()))
+    if isinstance(dam, PUN_DAM):
+        p = dam.prices(0)
+        tot_pun_q = pun_matched_volumes(dam)
+        rows['RESULTS_PRICES'].extend((day, 0, "PUN", t, p[t], 0.0, -float(tot_pun_q[t])) for t in sorted(p.keys()))
+
+    for l in dam.connections:
+        rows['RESULTS_FLOWS'].extend((day, l.line_id) + values for values in
+                                     zip(periods, l.flow_up, l.flow_down, l.congestion_up, l.congestion_down))
+
+    rows['RESULTS_BLOCKS'].extend((day,) + r for r in block_results(dam))
+
+    if isinstance(dam, COMPLEX_DAM):
+        for c in dam.complexOrders:
+            rows['RESULTS_COMPLEX'].append((day, c.complex_id, c.acceptance, c.surplus))
+            rows['RESULTS_COMPLEX_DATA'].extend((day, c.complex_id) + values for values in
+                                                zip(periods, c.volumes, c.pi_lg))
+    if isinstance(dam, PUN_DAM):
+        rows['RESULTS_PUN'].extend((day,) + r for r in pun_results(dam))
+
+    if dam.build_profile is not None:
+        rows['RESULTS_BUILD'].extend((day, model_name) + tuple(block) for block in dam.build_profile.blocks)
+
+    return rows
+
+
+def create_results_tables(conn):
+    """
+    Create the results tables and their index on (RUN_ID, DAY_ID), if they do not exist yet.
+
+    :param conn: a connection to the database.
+    """
+    for table in sorted(RESULTS_TABLES):
+        conn.execute("CREATE TABLE IF NOT EXISTS %s (%s);" % (table, RESULTS_TABLES[table]))
+        conn.execute("CREATE INDEX IF NOT EXISTS %s_IDX ON %s (RUN_ID, DAY_ID);" % (table, table))
+    conn.commit()
+
+
+def results_frame(table_name, rows):
+    """
+    :param table_name: name of a results table.
+    :param rows: rows of the table without the RUN_ID column, as returned by :py:func:`results_rows`.
+    :return: a DataFrame of the rows with the types of the columns of the table but RUN_ID, NaN for missing numbers.
+    """
+    col_types = get_col_types(table_name)[1:]
+    df = pandas.DataFrame.from_records(rows, columns=[name for name, _ in col_types])
+    for name, col_type in col_types:
+        if col_type != 'TEXT' and not (col_type == 'INTEGER' and df[name].isnull().any()):
+            df[name] = df[name].astype(FRAME_DTYPES[col_type])
+    return df
+
+
+class SQLiteResultsWriter:
+    """
+    Writer of the results in the tables of an SQLite database, each day in one transaction.
+    """
+
+    def __init__(self, db_file, run=None):
+        """
+
+        :param db_file: path to the database file, created if it does not exist.
+        :param run: id of the run, see :py:func:`run_id` for the default.
+        """
+        self.run = run_id() if run is None else run
+        self.conn = sqlite3.connect(db_file)
+        create_results_tables(self.conn)
+        self.statements = dict((table, "INSERT INTO %s (%s) values (%s)" % (
+            table, ','.join(get_col_names(table)), ', '.join('?' * len(get_col_names(table)))))
+                               for table in RESULTS_TABLES)
+
+    def update(self, dam):
+        """
+        Store the results of a cleared day.
+
+        :param dam: a solved DAM object.
+        """
+        self.write(results_rows(dam))
+
+    def write(self, rows):
+        """
+        Store the rows of a day, replacing the results of the same run and day if any.
+
+        :param rows: dict table name -> list of rows, as returned by :py:func:`results_rows`.
+        """
+        day = rows['RESULTS_DAYS'][0][0]
+        with self.conn:
+            for table in sorted(RESULTS_TABLES):
+                self.conn.execute("DELETE FROM %s WHERE RUN_ID=? AND DAY_ID=?" % table, (self.run, day))
+                self.conn.executemany(self.statements[table], [(self.run,) + tuple(r) for r in rows.get(table, [])])
+
+    def close_files(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_files()
+
+
+class ParquetResultsWriter:
+    """
+    Writer of the results in Parquet files partitioned by run and day, with the hive layout
+    path/TABLE/RUN_ID=run/DAY_ID=day/part.parquet that pandas.read_parquet(path/TABLE) reads back as one DataFrame.
+
+    Requires pyarrow or fastparquet.
+    """
+
+    def __init__(self, path, run=None):
+        """
+
+        :param path: folder of the results store.
+        :param run: id of the run, see :py:func:`run_id` for the default.
+        """
+        self.path = path
+        self.run = run_id() if run is None else run
+
+    def update(self, dam):
+        """
+        Store the results of a cleared day.
+
+        :param dam: a solved DAM object.
+        """
+        self.write(results_rows(dam))
+
+    def write(self, rows):
+        """
+        Store the rows of a day, replacing the files of the same run and day if any. Each file is written under a
+        temporary name first, so that a killed process does not leave a truncated file. The file of a table without
+        rows is removed.
+
+        :param rows: dict table name -> list of rows, as returned by :py:func:`results_rows`.
+        """
+        day = rows['RESULTS_DAYS'][0][0]
+        for table in sorted(RESULTS_TABLES):
+            folder = '%s/%s/RUN_ID=%s/DAY_ID=%d' % (self.path, table, self.run, day)
+            if not rows.get(table):
+                try:
+                    os.remove('%s/part.parquet' % folder)
+                    os.rmdir(folder)
+                except OSError as exception:
+                    if exception.errno != errno.ENOENT:
+                        raise
+                continue
+            try:
+                os.makedirs(folder)
+            except OSError as exception:
+                if exception.errno != errno.EEXIST:
+                    raise
+            df = results_frame(table, rows[table]).drop('DAY_ID', axis=1)
+            df.to_parquet('%s/part.parquet.tmp' % folder, index=False)
+            os.rename('%s/part.parquet.tmp' % folder, '%s/part.parquet' % folder)
+
+    def close_files(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_files()
+
+
+def compare_real_prices(conn, run):
+    """
+    Join the prices computed in a run with the REAL_PRICES table of the GME importer.
+
+    :param conn: a connection to a database holding both the results of the run and the REAL_PRICES table.
+    :param run: id of the run.
+    :return: a DataFrame with the columns DAY_ID, PERIOD, ZONE_NAME, PRICE and REAL_PRICE.
+    """
+    prices = pandas.read_sql_query("SELECT DAY_ID, PERIOD, ZONE_NAME, PRICE FROM RESULTS_PRICES WHERE RUN_ID=?",
+                                   conn, params=(run,))
+    real = pandas.read_sql_query("SELECT * FROM REAL_PRICES", conn)
+    real = real.drop([c for c in real.columns if c not in ('DAY_ID', 'Period') and c not in
+                      set(prices['ZONE_NAME'])], axis=1)
+    real = real.melt(id_vars=['DAY_ID', 'Period'], var_name='ZONE_NAME', value_name='REAL_PRICE')
+    real = real.rename(columns={'Period': 'PERIOD'})
+    real['DAY_ID'] = real['DAY_ID'].astype('int64')
+    return prices.merge(real, on=['DAY_ID', 'PERIOD', 'ZONE_NAME'])
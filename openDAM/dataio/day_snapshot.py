@@ -0,0 +1,192 @@
+"""
+Binary snapshots of the days of a database, so that a day read once is then loaded without SQL.
+
+The snapshot of a day holds the rows returned by the queries of :py:meth:`dam_db_loader.Loader.read_day_rows`,
+stored by column in an uncompressed .npz file. A small stamp file next to it records the size and modification time
+of the database when the snapshot was validated, the hash of the content of the snapshot, and the signature of the
+rows of the day in the input tables, see :py:meth:`dam_db_loader.Loader.day_signature`. If the database file has been
+modified since, e.g. by the results of a run stored in the same file, the snapshot stays valid as long as the
+signature of the day is the same. Otherwise the rows of the day are read again, and the snapshot is rewritten only if
+their hash changed.
+"""
+import os
+import errno
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+## Version of the snapshot format, part of the content hash so that snapshots of older formats are rebuilt.
+FORMAT = 1
+
+
+def rows_to_arrays(rows):
+    """
+    Store rows by column.
+
+    Columns of integers, of numbers or of strings are stored as int64, float64 or unicode arrays. A column with NULL
+    values has a boolean mask array, named after the column with a .null suffix.
+
+    :param rows: an OrderedDict mapping table names to lists of rows.
+    :return: a dict mapping array names, TABLE.shape and TABLE.i for column i of a table, to arrays.
+    """
+    arrays = {}
+    for table, data in rows.items():
+        n_cols = len(data[0]) if data else 0
+        arrays['%s.shape' % table] = np.array([len(data), n_cols], dtype=np.int64)
+        for i in range(n_cols):
+            values = [r[i] for r in data]
+            nulls = [v is None for v in values]
+            present = [v for v in values if v is not None]
+            if present and all(isinstance(v, type(u'')) for v in present):
+                column = np.array([u'' if v is None else v for v in values], dtype=np.str_)
+            elif all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+                column = np.array([0 if v is None else v for v in values], dtype=np.int64)
+            else:
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            arrays['%s.%d' % (table, i)] = column
+            if any(nulls):
+                arrays['%s.%d.null' % (table, i)] = np.array(nulls, dtype=bool)
+    return arrays
+
+
+def arrays_to_rows(arrays, tables):
+    """
+    Inverse of :py:func:`rows_to_arrays`.
+
+    :param arrays: a dict or NpzFile of arrays.
+    :param tables: names of the tables, in order.
+    :return: an OrderedDict mapping table names to lists of rows, as tuples of Python values.
+    """
+    rows = OrderedDict()
+    for table in tables:
+        n_cols = arrays['%s.shape' % table].tolist()[1]
+        columns = []
+        for i in range(n_cols):
+            values = arrays['%s.%d' % (table, i)].tolist()
+            null_name = '%s.%d.null' % (table, i)
+            if null_name in arrays:
+                values = [None if null else v for v, null in zip(values, arrays[null_name].tolist())]
+            columns.append(values)
+        rows[table] = list(zip(*columns))
+    return rows
+
+
+def content_hash(arrays):
+    """
+    :return: the SHA-1 hex digest of the names, types, shapes and values of the arrays.
+    """
+    h = hashlib.sha1(('format %d' % FORMAT).encode())
+    for name in sorted(arrays):
+        a = np.ascontiguousarray(arrays[name])
+        h.update(('%s %s %s' % (name, a.dtype.str, a.shape)).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+class SnapshotCache:
+    """
+    Folder of snapshots of the days of a database, keyed by the path of the database and the day id.
+    """
+
+    def __init__(self, folder, db_file):
+        """
+
+        :param folder: folder of the snapshots, created if needed. Can be shared by several databases.
+        :param db_file: path to the database file.
+        """
+        self.folder = folder
+        self.db_file = os.path.abspath(db_file)
+        self.prefix = hashlib.sha1(self.db_file.encode()).hexdigest()[:16]  #: Key of the database in the folder
+        self.hits = 0  #: Number of days loaded from a valid snapshot without querying the database
+        self.misses = 0  #: Number of days read from the database
+        try:
+            os.makedirs(folder)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+    def file_name(self, day):
+        """
+        :return: the path of the snapshot of a day, without extension.
+        """
+        return '%s/%s_%s' % (self.folder, self.prefix, day)
+
+    def db_stamp(self):
+        """
+        :return: a string identifying the state of the database file and of its write-ahead log, if not empty.
+        """
+        stamp = []
+        for suffix in ('', '-wal'):
+            if os.path.exists(self.db_file + suffix):
+                st = os.stat(self.db_file + suffix)
+                if st.st_size or not suffix:
+                    stamp.append('%r:%d' % (st.st_mtime, st.st_size))
+        return ','.join(stamp)
+
+    def rows(self, day, read, signature=None):
+        """
+        Get the rows of a day from its snapshot, or read them and update the snapshot.
+
+        :param day: the day.
+        :param read: function of the day returning its rows as an OrderedDict of lists of rows, called if the
+            snapshot does not exist or may be outdated.
+        :param signature: function of the day returning a string that changes when its rows change, checked when the
+            database file was modified since the snapshot was validated. None to read the day again whenever the
+            database file is modified.
+        :return: the rows of the day.
+        """
+        file_name = self.file_name(day)
+        stamp = self.db_stamp()
+        previous = self._read_stamp(file_name)
+        day_signature = None
+        if previous is not None and previous[0] != stamp and signature is not None:
+            day_signature = signature(day)
+            if previous[2] == day_signature:
+                self._write_stamp(file_name, stamp, previous[1], day_signature)
+                previous = (stamp,) + previous[1:]
+        if previous is not None and previous[0] == stamp:
+            with np.load(file_name + '.npz') as arrays:
+                tables = arrays['tables'].tolist()
+                rows = arrays_to_rows(arrays, tables)
+            self.hits += 1
+            return rows
+
+        if signature is not None and day_signature is None:
+            day_signature = signature(day)
+        rows = read(day)
+        self.misses += 1
+        arrays = rows_to_arrays(rows)
+        arrays['tables'] = np.array(list(rows.keys()), dtype=np.str_)
+        digest = content_hash(arrays)
+        if previous is None or previous[1] != digest:
+            self._write(file_name + '.npz', lambda f: np.savez(f, **arrays))
+        self._write_stamp(file_name, stamp, digest, day_signature)
+        return rows
+
+    def _write_stamp(self, file_name, stamp, digest, signature):
+        content = '%s\n%s\n%s\n' % (stamp, digest, signature or u'')
+        self._write(file_name + '.stamp', lambda f: f.write(content.encode()))
+
+    def _read_stamp(self, file_name):
+        """
+        :return: the database stamp, the content hash and the signature of the day of a snapshot, None for a snapshot
+            without signature, or None if there is no valid snapshot.
+        """
+        if not (os.path.exists(file_name + '.stamp') and os.path.exists(file_name + '.npz')):
+            return None
+        with open(file_name + '.stamp') as f:
+            lines = f.read().split('\n')
+        if len(lines) <= 2:
+            return None
+        return lines[0], lines[1], lines[2] if len(lines) > 3 and lines[2] else None
+
+    @staticmethod
+    def _write(file_name, write):
+        """
+        Write a file under a temporary name and rename it, so that readers never see a partial file.
+        """
+        tmp = '%s.%d.tmp' % (file_name, os.getpid())
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.rename(tmp, file_name)
@@ -37,10 +37,11 @@ def populate_block_orders(connection, day_id):
 
         insert_in_table(connection, "BLOCKS", data)
         insert_in_table(connection, "BLOCK_DATA", profile_data)
-        conn.commit()
 
         print(block_id)
 
+    connection.commit()
+
 if __name__ == "__main__":
     parser = ArgumentParser(
         description='Utility for Adding randomly generated blocks to a database. Block properties are defined at the top.')
@@ -0,0 +1,299 @@
+"""
+Seedable generator of synthetic days at configurable scale, in the tables of
+:py:data:`create_dam_db_from_csv.TABLES`, for performance work.
+
+Each day has zones connected by a network of a given topology, supply and demand step curves in each zone and period,
+block orders, and either complex orders or PUN orders, since a day cannot have both. The values are sampled by arrays
+with NumPy around a price and a load profile of each zone, and the rows are written with
+:py:func:`create_dam_db_from_csv.bulk_insert`. The random generator of a day only depends on the seed and on the day
+id, so that a day is the same whatever the number of days generated.
+
+Generate a database from the master directory, e.g.
+``python openDAM/dataio/generate_market.py -p /tmp -d synthetic.sqlite3 --days 2 --zones 20 --periods 96 --steps 260``
+for days of about one million steps.
+"""
+import os
+import sys
+import time
+import sqlite3
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+import numpy as np
+
+# Relative import fixes
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from openDAM.dataio.create_dam_db_from_csv import TABLES, BULK_BATCH, create_tables, create_indexes, bulk_insert, \
+    get_col_names, set_offline_pragmas, restore_pragmas
+
+## Topologies of the network, see :py:func:`network`.
+TOPOLOGIES = ['chain', 'ring', 'star', 'mesh']
+
+## Price bounds of the zones.
+MIN_PRICE = 0.0
+MAX_PRICE = 3000.0
+
+## Default size of a day, see :py:func:`generate_day`.
+DEFAULT_SIZE = dict(zones=6, topology='chain', extra_lines=0, periods=24, curves=1, steps=20, blocks=10,
+                    complex_orders=0, complex_steps=4, ramp_share=0.5, stop_share=0.2, pun_orders=0)
+
+
+def network(n_zones, topology, extra_lines=0, rng=None):
+    """
+    :param n_zones: number of zones, with ids 1 to n_zones.
+    :param topology: 'chain' of consecutive zones, 'ring' closing the chain, 'star' around zone 1, or 'mesh', a
+        chain with extra_lines random additional lines.
+    :param extra_lines: number of additional lines of a mesh, bounded by the number of pairs of zones.
+    :param rng: a numpy RandomState, for the mesh topology.
+    :return: two arrays of the origin and destination zones of the lines.
+    """
+    zones = np.arange(1, n_zones + 1)
+    if topology == 'star':
+        return np.ones(n_zones - 1, dtype=np.int64), zones[1:]
+    from_ids, to_ids = zones[:-1], zones[1:]
+    if topology == 'ring' and n_zones > 2:
+        from_ids, to_ids = np.append(from_ids, n_zones), np.append(to_ids, 1)
+    elif topology == 'mesh' and n_zones > 2:
+        i, j = np.triu_indices(n_zones, 2)  # Pairs not already linked by the chain
+        chosen = np.sort(rng.permutation(len(i))[:extra_lines])
+        from_ids, to_ids = np.append(from_ids, i[chosen] + 1), np.append(to_ids, j[chosen] + 1)
+    elif topology not in TOPOLOGIES:
+        raise ValueError('Unknown topology %s, expected one of %s' % (topology, TOPOLOGIES))
+    return from_ids.astype(np.int64), to_ids.astype(np.int64)
+
+
+def _step_points(volumes, prices):
+    """
+    Points of step curves, two points per step at the price of the step.
+
+    :param volumes: array (curves, steps) of positive volumes of the steps.
+    :param prices: array (curves, steps) of prices of the steps.
+    :return: arrays (curves, 2 * steps) of the positions, quantities and prices of the points, the first quantity of
+        each curve being 0.
+    """
+    n, steps = volumes.shape
+    cumulated = np.cumsum(volumes, axis=1)
+    quantities = np.empty((n, 2 * steps))
+    quantities[:, 0] = 0.0
+    quantities[:, 2::2] = cumulated[:, :-1]
+    quantities[:, 1::2] = cumulated
+    positions = np.tile(np.arange(1, 2 * steps + 1), (n, 1))
+    return positions, np.round(quantities, 3), np.repeat(prices, 2, axis=1)
+
+
+def generate_day(day, rng, zones=6, topology='chain', extra_lines=0, periods=24, curves=1, steps=20, blocks=10,
+                 complex_orders=0, complex_steps=4, ramp_share=0.5, stop_share=0.2, pun_orders=0):
+    """
+    Generate the rows of a day.
+
+    :param day: id of the day.
+    :param rng: a numpy RandomState.
+    :param zones: number of zones.
+    :param topology: topology of the network, see :py:func:`network`.
+    :param extra_lines: number of additional lines of a mesh network.
+    :param periods: number of periods, e.g. 24 hours or 96 quarter-hours.
+    :param curves: number of supply and of demand curves per zone and period.
+    :param steps: number of steps per curve.
+    :param blocks: number of block orders per zone.
+    :param complex_orders: number of complex supply orders per zone.
+    :param complex_steps: number of steps of the curve of a complex order in each period.
+    :param ramp_share: share of the complex orders with ramping conditions.
+    :param stop_share: share of the complex orders with a scheduled stop condition.
+    :param pun_orders: number of PUN orders per period, spread over the zones.
+    :return: an OrderedDict mapping the tables of :py:data:`create_dam_db_from_csv.TABLES` to lists of column arrays,
+        in the order of the columns of the tables.
+    """
+    if complex_orders and pun_orders:
+        raise ValueError('A day cannot have both complex orders and PUN orders')
+
+    z_ids = np.arange(1, zones + 1)
+    t_ids = np.arange(1, periods + 1)
+    hours = (t_ids - 1) * 24.0 / periods
+    profile = 1.0 + 0.3 * np.sin(2 * np.pi * (hours - 8.0) / 24.0)
+    mean_price = np.outer(rng.uniform(30.0, 70.0, zones), profile)  # (zones, periods)
+    load = np.outer(rng.uniform(500.0, 5000.0, zones), profile)  # (zones, periods)
+
+    def day_column(n):
+        return np.full(n, day, dtype=np.int64)
+
+    columns = OrderedDict()
+    columns['DAYS'] = [day_column(1), np.array([periods])]
+    columns['ZONES'] = [day_column(zones), z_ids, np.array([u'Z%d' % z for z in z_ids]),
+                        np.full(zones, MIN_PRICE), np.full(zones, MAX_PRICE)]
+
+    # Network
+    from_ids, to_ids = network(zones, topology, extra_lines, rng)
+    n_lines = len(from_ids)
+    l_ids = np.arange(1, n_lines + 1)
+    mean_load = load.mean(axis=1)
+    capacity = (mean_load[from_ids - 1] + mean_load[to_ids - 1])[:, None] * rng.uniform(0.05, 0.3, (n_lines, periods))
+    columns['LINES'] = [day_column(n_lines), l_ids, from_ids, to_ids]
+    columns['LINE_DATA'] = [day_column(n_lines * periods), np.repeat(l_ids, periods), np.tile(t_ids, n_lines),
+                            np.round(capacity * rng.uniform(0.5, 1.0, (n_lines, periods)), 1).ravel(),
+                            np.round(capacity, 1).ravel()]
+
+    # Curves, by zone, period, type (supply then demand) and curve. Supply curves start with zero-price steps and
+    # exceed the load by 30%, demand curves start with a price-taking step at the maximum price.
+    n_curves = zones * periods * 2 * curves
+    c_zones = np.repeat(z_ids, periods * 2 * curves)
+    c_periods = np.tile(np.repeat(t_ids, 2 * curves), zones)
+    supply = np.tile(np.repeat([True, False], curves), zones * periods)
+    c_mean = mean_price[c_zones - 1, c_periods - 1][:, None]
+    c_load = np.where(supply, 1.3, 1.0) * load[c_zones - 1, c_periods - 1] / curves
+    volumes = rng.gamma(2.0, 1.0, (n_curves, steps))
+    volumes *= (c_load / volumes.sum(axis=1))[:, None]
+    prices = np.clip(rng.normal(c_mean, 0.5 * c_mean, (n_curves, steps)), MIN_PRICE, MAX_PRICE)
+    prices.sort(axis=1)
+    prices[supply, 0] = MIN_PRICE
+    prices[~supply] = prices[~supply, ::-1]
+    prices[~supply, 0] = MAX_PRICE
+    positions, quantities, point_prices = _step_points(volumes, np.round(prices, 2))
+    curve_ids = np.arange(1, n_curves + 1)
+    columns['CURVES'] = [day_column(n_curves), curve_ids, c_zones, c_periods,
+                         np.where(supply, u'SUPPLY', u'DEMAND')]
+    columns['CURVE_DATA'] = [day_column(positions.size), np.repeat(curve_ids, 2 * steps), positions.ravel(),
+                             quantities.ravel(), point_prices.ravel()]
+
+    # Block orders, flat on a random range of periods, half of them fill-or-kill
+    n_blocks = zones * blocks
+    b_ids = np.arange(1, n_blocks + 1)
+    b_zones = np.repeat(z_ids, blocks)
+    b_mean = mean_price[b_zones - 1].mean(axis=1)
+    start = rng.randint(0, periods, n_blocks)
+    end = start + 1 + (rng.uniform(size=n_blocks) * (periods - start)).astype(np.int64)
+    in_block = (t_ids[None, :] > start[:, None]) & (t_ids[None, :] <= end[:, None])
+    b_volumes = np.where(in_block, np.round(rng.uniform(0.002, 0.02, n_blocks) * mean_load[b_zones - 1],
+                                            3)[:, None], 0.0)
+    min_ratio = np.where(rng.uniform(size=n_blocks) < 0.5, 1.0, np.round(rng.uniform(0.1, 0.9, n_blocks), 2))
+    columns['BLOCKS'] = [day_column(n_blocks), b_ids, b_zones,
+                         np.round(np.clip(rng.normal(b_mean, 0.3 * b_mean), MIN_PRICE, MAX_PRICE), 2), min_ratio]
+    columns['BLOCK_DATA'] = [day_column(n_blocks * periods), np.repeat(b_ids, periods), np.tile(t_ids, n_blocks),
+                             b_volumes.ravel()]
+
+    # Complex supply orders, with a curve in each period above their variable term
+    n_complex = zones * complex_orders
+    co_ids = np.arange(1, n_complex + 1)
+    co_zones = np.repeat(z_ids, complex_orders)
+    co_mean = mean_price[co_zones - 1].mean(axis=1)
+    co_capacity = rng.uniform(0.005, 0.05, n_complex) * mean_load[co_zones - 1]
+    variable_term = np.round(rng.uniform(0.3, 0.8, n_complex) * co_mean, 2)
+    ramps = np.where(rng.uniform(size=n_complex) < ramp_share, np.round(rng.uniform(0.1, 0.5, n_complex) * co_capacity,
+                                                                        3), np.nan)
+    stops = np.where(rng.uniform(size=n_complex) < stop_share, rng.randint(1, 4, n_complex), 0)
+    columns['COMPLEXORDERS'] = [day_column(n_complex), co_ids, co_zones, np.full(n_complex, u'SUPPLY'),
+                                np.round(rng.uniform(0.0, 20.0, n_complex) * co_capacity, 2), variable_term,
+                                ramps, ramps.copy(), stops]
+    n_co_curves = n_complex * periods
+    co_volumes = np.repeat(co_capacity / complex_steps, periods)[:, None] * rng.uniform(0.5, 1.5, (n_co_curves,
+                                                                                                  complex_steps))
+    co_prices = np.repeat(variable_term, periods)[:, None] * (1.0 + np.sort(rng.uniform(0.0, 1.0, (n_co_curves,
+                                                                                                  complex_steps))))
+    positions, quantities, point_prices = _step_points(co_volumes, np.round(co_prices, 2))
+    columns['COMPLEXORDER_DATA'] = [day_column(positions.size), np.repeat(co_ids, periods * 2 * complex_steps),
+                                    np.tile(np.repeat(t_ids, 2 * complex_steps), n_complex), positions.ravel(),
+                                    quantities.ravel(), point_prices.ravel()]
+
+    # PUN orders, in merit order of decreasing price in each period, a third of them price-taking
+    n_pun = periods * pun_orders
+    p_periods = np.repeat(t_ids, pun_orders)
+    p_mean = mean_price.mean(axis=0)[p_periods - 1].reshape(periods, pun_orders)
+    p_prices = np.clip(rng.normal(p_mean, 0.5 * p_mean), MIN_PRICE, MAX_PRICE)
+    p_prices[rng.uniform(size=(periods, pun_orders)) < 1.0 / 3] = MAX_PRICE
+    p_prices = -np.sort(-np.round(p_prices, 2), axis=1)
+    columns['PUNORDERS'] = [day_column(n_pun), np.arange(1, n_pun + 1), rng.randint(1, zones + 1, n_pun), p_periods,
+                            np.tile(np.arange(1, pun_orders + 1), periods),
+                            np.round(rng.gamma(2.0, 0.5 * load.mean() / max(pun_orders, 1), n_pun), 3),
+                            p_prices.ravel()]
+    return columns
+
+
+def rows(columns, batch=BULK_BATCH):
+    """
+    Stream the rows of a table, batch by batch, NaN numbers being NULL.
+
+    :param columns: list of column arrays of the same length.
+    :param batch: number of rows converted to Python values at once.
+    """
+    n = len(columns[0])
+    for start in range(0, n, batch):
+        chunk = []
+        for c in columns:
+            values = c[start:start + batch]
+            if values.dtype.kind == 'f' and np.isnan(values).any():
+                chunk.append([None if np.isnan(v) else v for v in values.tolist()])
+            else:
+                chunk.append(values.tolist())
+        for row in zip(*chunk):
+            yield row
+
+
+def generate(conn, days, seed=1984, first_day=1, **size):
+    """
+    Generate days and write them in the tables of a database.
+
+    :param conn: a connection to a database with the tables of :py:data:`create_dam_db_from_csv.TABLES`.
+    :param days: number of days.
+    :param seed: seed of the random generators of the days.
+    :param first_day: id of the first day, the next days having consecutive ids.
+    :param size: size of the days, see the arguments of :py:func:`generate_day` and :py:data:`DEFAULT_SIZE`.
+    :return: a dict mapping each table to its number of rows inserted.
+    """
+    counts = dict((table, 0) for table in TABLES)
+    for day in range(first_day, first_day + days):
+        rng = np.random.RandomState([seed, day])
+        for table, columns in generate_day(day, rng, **size).items():
+            assert len(columns) == len(get_col_names(table))
+            counts[table] += bulk_insert(conn, table, rows(columns))
+    return counts
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Utility for day-ahead electricity market clearing algorithm: generate a '
+                                        'database of synthetic days')
+    parser.add_argument("-p", "--path", help="Folder where data is located", default='data')
+    parser.add_argument("-d", "--database", help="Name of the sqlite database file, under the folder of the --path "
+                                                 "argument, replaced if it exists.", default='synthetic.sqlite3')
+    parser.add_argument("--days", type=int, help="Number of days.", default=1)
+    parser.add_argument("--first_day", type=int, help="Id of the first day.", default=1)
+    parser.add_argument("--seed", type=int, help="Seed for random number generation", default=1984)
+    parser.add_argument("--zones", type=int, help="Number of zones.", default=DEFAULT_SIZE['zones'])
+    parser.add_argument("--topology", help="Topology of the network.", default=DEFAULT_SIZE['topology'],
+                        choices=TOPOLOGIES)
+    parser.add_argument("--extra_lines", type=int, help="Number of additional lines of a mesh network.",
+                        default=DEFAULT_SIZE['extra_lines'])
+    parser.add_argument("--periods", type=int, help="Number of periods, e.g. 96 for quarter-hours.",
+                        default=DEFAULT_SIZE['periods'])
+    parser.add_argument("--curves", type=int, help="Number of supply and of demand curves per zone and period.",
+                        default=DEFAULT_SIZE['curves'])
+    parser.add_argument("--steps", type=int, help="Number of steps per curve.", default=DEFAULT_SIZE['steps'])
+    parser.add_argument("--blocks", type=int, help="Number of block orders per zone.", default=DEFAULT_SIZE['blocks'])
+    parser.add_argument("--complex_orders", type=int, help="Number of complex orders per zone.",
+                        default=DEFAULT_SIZE['complex_orders'])
+    parser.add_argument("--complex_steps", type=int, help="Number of steps of a complex order per period.",
+                        default=DEFAULT_SIZE['complex_steps'])
+    parser.add_argument("--ramp_share", type=float, help="Share of the complex orders with ramping conditions.",
+                        default=DEFAULT_SIZE['ramp_share'])
+    parser.add_argument("--stop_share", type=float, help="Share of the complex orders with a scheduled stop.",
+                        default=DEFAULT_SIZE['stop_share'])
+    parser.add_argument("--pun_orders", type=int, help="Number of PUN orders per period, instead of complex orders.",
+                        default=DEFAULT_SIZE['pun_orders'])
+    args = parser.parse_args()
+
+    db_file = '%s/%s' % (args.path, args.database)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    conn = sqlite3.connect(db_file)
+    set_offline_pragmas(conn)
+    create_tables(conn, indexes=False)
+
+    t0 = time.time()
+    counts = generate(conn, args.days, args.seed, args.first_day,
+                      **dict((name, getattr(args, name)) for name in DEFAULT_SIZE))
+    create_indexes(conn)
+    conn.commit()
+    restore_pragmas(conn)
+    conn.close()
+    for table in sorted(counts):
+        print("%-17s: %10d rows" % (table, counts[table]))
+    print("DONE in %.1f s" % (time.time() - t0))
@@ -0,0 +1,209 @@
+"""
+Content-addressed cache of the artifacts of the resolution of the days, so that runs of a back-test that only differ by
+the settings of the solver do not redo the work that does not depend on them.
+
+The artifacts of a day are stored in a sub-folder named after :py:func:`model_key`, a hash of the order book, of the
+network and of the options of :py:data:`MODEL_OPTIONS` that change the model. They are the model files written by
+:py:meth:`DAM.exportModel`, the relaxed PUN prices of the first phase of :py:meth:`PUN_DAM.advanced_solve`, the
+incumbent of its second phase, and the final solutions, the latter also keyed by :py:func:`solver_key` and the
+strategy. Solutions are stored as the values of the variables of the model, and are loaded back in the variables.
+"""
+import os
+import errno
+import shutil
+import hashlib
+import logging
+
+import numpy as np
+from pyomo.core.base import Var
+from pyomo.opt import ProblemFormat
+
+import openDAM.conf.options as options
+
+## Version of the artifacts, part of the keys so that the artifacts of older versions are not reused.
+FORMAT = 1
+
+## Options changing the model of a day, part of the key of its artifacts.
+MODEL_OPTIONS = ['SPLIT', 'SECONDARY_SET', 'BINARY_EXP_NUMBER', 'EPS', 'NO_EXCHANGE_CAPACITY', 'PUN_IMBALACE_TOL_LB',
+                 'PUN_IMBALACE_TOL_UB', 'PRIMAL', 'DUAL', 'APPLY_LOAD_GRADIENT', 'APPLY_SCHEDULED_STOP', 'APPLY_MIC',
+                 'BACKEND']
+
+## Columns of the order book part of the key of the artifacts, see OrdersBook.column.
+BOOK_COLUMNS = ['type', 'zone', 'period', 'price', 'volume', 'block_ids', 'block_offsets', 'block_periods',
+                'block_volumes']
+
+
+def _update(h, values):
+    """
+    Add an array of values to a hash, with its type and shape.
+    """
+    a = np.ascontiguousarray(values)
+    h.update(('%s %s' % (a.dtype.str, a.shape)).encode())
+    h.update(a.tobytes())
+
+
+def model_key(dam):
+    """
+    :param dam: a DAM object whose order book is created.
+    :return: the SHA-1 hex digest of the class of the market, of its order book, network and price cap, and of the
+        options of :py:data:`MODEL_OPTIONS`.
+    """
+    h = hashlib.sha1(('format %d %s %r' % (FORMAT, type(dam).__name__, tuple(dam.priceCap))).encode())
+    h.update(repr([(name, getattr(options, name, None)) for name in MODEL_OPTIONS]).encode())
+
+    book = dam.orders
+    for name in BOOK_COLUMNS:
+        _update(h, book.column(name))
+    _update(h, np.array(book.complex_offsets, dtype=np.int64))
+    _update(h, np.array(book.complex_sub_ids, dtype=np.int64))
+
+    for c in getattr(dam, 'complexOrders', []):
+        h.update(repr((c.FT, c.VT, c.ramp_down, c.ramp_up, c.SSperiods)).encode())
+    _update(h, np.array([p.merit_order for p in getattr(dam, 'punOrders', [])], dtype=np.float64))
+
+    periods = sorted(book.periods)
+    for l in dam.connections:
+        h.update(repr((l.line_id, l.from_id, l.to_id)).encode())
+        _update(h, np.array([[l.capacity_up[t], l.capacity_down[t]] for t in periods], dtype=np.float64))
+    return h.hexdigest()
+
+
+def solver_key():
+    """
+    :return: a short hash of the solver and of its options, identifying the final solutions of a day.
+    """
+    solver_options = sorted((str(k), repr(v)) for k, v in options.SOLVER.options.items()) \
+        if options.SOLVER is not None else []
+    settings = (options.SOLVER_NAME, solver_options, sorted(options.MATRIX_SOLVER_OPTIONS.items()))
+    return hashlib.sha1(repr(settings).encode()).hexdigest()[:16]
+
+
+def fixed_key(model):
+    """
+    :return: a short hash of the variables of a Pyomo model that are fixed and of their values, '' if none is fixed.
+    """
+    fixed = [(v.name, v.value) for v in model.component_data_objects(Var) if v.fixed]
+    return hashlib.sha1(repr(fixed).encode()).hexdigest()[:16] if fixed else ''
+
+
+class ArtifactCache:
+    """
+    Artifacts of the resolution of one day, in the sub-folder of its :py:func:`model_key` under the cache folder.
+    """
+
+    def __init__(self, folder, dam):
+        """
+
+        :param folder: folder of the cache, created if needed. Can be shared by several databases and runs.
+        :param dam: the DAM object of the day, whose order book is created.
+        """
+        self.key = model_key(dam)
+        self.path = '%s/%s' % (folder, self.key)  #: Folder of the artifacts of the day
+        self.hits = 0  #: Number of artifacts found in the cache
+        self.misses = 0  #: Number of artifacts looked for and not found
+        try:
+            os.makedirs(self.path)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+    def file_name(self, name):
+        """
+        :return: the path of an artifact of the day.
+        """
+        return '%s/%s' % (self.path, name)
+
+    def _lookup(self, name):
+        """
+        :return: True if an artifact exists, counting it in hits or misses.
+        """
+        if os.path.exists(self.file_name(name)):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def load_prices(self, name):
+        """
+        :param name: name of the artifact, e.g. 'relaxed_prices'.
+        :return: a dict of prices by period, or None if the artifact does not exist.
+        """
+        if not self._lookup(name + '.npz'):
+            return None
+        with np.load(self.file_name(name + '.npz')) as arrays:
+            return dict(zip(arrays['periods'].tolist(), arrays['prices'].tolist()))
+
+    def save_prices(self, name, prices):
+        """
+        :param name: name of the artifact.
+        :param prices: a dict of prices by period.
+        """
+        periods = sorted(prices)
+        self._write(self.file_name(name + '.npz'),
+                    lambda f: np.savez(f, periods=np.array(periods, dtype=np.int64),
+                                       prices=np.array([prices[t] for t in periods], dtype=np.float64)))
+
+    def load_values(self, model, name):
+        """
+        Load the values of the variables stored in an artifact into a Pyomo model. Variables of the model missing
+        from the artifact keep their value.
+
+        :param model: a Pyomo model of the day.
+        :param name: name of the artifact, e.g. 'incumbent'.
+        :return: dict of the scalars stored with the values, see :py:meth:`save_values`, or None if the artifact does
+            not exist.
+        """
+        if not self._lookup(name + '.npz'):
+            return None
+        with np.load(self.file_name(name + '.npz')) as arrays:
+            values = dict(zip(arrays['names'].tolist(), arrays['values'].tolist()))
+            scalars = dict((k[len('scalar.'):], arrays[k].tolist()) for k in arrays.files if k.startswith('scalar.'))
+        for v in model.component_data_objects(Var):
+            value = values.get(v.name)
+            if value is not None:
+                v.set_value(None if np.isnan(value) else value, skip_validation=True)
+        return scalars
+
+    def save_values(self, model, name, **scalars):
+        """
+        Store the values of the variables of a Pyomo model.
+
+        :param model: a solved Pyomo model of the day.
+        :param name: name of the artifact.
+        :param scalars: numbers stored with the values, e.g. the gap of the solution.
+        """
+        variables = list(model.component_data_objects(Var))
+        arrays = dict(('scalar.%s' % k, np.array(v, dtype=np.float64)) for k, v in scalars.items())
+        arrays['names'] = np.array([v.name for v in variables], dtype=np.str_)
+        arrays['values'] = np.array([np.nan if v.value is None else v.value for v in variables], dtype=np.float64)
+        self._write(self.file_name(name + '.npz'), lambda f: np.savez(f, **arrays))
+
+    def export_model(self, dam, filename):
+        """
+        Copy the LP file of the model of a day to filename, writing it in the cache first if it is not there.
+
+        The relaxed PUN model and models with fixed variables are different artifacts.
+
+        :param dam: the DAM object of the day, with a Pyomo model.
+        :param filename: path of the copy.
+        """
+        name = 'model%s' % ('_relaxed' if getattr(dam, 'relax_PUN', False) else '')
+        fixed = fixed_key(dam.model)
+        name = '%s%s.lp' % (name, '_fixed_%s' % fixed if fixed else '')
+        if not self._lookup(name):
+            tmp = '%s.%d.tmp.lp' % (self.file_name(name), os.getpid())
+            dam.model.write(filename=tmp, format=ProblemFormat.cpxlp, io_options={"symbolic_solver_labels": True})
+            os.rename(tmp, self.file_name(name))
+        else:
+            logging.info("Model file %s read from the artifact cache." % name)
+        shutil.copyfile(self.file_name(name), filename)
+
+    @staticmethod
+    def _write(file_name, write):
+        """
+        Write a file under a temporary name and rename it, so that readers never see a partial file.
+        """
+        tmp = '%s.%d.tmp' % (file_name, os.getpid())
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.rename(tmp, file_name)
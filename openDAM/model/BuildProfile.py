@@ -0,0 +1,107 @@
+import time
+
+from pyomo.core.base import Constraint, Var
+
+import openDAM.conf.options as options
+
+FIELDS = ['DAY_ID', 'MODEL', 'BLOCK', 'TIME', 'ALLOCATED_KB', 'COMPONENTS', 'CONSTRAINTS', 'VARIABLES']
+
+
+class BuildProfile:
+    """
+    Profile of the generation of the model of a day.
+
+    The generation is split in named blocks, a block being everything created between two calls to
+    :py:meth:`start`. For each block, the profile records the wall time, the memory allocated by Python, and the
+    number of Pyomo constraint and variable components, constraints and variables added to the model. Constraints and
+    variables are counted on the whole model at the start and end of each block, so those added to a component of an
+    earlier block, e.g. a ConstraintList, are counted in the block that adds them.
+
+    Allocations are traced with tracemalloc when options.PROFILE_ALLOCATIONS is set, and are 0 otherwise since
+    tracing slows down the generation.
+
+    :param day_id: id of the day.
+    :param model: Pyomo model being built.
+    """
+
+    def __init__(self, day_id, model):
+        self.day_id = day_id
+        self.model = model
+        self.blocks = []  #: list of (name, time, allocated KB, components, constraints, variables)
+
+        self._tracemalloc = None
+        if options.PROFILE_ALLOCATIONS:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracemalloc = tracemalloc
+
+        self._name = None
+        self._t_start = None
+        self._memory_start = 0
+        self._counts = (0, 0, 0)  # components, constraints and variables of the model before the current block
+
+    def start(self, name):
+        """
+        End the current block, if any, and start a new one.
+
+        :param name: name of the new block, e.g. the name of the constraint it creates.
+        """
+        self._end_block()
+        self._name = name
+        self._counts = self._count()
+        self._memory_start = self._memory()
+        self._t_start = time.time()
+
+    def stop(self):
+        """
+        End the current block and the profiling.
+        """
+        self._end_block()
+        if self._tracemalloc is not None:
+            self._tracemalloc.stop()
+            self._tracemalloc = None
+
+    def _memory(self):
+        if self._tracemalloc is None:
+            return 0
+        return self._tracemalloc.get_traced_memory()[0]
+
+    def _end_block(self):
+        if self._name is None:
+            return
+        t = time.time() - self._t_start
+        allocated = (self._memory() - self._memory_start) / 1024.0
+
+        counts = self._count()
+        self.blocks.append((self._name, t, allocated) + tuple(n - m for n, m in zip(counts, self._counts)))
+        self._name = None
+
+    def _count(self):
+        """
+        :return: the number of constraint and variable components, constraint data and variable data objects of the
+            model.
+        """
+        components = 0
+        sizes = {}
+        for ctype in (Constraint, Var):
+            # The length of a component is its number of data objects, counted without iterating over them.
+            objects = list(self.model.component_objects(ctype, descend_into=False))
+            components += len(objects)
+            sizes[ctype] = sum(len(component) for component in objects)
+        return components, sizes[Constraint], sizes[Var]
+
+    @property
+    def time(self):
+        """
+        Total time of the profiled blocks.
+        """
+        return sum(block[1] for block in self.blocks)
+
+    def lines(self, model_name):
+        """
+        Format the profile as CSV lines with the columns in :py:data:`FIELDS`.
+
+        :param model_name: name of the model in the report, e.g. PUN or COMPLEX.
+        """
+        return ['%d,%s,%s,%.4f,%.1f,%d,%d,%d\n' % ((self.day_id, model_name) + block) for block in self.blocks]
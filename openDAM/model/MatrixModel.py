@@ -0,0 +1,432 @@
+import numpy as np
+
+from pyomo.core.base import Constraint, Var
+
+import openDAM.conf.options as options
+
+MAXIMIZE = -1
+MINIMIZE = 1
+
+
+class MatrixModel:
+    """
+    Mixed integer linear program stored directly in matrix form, as an alternative to a Pyomo model.
+
+    Variables are added by named, indexed groups (:py:class:`MatrixVar`), and constraints by named blocks of rows
+    (:py:class:`ConstraintBlock`) given as sparse coefficients. The model is assembled in a SciPy CSR matrix, written
+    in LP format or solved with HiGHS through its Python API.
+
+    A group of variables is an attribute of the model, and its entries have the value, fixed, setlb and setub
+    attributes of Pyomo variables, so that the code reading a solution works with both models. After a solve, obj
+    is the value of the objective, like value(model.obj) for a Pyomo model.
+
+    :param name: name of the model.
+    :param sense: MAXIMIZE or MINIMIZE.
+    """
+
+    def __init__(self, name='', sense=MAXIMIZE):
+        self.name = name
+        self.sense = sense
+
+        self.lb = []  #: lower bound of each column
+        self.ub = []  #: upper bound of each column
+        self.integer = []  #: whether each column is integer
+        self.values = []  #: value of each column, None before a solve
+        self.fixed = []  #: whether each column is fixed at its value
+        self.cost = None  #: objective coefficient of each column
+        self.obj = None  #: value of the objective after a solve
+
+        self._vars = []
+        self._blocks = []
+
+    @property
+    def n_cols(self):
+        return len(self.lb)
+
+    @property
+    def n_rows(self):
+        return sum(len(block) for block in self._blocks)
+
+    def add_var(self, name, keys, lb=-np.inf, ub=np.inf, integer=False):
+        """
+        Add a group of variables.
+
+        :param name: name of the group, which becomes an attribute of the model.
+        :param keys: index of the variables, e.g. bid ids or (zone, period) tuples.
+        :param lb: lower bound, a number or a sequence with one bound per key.
+        :param ub: upper bound, a number or a sequence with one bound per key.
+        :param integer: True for integer variables.
+        :return: the :py:class:`MatrixVar`.
+        """
+        if hasattr(self, name):
+            raise ValueError('%s is already an attribute of the model' % name)
+        var = MatrixVar(self, name, keys, self.n_cols)
+        n = len(var)
+        self.lb.extend(np.broadcast_to(np.asarray(lb, dtype=float), (n,)).tolist())
+        self.ub.extend(np.broadcast_to(np.asarray(ub, dtype=float), (n,)).tolist())
+        self.integer.extend([integer] * n)
+        self.values.extend([None] * n)
+        self.fixed.extend([False] * n)
+        self._vars.append(var)
+        setattr(self, name, var)
+        return var
+
+    def add_constraints(self, name):
+        """
+        Add an empty block of constraints, to be filled with :py:meth:`ConstraintBlock.add` or
+        :py:meth:`ConstraintBlock.extend`.
+
+        :param name: name of the block.
+        :return: the :py:class:`ConstraintBlock`.
+        """
+        block = ConstraintBlock(name)
+        self._blocks.append(block)
+        return block
+
+    def set_objective(self, cols, coefs):
+        """
+        Set the objective, coefficients of the same column are summed.
+
+        :param cols: columns.
+        :param coefs: coefficient of each column.
+        """
+        self.cost = np.bincount(np.asarray(cols, dtype=int), weights=np.asarray(coefs, dtype=float),
+                                minlength=self.n_cols)
+
+    def component_objects(self, ctype, descend_into=True):
+        """
+        Groups of variables or blocks of constraints, like the method of Pyomo blocks used by :py:class:`BuildProfile`.
+
+        :param ctype: Var or Constraint.
+        """
+        if ctype is Var:
+            return iter(self._vars)
+        if ctype is Constraint:
+            return iter(self._blocks)
+        return iter([])
+
+    def matrix(self):
+        """
+        :return: the constraint matrix as a SciPy CSR matrix, with the blocks of rows in the order they were added.
+        """
+        from scipy.sparse import coo_matrix
+
+        rows, cols, coefs = [], [], []
+        offset = 0
+        for block in self._blocks:
+            block_rows, block_cols, block_coefs = block.coefficients()
+            rows.append(block_rows + offset)
+            cols.append(block_cols)
+            coefs.append(block_coefs)
+            offset += len(block)
+        if not rows:
+            rows, cols, coefs = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)], [np.zeros(0)]
+        matrix = coo_matrix((np.concatenate(coefs), (np.concatenate(rows), np.concatenate(cols))),
+                            shape=(offset, self.n_cols)).tocsr()
+        matrix.eliminate_zeros()
+        return matrix
+
+    def row_bounds(self):
+        """
+        :return: the lower and upper bound of each row, as two NumPy arrays.
+        """
+        if not self._blocks:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate([block.lo for block in self._blocks]), \
+               np.concatenate([block.hi for block in self._blocks])
+
+    def col_bounds(self):
+        """
+        :return: the lower and upper bound of each column, fixed columns being bounded by their value.
+        """
+        lb = np.array(self.lb)
+        ub = np.array(self.ub)
+        for col in np.flatnonzero(self.fixed).tolist():
+            lb[col] = ub[col] = self.values[col]
+        return lb, ub
+
+    def col_names(self):
+        names = []
+        for var in self._vars:
+            names.extend(var.col_names())
+        return names
+
+    def row_names(self):
+        names = []
+        for block in self._blocks:
+            names.extend('%s(%d)' % (block.name, r) for r in range(len(block)))
+        return names
+
+    def write(self, filename, format=None, io_options=None):
+        """
+        Write the model in CPLEX LP format, with the same call as for a Pyomo model.
+
+        :param filename: path of the LP file.
+        :param format: ignored, the LP format is the only one supported.
+        :param io_options: ignored, names are always symbolic.
+        """
+        matrix = self.matrix()
+        row_lo, row_hi = self.row_bounds()
+        col_lb, col_ub = self.col_bounds()
+        col_names = self.col_names()
+        row_names = self.row_names()
+
+        def terms(cols, coefs):
+            if len(cols) == 0:
+                return ['0 %s' % col_names[0]]
+            return ['%s %.17g %s' % ('-' if c < 0 else '+', abs(c), col_names[j]) for j, c in zip(cols, coefs)]
+
+        def write_terms(f, prefix, terms, suffix):
+            f.write(prefix)
+            for start in range(0, len(terms), 8):
+                f.write(' ' + ' '.join(terms[start:start + 8]) + '\n')
+            f.write(suffix)
+
+        with open(filename, 'w') as f:
+            f.write('\\* %s *\\\n' % self.name)
+            f.write('Maximize\n' if self.sense == MAXIMIZE else 'Minimize\n')
+            cost = self.cost if self.cost is not None else np.zeros(self.n_cols)
+            obj_cols = np.flatnonzero(cost)
+            write_terms(f, 'obj:\n', terms(obj_cols, cost[obj_cols]), '')
+
+            f.write('Subject To\n')
+            for r in range(matrix.shape[0]):
+                start, end = matrix.indptr[r], matrix.indptr[r + 1]
+                row_terms = terms(matrix.indices[start:end], matrix.data[start:end])
+                lo, hi = row_lo[r], row_hi[r]
+                if lo == hi:
+                    sense = '= %.17g' % hi
+                elif np.isinf(lo):
+                    sense = '<= %.17g' % hi
+                elif np.isinf(hi):
+                    sense = '>= %.17g' % lo
+                else:
+                    raise ValueError('Ranged row %s cannot be written in LP format' % row_names[r])
+                write_terms(f, '%s:\n' % row_names[r], row_terms, ' %s\n' % sense)
+
+            f.write('Bounds\n')
+            for name, lb, ub in zip(col_names, col_lb.tolist(), col_ub.tolist()):
+                if lb == 0.0 and np.isinf(ub):
+                    continue
+                if np.isinf(lb) and np.isinf(ub):
+                    f.write(' %s free\n' % name)
+                elif lb == ub:
+                    f.write(' %s = %.17g\n' % (name, lb))
+                else:
+                    f.write(' %s <= %s <= %s\n' % ('-inf' if np.isinf(lb) else '%.17g' % lb, name,
+                                                 'inf' if np.isinf(ub) else '%.17g' % ub))
+
+            integers = [name for name, integer in zip(col_names, self.integer) if integer]
+            if integers:
+                f.write('Generals\n')
+                for name in integers:
+                    f.write(' %s\n' % name)
+            f.write('End\n')
+
+    def solve(self, tee=False):
+        """
+        Solve the model with HiGHS and store the solution in the values of the variables.
+
+        The options of HiGHS are taken from options.MATRIX_SOLVER_OPTIONS.
+
+        :param tee: print the output of the solver.
+        :return: True if a feasible solution was found.
+        """
+        import highspy
+
+        matrix = self.matrix().tocsc()
+        row_lo, row_hi = self.row_bounds()
+        col_lb, col_ub = self.col_bounds()
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.n_cols
+        lp.num_row_ = matrix.shape[0]
+        lp.sense_ = highspy.ObjSense.kMaximize if self.sense == MAXIMIZE else highspy.ObjSense.kMinimize
+        lp.col_cost_ = self.cost if self.cost is not None else np.zeros(self.n_cols)
+        lp.col_lower_ = col_lb
+        lp.col_upper_ = col_ub
+        lp.row_lower_ = row_lo
+        lp.row_upper_ = row_hi
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.num_col_ = self.n_cols
+        lp.a_matrix_.num_row_ = matrix.shape[0]
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+        if any(self.integer):
+            lp.integrality_ = [highspy.HighsVarType.kInteger if integer else highspy.HighsVarType.kContinuous
+                               for integer in self.integer]
+
+        highs = highspy.Highs()
+        highs.setOptionValue('output_flag', bool(tee))
+        for key, val in options.MATRIX_SOLVER_OPTIONS.items():
+            highs.setOptionValue(key, val)
+        highs.passModel(lp)
+        highs.run()
+
+        # An optimal LP can be left with primal infeasibilities slightly above the tolerance after postsolve.
+        info = highs.getInfo()
+        if info.primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible and \
+                highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            self.obj = None
+            return False
+        self.values = list(highs.getSolution().col_value)
+        self.obj = info.objective_function_value
+        return True
+
+
+class MatrixVar:
+    """
+    Group of variables of a :py:class:`MatrixModel`, indexed by keys like a Pyomo Var.
+
+    :param model: the model.
+    :param name: name of the group.
+    :param keys: index of the variables.
+    :param start: column of the first variable.
+    """
+
+    def __init__(self, model, name, keys, start):
+        self.model = model
+        self.name = name
+        self.keys = list(keys)
+        self.start = start
+        self.columns = dict(zip(self.keys, range(start, start + len(self.keys))))  #: key -> column
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __getitem__(self, key):
+        return MatrixVarData(self.model, self.columns[key])
+
+    def col(self, key):
+        """
+        :return: the column of the variable of a given key.
+        """
+        return self.columns[key]
+
+    def cols(self, keys):
+        """
+        :return: the columns of the variables of the given keys, as a NumPy array.
+        """
+        columns = self.columns
+        return np.array([columns[k] for k in keys], dtype=int)
+
+    def col_names(self):
+        names = []
+        for k in self.keys:
+            if isinstance(k, tuple):
+                names.append('%s(%s)' % (self.name, '_'.join(str(i) for i in k)))
+            else:
+                names.append('%s(%s)' % (self.name, k))
+        return names
+
+
+class MatrixVarData(object):
+    """
+    A variable of a :py:class:`MatrixModel`, with the attributes of a Pyomo variable used to fix it and read its
+    value.
+    """
+
+    __slots__ = ('model', 'col')
+
+    def __init__(self, model, col):
+        self.model = model
+        self.col = col
+
+    @property
+    def value(self):
+        return self.model.values[self.col]
+
+    @value.setter
+    def value(self, val):
+        self.model.values[self.col] = val
+
+    @property
+    def fixed(self):
+        return self.model.fixed[self.col]
+
+    @fixed.setter
+    def fixed(self, fixed):
+        self.model.fixed[self.col] = fixed
+
+    def setlb(self, lb):
+        self.model.lb[self.col] = lb
+
+    def setub(self, ub):
+        self.model.ub[self.col] = ub
+
+
+class ConstraintBlock:
+    """
+    Named block of rows of a :py:class:`MatrixModel`, each row being bounded by lo <= row <= hi.
+
+    :param name: name of the block.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._parts = []  # (rows, cols, coefs, lo, hi) of each call to add or extend
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def add(self, cols, coefs, lo=-np.inf, hi=np.inf):
+        """
+        Add one row.
+
+        :param cols: columns of the non zero coefficients, several coefficients of a column are summed.
+        :param coefs: coefficients.
+        :param lo: lower bound, -inf if none.
+        :param hi: upper bound, inf if none.
+        :return: the index of the row in the block.
+        """
+        self.extend(np.zeros(len(cols), dtype=int), cols, coefs, [lo], [hi])
+        return self._n - 1
+
+    def extend(self, rows, cols, coefs, lo, hi):
+        """
+        Add several rows from coordinates.
+
+        :param rows: row of each coefficient, from 0 to the number of new rows - 1.
+        :param cols: column of each coefficient.
+        :param coefs: coefficients.
+        :param lo: lower bound of each new row.
+        :param hi: upper bound of each new row.
+        """
+        lo = np.asarray(lo, dtype=float)
+        self._parts.append((np.asarray(rows, dtype=int) + self._n, np.asarray(cols, dtype=int),
+                            np.asarray(coefs, dtype=float), lo, np.asarray(hi, dtype=float)))
+        self._n += len(lo)
+
+    def _compact(self):
+        if len(self._parts) != 1:
+            if self._parts:
+                self._parts = [tuple(np.concatenate(part) for part in zip(*self._parts))]
+            else:
+                empty = np.zeros(0, dtype=int)
+                self._parts = [(empty, empty, np.zeros(0), np.zeros(0), np.zeros(0))]
+        return self._parts[0]
+
+    def coefficients(self):
+        """
+        :return: rows, columns and coefficients of the block, as NumPy arrays.
+        """
+        return self._compact()[:3]
+
+    @property
+    def lo(self):
+        """
+        Lower bound of each row, -inf if none.
+        """
+        return self._compact()[3]
+
+    @property
+    def hi(self):
+        """
+        Upper bound of each row, inf if none.
+        """
+        return self._compact()[4]
@@ -0,0 +1,92 @@
+class Network:
+    """
+    Transmission network between zones, derived once from a list of lines.
+
+    Capacities are stored by direction: the capacity from zone a to zone b is the capacity up of the first line
+    going from a to b, or the capacity down of the first line going from b to a, whichever comes first.
+
+    The network is sparse: the models only create flows for the arcs, the ordered pairs of distinct zones linked by a
+    line, and find the lines of a zone with the incidence lists instead of scanning all the lines.
+
+    :param lines: list of Line objects.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.capacities = {}  #: dict (from zone, to zone, period) -> capacity in that direction
+        self.incidence = {}  #: dict zone -> list of (line number from 1, 1 if the line starts in the zone else -1)
+        arcs = set()
+        for c, line in enumerate(lines, 1):
+            for p in line.capacity_up:
+                if (line.from_id, line.to_id, p) not in self.capacities:
+                    self.capacities[line.from_id, line.to_id, p] = line.capacity_up[p]
+                    self.capacities[line.to_id, line.from_id, p] = line.capacity_down[p]
+            self.incidence.setdefault(line.from_id, []).append((c, 1))
+            if line.to_id != line.from_id:
+                self.incidence.setdefault(line.to_id, []).append((c, -1))
+                arcs.update([(line.from_id, line.to_id), (line.to_id, line.from_id)])
+        self.arcs = sorted(arcs)  #: Ordered pairs (from zone, to zone) of distinct zones linked by a line, sorted
+
+        self._successors = {}
+        self._paths = {}
+
+    def capacity(self, from_id, to_id, period):
+        """
+        :return: the maximum flow from zone from_id to zone to_id at a given period, 0 if they are not connected.
+        """
+        return self.capacities.get((from_id, to_id, period), 0)
+
+    def zone_arcs(self, zones):
+        """
+        :param zones: a collection of zones.
+        :return: the sorted arcs whose both zones are in zones.
+        """
+        return [(f, t) for f, t in self.arcs if f in zones and t in zones]
+
+    def successors(self, period):
+        """
+        Adjacency structure of the network at a given period.
+
+        :return: a dict zone -> sorted list of zones that can be reached with a positive capacity.
+        """
+        if period not in self._successors:
+            successors = {}
+            for (f, t, p), c in self.capacities.items():
+                if p == period and c > 0:
+                    successors.setdefault(f, []).append(t)
+            for f in successors:
+                successors[f].sort()
+            self._successors[period] = successors
+        return self._successors[period]
+
+    def paths(self, source, target, period, via, max_edges=5):
+        """
+        Simple paths from source to target with a positive capacity on every edge, either all in the direction of
+        the path, or all in the reverse direction. Results are cached.
+
+        :param source: zone where paths start.
+        :param target: zone where paths end.
+        :param period: period at which capacities are considered.
+        :param via: frozenset of the zones that can be crossed between source and target.
+        :param max_edges: maximum number of edges of a path.
+        :return: a list of tuples of zones (source, ..., target), sorted by length.
+        """
+        key = (source, target, period, via, max_edges)
+        if key not in self._paths:
+            paths = set(self._simple_paths(source, target, period, via, max_edges))
+            paths.update(path[::-1] for path in self._simple_paths(target, source, period, via, max_edges))
+            self._paths[key] = sorted(paths, key=lambda path: (len(path), path))
+        return self._paths[key]
+
+    def _simple_paths(self, source, target, period, via, max_edges):
+        successors = self.successors(period)
+        paths = []
+        stack = [(source,)]
+        while stack:
+            path = stack.pop()
+            for z in successors.get(path[-1], []):
+                if z == target:
+                    paths.append(path + (z,))
+                elif z in via and z not in path and len(path) < max_edges:
+                    stack.append(path + (z,))
+        return paths
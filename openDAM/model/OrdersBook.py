@@ -1,9 +1,22 @@
+import numpy as np
+
 from openDAM.model.SinglePeriodBid import *
 from openDAM.model.BlockBid import *
 
+## Period stored in the period column for bids spanning several periods (block bids).
+NO_PERIOD = -1
+
+
 class OrdersBook:
     """
     Structure containting step orders and block bids.
+
+    The list of bid objects is the primary storage of the book: step curves, complex orders and the results hold
+    references to the bids. Next to it, the book exposes the bids as NumPy columns (type, zone, period, price,
+    volume, acceptance) together with CSR-style tables for block volumes and complex orders sub-ids.
+    Columns are built lazily, the first time they are requested after the book has been modified, and are
+    what the models use to build their index sets. They are a copy of the fields of the bids, so they add to the
+    memory of the book rather than replace the objects.
     """
 
     def __init__(self):
@@ -13,6 +26,13 @@ class OrdersBook:
         self.locations = set()
         self.volumes = None
 
+        self.complex_offsets = [0]  #: CSR offsets of the sub-ids of each complex order in complex_sub_ids
+        self.complex_sub_ids = []  #: Ids of the step bids of all complex orders, contiguous per complex order
+
+        self._columns = None
+        self._ids = {}
+        self._groups = {}
+
     def append(self, bid): # TODO declare periods upfront instead of guessing
         """
         Append a bid to the orders book.
@@ -20,6 +40,7 @@ class OrdersBook:
         """
 
         self.bids.append(bid)
+        self._invalidate()
 
         # Update the sets
         if bid.location not in self.locations:
@@ -40,4 +61,128 @@ class OrdersBook:
 
     def extend(self, bids):
         for b in bids:
-            self.append(b)
\ No newline at end of file
+            self.append(b)
+
+    def register_complex(self, ids):
+        """
+        Record the ids of the step bids of a complex order.
+
+        :param ids: ids of the sub-orders, as returned when the complex order was submitted.
+        """
+        self.complex_sub_ids.extend(ids)
+        self.complex_offsets.append(len(self.complex_sub_ids))
+
+    def complex_ids(self, o):
+        """
+        :param o: index of the complex order, starting at 0, in submission order.
+        :return: the ids of the step bids of complex order o.
+        """
+        return self.complex_sub_ids[self.complex_offsets[o]:self.complex_offsets[o + 1]]
+
+    def column(self, name):
+        """
+        Get a column of the book as a NumPy array indexed by bid id.
+
+        :param name: one of 'type', 'zone', 'period', 'price', 'volume', 'acceptance',
+            'block_ids', 'block_offsets', 'block_periods', 'block_volumes'.
+        """
+        if self._columns is None:
+            self._build_columns()
+        return self._columns[name]
+
+    def ids(self, type, side=None):
+        """
+        Ids of the bids of a given type, in increasing order.
+
+        :param type: 'SB', 'BB' or 'PO'.
+        :param side: None for all bids, 'SUPPLY' for positive volumes, 'DEMAND' for negative volumes.
+        :return: a NumPy array of ids.
+        """
+        key = (type, side)
+        if key not in self._ids:
+            mask = self.column('type') == type
+            if side == 'SUPPLY':
+                mask &= self.column('volume') > 0
+            elif side == 'DEMAND':
+                mask &= self.column('volume') < 0
+            self._ids[key] = np.flatnonzero(mask)
+        return self._ids[key]
+
+    def index(self, type, side=None, by=('zone', 'period')):
+        """
+        Group the ids of the bids of a given type by the values of some columns.
+
+        Block bids are indexed in every period in which they have a volume.
+
+        :param type: 'SB', 'BB' or 'PO'.
+        :param side: see :py:meth:`ids`.
+        :param by: tuple of column names among 'zone' and 'period'.
+        :return: a dict whose keys are tuples of column values (or a single value if by has one element)
+            and values are lists of ids, in increasing order.
+        """
+        key = (type, side, by)
+        if key not in self._groups:
+            if type == 'BB':
+                offsets = self.column('block_offsets')
+                ids = np.repeat(self.column('block_ids'), np.diff(offsets))
+                columns = dict(zone=self.column('zone')[ids], period=self.column('block_periods'))
+            else:
+                ids = self.ids(type, side)
+                columns = dict(zone=self.column('zone')[ids], period=self.column('period')[ids])
+
+            groups = {}
+            for values in zip(ids.tolist(), *[columns[c].tolist() for c in by]):
+                groups.setdefault(values[1:] if len(by) > 1 else values[1], []).append(values[0])
+            self._groups[key] = groups
+        return self._groups[key]
+
+    def set_acceptance(self, i, acceptance):
+        """
+        Store the acceptance of bid i, both on the bid object and in the acceptance column.
+        """
+        self.bids[i].acceptance = acceptance
+        if self._columns is not None:
+            self._columns['acceptance'][i] = np.nan if acceptance is None else acceptance
+
+    def _invalidate(self):
+        self._columns = None
+        self._ids = {}
+        self._groups = {}
+
+    def _build_columns(self):
+        n = len(self.bids)
+        types = np.empty(n, dtype='U2')
+        zones = np.empty(n, dtype=int)
+        periods = np.empty(n, dtype=int)
+        prices = np.empty(n, dtype=float)
+        volumes = np.empty(n, dtype=float)
+        acceptance = np.empty(n, dtype=float)
+
+        block_ids = []
+        block_offsets = [0]
+        block_periods = []
+        block_volumes = []
+
+        for i, bid in enumerate(self.bids):
+            types[i] = bid.type
+            zones[i] = bid.location
+            prices[i] = bid.price
+            acceptance[i] = np.nan if bid.acceptance is None else bid.acceptance
+            if bid.type == 'BB':
+                periods[i] = NO_PERIOD
+                volumes[i] = bid.total_volume()
+                block_ids.append(i)
+                for t in sorted(bid.volumes):
+                    block_periods.append(t)
+                    block_volumes.append(bid.volumes[t])
+                block_offsets.append(len(block_periods))
+            else:
+                periods[i] = bid.period
+                volumes[i] = bid.volume
+
+        self._columns = dict(type=types, zone=zones, period=periods, price=prices, volume=volumes,
+                             acceptance=acceptance,
+                             block_ids=np.array(block_ids, dtype=int),
+                             block_offsets=np.array(block_offsets, dtype=int),
+                             block_periods=np.array(block_periods, dtype=int),
+                             block_volumes=np.array(block_volumes, dtype=float))
@@ -1 +1 @@
-__all__ = ["Bid", "BlockBid", "ComplexOrder", "Line", "OrdersBook", "SinglePeriodBid", "StepCurve"]
+__all__ = ["Bid", "BlockBid", "BuildProfile", "ComplexOrder", "Line", "MatrixModel", "Network", "OrdersBook", "SinglePeriodBid", "StepCurve"]
@@ -1,4 +1,6 @@
 from openDAM.model.dam import DAM
+from openDAM.model.BuildProfile import BuildProfile
+from openDAM.model.MatrixModel import MatrixModel, MAXIMIZE, MINIMIZE
 
 from pyomo.core.base import Constraint, summation, Objective, minimize, ConstraintList, \
     ConcreteModel, Set, RangeSet, Reals, Binary, NonNegativeReals, Var, maximize, Suffix
@@ -10,6 +12,10 @@ import openDAM.conf.options as options
 
 import logging
 
+import time
+
+import numpy as np
+
 class COMPLEX_DAM(DAM):
 
     def __init__(self, day, zones, curves, blockOrders, complexOrders, connections=None, priceCap=(0, 3000)):
@@ -19,6 +25,8 @@ class COMPLEX_DAM(DAM):
 
         self.complex_single_orders = []  # ids of step bids belonging to complex orders
 
+        self.solver = None  # persistent solver in which the model is loaded, False if there is none, see resolve
+
         self.create_order_book()
 
     def create_order_book(self):
@@ -31,7 +39,13 @@ class COMPLEX_DAM(DAM):
     def create_model(self):
         """
         Create and return the mathematical model.
+
+        The model is a Pyomo model, or a :py:class:`MatrixModel` if options.BACKEND is 'matrix', see
+        :py:meth:`create_matrix_model`.
         """
+        if options.BACKEND == 'matrix':
+            self.create_matrix_model()
+            return
 
         if options.DEBUG:
             logging.info("Creating model for day %d" % self.day_id)
@@ -42,19 +56,20 @@ class COMPLEX_DAM(DAM):
 
         # Create the optimization model
         model = ConcreteModel()
+        profile = BuildProfile(self.day_id, model)
+        profile.start('sets')
         model.periods = Set(initialize=book.periods)
         maxPeriod = max(book.periods)
         model.bids = Set(initialize=range(len(book.bids)))
         model.L = Set(initialize=book.locations)
-        model.sBids = Set(
-            initialize=[i for i in range(len(book.bids)) if book.bids[i].type == 'SB'])
-        model.bBids = Set(
-            initialize=[i for i in range(len(book.bids)) if book.bids[i].type == 'BB'])
+        model.sBids = Set(initialize=book.ids('SB').tolist())
+        model.bBids = Set(initialize=book.ids('BB').tolist())
         model.cBids = RangeSet(len(complexOrders))  # Complex orders
         model.C = RangeSet(len(self.connections))
         model.directions = RangeSet(2)  # 1 == up, 2 = down TODO: clean
 
         # Variables
+        profile.start('variables')
         model.xs = Var(model.sBids, domain=Reals,
                        bounds=(0.0, 1.0))  # Single period bids acceptance
         model.xb = Var(model.bBids, domain=Binary)  # Block bids acceptance
@@ -78,12 +93,16 @@ class COMPLEX_DAM(DAM):
         model.u = Var(model.C * model.directions * model.periods, domain=NonNegativeReals)
 
         # Objective
+        profile.start('objective')
+        cost = book.column('price') * book.column('volume')
+        sBidsCost = dict(zip(book.ids('SB').tolist(), cost[book.ids('SB')].tolist()))
+        bBidsCost = dict(zip(book.ids('BB').tolist(), cost[book.ids('BB')].tolist()))
+
         def primalObj(m):
             # Single period bids cost
-            expr = summation({i: book.bids[i].price * book.bids[i].volume for i in m.sBids}, m.xs)
+            expr = summation(sBidsCost, m.xs)
             # Block bids cost
-            expr += summation(
-                {i: book.bids[i].price * sum(book.bids[i].volumes.values()) for i in m.bBids}, m.xb)
+            expr += summation(bBidsCost, m.xb)
             return -expr
 
         if options.PRIMAL and not options.DUAL:
@@ -96,6 +115,7 @@ class COMPLEX_DAM(DAM):
             model.obj = Objective(rule=primalDualObj, sense=maximize)
 
         # Complex order constraint
+        profile.start('deactivate_suborders')
         if options.PRIMAL and options.DUAL:
             model.deactivate_suborders = ConstraintList()
             for o in model.cBids:
@@ -110,6 +130,7 @@ class COMPLEX_DAM(DAM):
                         model.deactivate_suborders.add(model.xs[id] <= model.xc[o])
 
         # Ramping constraints for complex orders
+        profile.start('complex_lg')
         def complex_volume_def_rule(m, o, p):
             sub_ids = complexOrders[o - 1].ids
             return m.complexVolume[o, p] == sum(
@@ -143,6 +164,7 @@ class COMPLEX_DAM(DAM):
                                              rule=complex_lg_up_rule)  # Balance constraint
 
         # Energy balance constraints
+        profile.start('balance')
         balanceExpr = {l: {t: 0.0 for t in model.periods} for l in model.L}
         for i in model.sBids:  # Simple bids
             bid = book.bids[i]
@@ -152,22 +174,24 @@ class COMPLEX_DAM(DAM):
             for t, v in bid.volumes.items():
                 balanceExpr[bid.location][t] += v * model.xb[i]
 
+        incidence = self.network.incidence
+
         def balanceCstr(m, l, t):
             export = 0.0
-            for c in model.C:
-                if self.connections[c - 1].from_id == l:
-                    export += m.f[c, 1, t] - m.f[c, 2, t]
-                elif self.connections[c - 1].to_id == l:
-                    export += m.f[c, 2, t] - m.f[c, 1, t]
+            for c, sign in incidence.get(l, []):
+                export += sign * (m.f[c, 1, t] - m.f[c, 2, t])
             return balanceExpr[l][t] == export
 
         if options.PRIMAL:
             model.balance = Constraint(model.L * book.periods, rule=balanceCstr)
 
         # Surplus of single period bids
+        profile.start('sBidSurplus')
+        plain_single_orders = set(self.plain_single_orders)
+
         def sBidSurplus(m, i):  # For the "usual" step orders
             bid = book.bids[i]
-            if i in self.plain_single_orders:
+            if i in plain_single_orders:
                 return m.s[i] >= (m.pi[bid.location, bid.period] - bid.price) * bid.volume
             else:
                 return Constraint.Skip
@@ -176,6 +200,7 @@ class COMPLEX_DAM(DAM):
             model.sBidSurplus = Constraint(model.sBids, rule=sBidSurplus)
 
         # Surplus definition for complex suborders accounting for impact of load gradient condition
+        profile.start('complex_sBidSurplus')
         if options.DUAL:
             model.complex_sBidSurplus = ConstraintList()
             for o in model.cBids:
@@ -187,6 +212,8 @@ class COMPLEX_DAM(DAM):
                         model.pi[l, bid.period] + model.pi_lg[
                             o, bid.period] - bid.price) * bid.volume)
 
+        profile.start('LG_price_def')
+
         def LG_price_def_rule(m, o, p):
             l = complexOrders[o - 1].location
 
@@ -207,18 +234,21 @@ class COMPLEX_DAM(DAM):
             model.LG_price_def = Constraint(model.cBids, model.periods, rule=LG_price_def_rule)
 
         # Surplus of block bids
+        profile.start('bBidSurplus')
         def bBidSurplus(m, i):
             bid = book.bids[i]
             bidVolume = -sum(bid.volumes.values())
             bigM = (self.priceCap[1] - self.priceCap[0]) * bidVolume  # FIXME tighten BIGM
             return m.s[i] + sum([m.pi[bid.location, t] * -v for t, v in
-                                 bid.volumes.items()]) >= bid.cost * bidVolume + bigM * (
+                                 bid.volumes.items()]) >= bid.price * bidVolume + bigM * (
                 1 - m.xb[i])
 
         if options.DUAL:
             model.bBidSurplus = Constraint(model.bBids, rule=bBidSurplus)
 
         # Surplus of complex orders
+        profile.start('cBidSurplus')
+
         def cBidSurplus(m, o):
             complexOrder = complexOrders[o - 1]
             sub_ids = complexOrder.ids
@@ -247,6 +277,8 @@ class COMPLEX_DAM(DAM):
         if options.DUAL:
             model.cBidSurplus_2 = Constraint(model.cBids, rule=cBidSurplus_2)  # MIC constraint
 
+        profile.start('cMIC')
+
         def cMIC(m, o):
             complexOrder = complexOrders[o - 1]
 
@@ -270,19 +302,21 @@ class COMPLEX_DAM(DAM):
             model.cMIC = Constraint(model.cBids, rule=cMIC)
 
         # Dual connections capacity
+        profile.start('dualCapacity')
         def dualCapacity(m, c, t):
+            connection = self.connections[c - 1]
             exportPrices = 0.0
-            for l in m.L:
-                if l == self.connections[c - 1].from_id:
-                    exportPrices += m.pi[l, t]
-                elif l == self.connections[c - 1].to_id:
-                    exportPrices -= m.pi[l, t]
+            if connection.from_id in m.L:
+                exportPrices += m.pi[connection.from_id, t]
+            if connection.to_id in m.L and connection.to_id != connection.from_id:
+                exportPrices -= m.pi[connection.to_id, t]
             return m.u[c, 1, t] - m.u[c, 2, t] + exportPrices == 0.0
 
         if options.DUAL:
             model.dualCapacity = Constraint(model.C * model.periods, rule=dualCapacity)
 
         # Dual optimality
+        profile.start('primalEqualsDual')
         def dualObj(m):
             dualObj = summation(m.s) + summation(m.sc)
 
@@ -321,7 +355,297 @@ class COMPLEX_DAM(DAM):
         if options.DUAL and options.PRIMAL:
             model.primalEqualsDual = Constraint(rule=primalEqualsDual)
 
+        profile.stop()
+        self.build_profile = profile
         self.model = model
+        self.solver = None
+        self.timings = {'build': profile.time}
+
+    def create_matrix_model(self):
+        """
+        Create the model of :py:meth:`create_model` directly in matrix form, as a :py:class:`MatrixModel`, without
+        building Pyomo expressions.
+
+        Variables and constraints have the same names, indexes and coefficients as in the Pyomo model.
+        """
+
+        if options.DEBUG:
+            logging.info("Creating matrix model for day %d" % self.day_id)
+
+        # Obtain the orders book
+        book = self.orders
+        complexOrders = self.complexOrders
+        prices = book.column('price')
+        volumes = book.column('volume')
+        zones = book.column('zone')
+        periods = book.column('period')
+
+        # Create the optimization model
+        model = MatrixModel(name="DAM with complex orders", sense=MAXIMIZE if options.PRIMAL else MINIMIZE)
+        profile = BuildProfile(self.day_id, model)
+        profile.start('sets')
+        model.periods = sorted(book.periods)
+        maxPeriod = max(book.periods)
+        model.L = sorted(book.locations)
+        model.sBids = book.ids('SB').tolist()
+        model.bBids = book.ids('BB').tolist()
+        model.cBids = list(range(1, len(complexOrders) + 1))  # Complex orders
+        model.C = list(range(1, len(self.connections) + 1))
+        directions = [1, 2]  # 1 == up, 2 = down
+
+        cp = [(o, p) for o in model.cBids for p in model.periods]
+        cdp = [(c, d, p) for c in model.C for d in directions for p in model.periods]
+
+        # The first step of the curve in the scheduled stop periods is not deactivated with the complex order
+        def scheduled_stop(complexOrder, i):
+            bid = book.bids[i]
+            return bid.period <= complexOrder.SSperiods and \
+                   bid.price == complexOrder.curves[bid.period].bids[0].price
+
+        # Variables
+        profile.start('variables')
+        xs = model.add_var('xs', model.sBids, 0.0, 1.0)  # Single period bids acceptance
+        xb = model.add_var('xb', model.bBids, 0.0, 1.0, integer=True)  # Block bids acceptance
+        xc = model.add_var('xc', model.cBids, 0.0, 1.0, integer=True)  # Complex orders acceptance
+        pi = model.add_var('pi', [(l, t) for l in model.L for t in model.periods],
+                           self.priceCap[0], self.priceCap[1])  # Market prices
+        s = model.add_var('s', range(len(book.bids)), 0.0)  # Bids
+        sc = model.add_var('sc', model.cBids, 0.0)  # complex orders
+        complexVolume = model.add_var('complexVolume', cp)
+        pi_lg_up = model.add_var('pi_lg_up', cp, 0.0)
+        pi_lg_down = model.add_var('pi_lg_down', cp, 0.0)
+        pi_lg = model.add_var('pi_lg', cp)
+        capacities = [self.connections[c - 1].capacity_up[t] if d == 1 else self.connections[c - 1].capacity_down[t]
+                      for (c, d, t) in cdp]
+        f = model.add_var('f', cdp, 0.0, capacities)
+        u = model.add_var('u', cdp, 0.0)
+
+        # Objective
+        profile.start('objective')
+        sBids = book.ids('SB')
+        bBids = book.ids('BB')
+        primal_cols = np.concatenate([xs.cols(model.sBids), xb.cols(model.bBids)])
+        primal_coefs = -np.concatenate([prices[sBids] * volumes[sBids], prices[bBids] * volumes[bBids]])
+
+        dual_cols = [np.arange(s.start, s.start + len(s)), np.arange(sc.start, sc.start + len(sc))]
+        dual_coefs = [np.ones(len(s)), np.ones(len(sc))]
+        for o in model.cBids:
+            # Remove contribution of complex suborders which were accounted for in the sum over single bids
+            dual_cols.append(s.cols(complexOrders[o - 1].ids))
+            dual_coefs.append(-np.ones(len(complexOrders[o - 1].ids)))
+
+            if options.APPLY_LOAD_GRADIENT:
+                ramp_down = complexOrders[o - 1].ramp_down
+                ramp_up = complexOrders[o - 1].ramp_up
+                ramp_periods = [p for p in model.periods if p != maxPeriod]
+                if ramp_down is not None:
+                    dual_cols.append(pi_lg_down.cols([(o, p) for p in ramp_periods]))
+                    dual_coefs.append(np.full(len(ramp_periods), float(ramp_down)))
+                if ramp_up is not None:
+                    dual_cols.append(pi_lg_up.cols([(o, p) for p in ramp_periods]))
+                    dual_coefs.append(np.full(len(ramp_periods), float(ramp_up)))
+        dual_cols.append(u.cols(cdp))
+        dual_coefs.append(np.array(capacities))
+        dual_cols = np.concatenate(dual_cols)
+        dual_coefs = np.concatenate(dual_coefs)
+
+        if options.PRIMAL and not options.DUAL:
+            model.set_objective(primal_cols, primal_coefs)
+        elif options.PRIMAL and options.DUAL:
+            model.set_objective(np.append(primal_cols, xc.cols(model.cBids)),
+                                np.append(primal_coefs, np.full(len(model.cBids), 1e-5)))
+        else:
+            model.set_objective(dual_cols, dual_coefs)
+
+        # Complex order constraint
+        profile.start('deactivate_suborders')
+        if options.PRIMAL and options.DUAL:
+            deactivate_suborders = model.add_constraints('deactivate_suborders')
+            for o in model.cBids:
+                for i in complexOrders[o - 1].ids:
+                    if not scheduled_stop(complexOrders[o - 1], i):
+                        deactivate_suborders.add([xs.col(i), xc.col(o)], [1.0, -1.0], hi=0.0)
+
+        # Ramping constraints for complex orders
+        profile.start('complex_lg')
+        if options.PRIMAL:
+            complex_volume_def = model.add_constraints('complex_volume_def')
+            for (o, p) in cp:
+                sub_ids = [i for i in complexOrders[o - 1].ids if book.bids[i].period == p]
+                complex_volume_def.add(np.append(complexVolume.col((o, p)), xs.cols(sub_ids)),
+                                       np.append(1.0, -volumes[sub_ids]), 0.0, 0.0)
+
+        if options.PRIMAL and options.APPLY_LOAD_GRADIENT:
+            complex_lg_down = model.add_constraints('complex_lg_down')
+            complex_lg_up = model.add_constraints('complex_lg_up')
+            for (o, p) in cp:
+                if p + 1 > maxPeriod:
+                    continue
+                ramp_down = complexOrders[o - 1].ramp_down
+                ramp_up = complexOrders[o - 1].ramp_up
+                if ramp_down is not None:
+                    complex_lg_down.add([complexVolume.col((o, p)), complexVolume.col((o, p + 1)), xc.col(o)],
+                                        [1.0, -1.0, -ramp_down], hi=0.0)
+                if ramp_up is not None:
+                    complex_lg_up.add([complexVolume.col((o, p + 1)), complexVolume.col((o, p))], [1.0, -1.0],
+                                      hi=ramp_up)
+
+        # Energy balance constraints
+        profile.start('balance')
+        if options.PRIMAL:
+            balance_rows = dict(((l, t), r) for r, (l, t) in enumerate(pi.keys))
+            rows = [[balance_rows[l, t] for l, t in zip(zones[sBids].tolist(), periods[sBids].tolist())]]
+            cols = [xs.cols(model.sBids)]
+            coefs = [volumes[sBids]]
+
+            offsets = book.column('block_offsets')
+            block_ids = np.repeat(book.column('block_ids'), np.diff(offsets))
+            rows.append([balance_rows[l, t] for l, t in zip(zones[block_ids].tolist(),
+                                                            book.column('block_periods').tolist())])
+            cols.append(xb.cols(block_ids.tolist()))
+            coefs.append(book.column('block_volumes'))
+
+            for (c, d, t) in cdp:
+                connection = self.connections[c - 1]
+                # export from the origin of the connection is positive in direction 1
+                sign = 1.0 if d == 1 else -1.0
+                if (connection.from_id, t) in balance_rows:
+                    rows.append([balance_rows[connection.from_id, t]])
+                    cols.append([f.col((c, d, t))])
+                    coefs.append([-sign])
+                if connection.to_id != connection.from_id and (connection.to_id, t) in balance_rows:
+                    rows.append([balance_rows[connection.to_id, t]])
+                    cols.append([f.col((c, d, t))])
+                    coefs.append([sign])
+
+            balance = model.add_constraints('balance')
+            balance.extend(np.concatenate(rows), np.concatenate(cols), np.concatenate(coefs),
+                           np.zeros(len(balance_rows)), np.zeros(len(balance_rows)))
+
+        # Surplus of single period bids
+        profile.start('sBidSurplus')
+        if options.DUAL:
+            ids = np.array(sorted(set(self.plain_single_orders) & set(model.sBids)), dtype=int)
+            n = len(ids)
+            sBidSurplus = model.add_constraints('sBidSurplus')
+            sBidSurplus.extend(np.repeat(np.arange(n), 2),
+                               np.column_stack([s.cols(ids.tolist()),
+                                                pi.cols(zip(zones[ids].tolist(), periods[ids].tolist()))]).ravel(),
+                               np.column_stack([np.ones(n), -volumes[ids]]).ravel(),
+                               -prices[ids] * volumes[ids], np.full(n, np.inf))
+
+        # Surplus definition for complex suborders accounting for impact of load gradient condition
+        profile.start('complex_sBidSurplus')
+        if options.DUAL:
+            complex_sBidSurplus = model.add_constraints('complex_sBidSurplus')
+            for o in model.cBids:
+                l = complexOrders[o - 1].location
+                for i in complexOrders[o - 1].ids:
+                    bid = book.bids[i]
+                    complex_sBidSurplus.add([s.col(i), pi.col((l, bid.period)), pi_lg.col((o, bid.period))],
+                                            [1.0, -bid.volume, -bid.volume], lo=-bid.price * bid.volume)
+
+        profile.start('LG_price_def')
+        if options.DUAL:
+            LG_price_def = model.add_constraints('LG_price_def')
+            for (o, p) in cp:
+                cols = [pi_lg.col((o, p))]
+                coefs = [1.0]
+                if options.APPLY_LOAD_GRADIENT:
+                    if complexOrders[o - 1].ramp_down is not None:
+                        if p > 1:
+                            cols.append(pi_lg_down.col((o, p - 1)))
+                            coefs.append(-1.0)
+                        if p < maxPeriod:
+                            cols.append(pi_lg_down.col((o, p)))
+                            coefs.append(1.0)
+                    if complexOrders[o - 1].ramp_up is not None:
+                        if p > 1:
+                            cols.append(pi_lg_up.col((o, p - 1)))
+                            coefs.append(1.0)
+                        if p < maxPeriod:
+                            cols.append(pi_lg_up.col((o, p)))
+                            coefs.append(-1.0)
+                LG_price_def.add(cols, coefs, 0.0, 0.0)
+
+        # Surplus of block bids
+        profile.start('bBidSurplus')
+        if options.DUAL:
+            bBidSurplus = model.add_constraints('bBidSurplus')
+            for i in model.bBids:
+                bid = book.bids[i]
+                bidVolume = -sum(bid.volumes.values())
+                bigM = (self.priceCap[1] - self.priceCap[0]) * bidVolume  # FIXME tighten BIGM
+                block_periods = list(bid.volumes.keys())
+                bBidSurplus.add([s.col(i), xb.col(i)] + pi.cols([(bid.location, t) for t in block_periods]).tolist(),
+                                [1.0, bigM] + [-bid.volumes[t] for t in block_periods],
+                                lo=bid.price * bidVolume + bigM)
+
+        # Surplus of complex orders
+        profile.start('cBidSurplus')
+        if options.DUAL:
+            cBidSurplus = model.add_constraints('cBidSurplus')
+            cBidSurplus_2 = model.add_constraints('cBidSurplus_2')
+            for o in model.cBids:
+                complexOrder = complexOrders[o - 1]
+                sub_ids = complexOrder.ids
+                if volumes[sub_ids[0]] > 0:  # supply
+                    bigM = np.sum((self.priceCap[1] - prices[sub_ids]) * volumes[sub_ids])
+                else:
+                    bigM = np.sum((prices[sub_ids] - self.priceCap[0]) * volumes[sub_ids])
+                cBidSurplus.add(np.append([sc.col(o), xc.col(o)], s.cols(sub_ids)),
+                                np.append([1.0, -bigM], -np.ones(len(sub_ids))), lo=-bigM)
+
+                ss_ids = [i for i in sub_ids if scheduled_stop(complexOrder, i)]
+                cBidSurplus_2.add(np.append(sc.col(o), s.cols(ss_ids)), np.append(1.0, -np.ones(len(ss_ids))),
+                                  lo=0.0)
+
+        # MIC constraint
+        profile.start('cMIC')
+        if options.DUAL and options.PRIMAL:
+            cMIC = model.add_constraints('cMIC')
+            for o in model.cBids:
+                complexOrder = complexOrders[o - 1]
+                if complexOrder.FT == 0 and complexOrder.VT == 0:
+                    continue
+
+                sub_ids = complexOrder.ids
+                ss_ids = [i for i in sub_ids if scheduled_stop(complexOrder, i)]
+                bigM = complexOrder.FT + np.sum(volumes[ss_ids] * (self.priceCap[1] - prices[ss_ids]))  # FIXME assumes order is supply
+                cMIC.add(np.append([sc.col(o), xc.col(o)], xs.cols(sub_ids)),
+                         np.append([1.0, -bigM], volumes[sub_ids] * (prices[sub_ids] - complexOrder.VT)),
+                         lo=complexOrder.FT - bigM)
+
+        # Dual connections capacity
+        profile.start('dualCapacity')
+        if options.DUAL:
+            locations = set(model.L)
+            dualCapacity = model.add_constraints('dualCapacity')
+            for c in model.C:
+                connection = self.connections[c - 1]
+                for t in model.periods:
+                    cols = [u.col((c, 1, t)), u.col((c, 2, t))]
+                    coefs = [1.0, -1.0]
+                    if connection.from_id in locations:
+                        cols.append(pi.col((connection.from_id, t)))
+                        coefs.append(1.0)
+                    if connection.to_id in locations and connection.to_id != connection.from_id:
+                        cols.append(pi.col((connection.to_id, t)))
+                        coefs.append(-1.0)
+                    dualCapacity.add(cols, coefs, 0.0, 0.0)
+
+        # Dual optimality
+        profile.start('primalEqualsDual')
+        if options.DUAL and options.PRIMAL:
+            primalEqualsDual = model.add_constraints('primalEqualsDual')
+            primalEqualsDual.add(np.concatenate([primal_cols, dual_cols]), np.concatenate([primal_coefs, -dual_coefs]),
+                                 lo=0.0)
+
+        profile.stop()
+        self.build_profile = profile
+        self.model = model
+        self.solver = None
+        self.timings = {'build': profile.time}
 
     def solve(self, VERBOSE=False, cutoff=-1.0, fixedComplexOrders=None):
         """
@@ -341,30 +665,108 @@ class COMPLEX_DAM(DAM):
             logging.warn("Specifying a cutoff value is implemented for Gurobi only.")
         # FIXME This should be generalized for other solvers, should probably create a clean mapping of the main parameters for the different solvers in another place.
 
-        if options.APPLY_MIC:
-            for i in self.model.cBids:
-                if i in fixedComplexOrders.keys():
-                    self.model.xc[i] = fixedComplexOrders[i]
-                    self.model.xc[i].fixed = True
-                else:
-                    self.model.xc[i].setlb(0)
-                    self.model.xc[i].setub(1)
-                    self.model.xc[i].fixed = False
+        self._fix_complex_orders(fixedComplexOrders)
+
+        # Solve
+        t = time.time()
+        if isinstance(self.model, MatrixModel):
+            solved = self.model.solve(tee=VERBOSE)
         else:
-            for o in self.model.cBids:  # We can fix all MIC related variables
-                self.model.xc[o] = 1
-                self.model.xc[o].fixed = True
+            results = options.SOLVER.solve(self.model, tee=VERBOSE)
+            solved = self.has_solution(results)
+        self.timings['solve'] = time.time() - t
+        if not solved:
+            self.exportModel()
+            raise Exception('No solution found when clearing the day-ahead energy market.')
+
+        # Load results
+        self._load_solution()
+
+    def resolve(self, VERBOSE=False, cutoff=-1.0, fixedComplexOrders=None):
+        """
+        Solve the problem again with other fixed complex orders, e.g. after fixing the paradoxically rejected orders
+        given by :py:meth:`getPRcomplexOrders`.
+
+        The model is kept in a persistent solver between calls: only the bounds of the xc variables that changed and
+        the cutoff are updated, and the previous solution is given as MIP start. Falls back to :py:meth:`solve` if no
+        persistent solver is available.
+
+        The time spent to write the changes to the solver, solve and load the solution is stored in
+        :py:attr:`timings`.
+
+        :param cutoff: cutoff passed to the solver, hence solver will cut branches where objective is worse than this value.
+        :param fixedComplexOrders: dictionnary with complexOrders as keys and a value to be fixed.
+        """
+        if fixedComplexOrders is None:
+            fixedComplexOrders = {}
+
+        logging.info('Solving day %d' % self.day_id)
+
+        t = time.time()
+        changed = self._fix_complex_orders(fixedComplexOrders)
+        if self.solver is None:
+            # The persistent solver is looked for once per model, False if there is none.
+            solver = None if isinstance(self.model, MatrixModel) else self.persistent_solver()
+            self.solver = False if solver is None else solver
+        elif self.solver is not False:
+            for i in changed:
+                self.solver.update_var(self.model.xc[i])
+        if self.solver is False:
+            self.solve(VERBOSE, cutoff, fixedComplexOrders)
+            return
+
+        # The objective is maximized, hence the lower cutoff.
+        if cutoff > -1.0:
+            self.solver.options['mip_tolerances_lowercutoff'] = cutoff
+        else:
+            self.solver.options.pop('mip_tolerances_lowercutoff', None)
+        self.timings['write'] = time.time() - t
 
         # Solve
-        options.SOLVER.solve(self.model, tee=VERBOSE)
+        t = time.time()
+        self.solver.solve(tee=VERBOSE, warmstart=True)
+        self.timings['solve'] = time.time() - t
         if len(self.model.solutions) == 0:
             self.exportModel()
             raise Exception('No solution found when clearing the day-ahead energy market.')
 
         # Load results
+        self._load_solution()
+
+    def _fix_complex_orders(self, fixedComplexOrders):
+        """
+        Fix the acceptance of the complex orders.
+
+        :param fixedComplexOrders: dictionnary with complexOrders as keys and a value to be fixed, the others are free.
+        :return: the complex orders whose acceptance variable was changed.
+        """
+        changed = []
+        for i in self.model.cBids:
+            xc = self.model.xc[i]
+            previous = (xc.fixed, xc.value)
+            if not options.APPLY_MIC:  # We can fix all MIC related variables
+                xc.value = 1
+                xc.fixed = True
+            elif i in fixedComplexOrders.keys():
+                xc.value = fixedComplexOrders[i]
+                xc.fixed = True
+            else:
+                xc.setlb(0)
+                xc.setub(1)
+                xc.fixed = False
+            if xc.fixed != previous[0] or (xc.fixed and xc.value != previous[1]):
+                changed.append(i)
+        return changed
+
+    def _load_solution(self):
+        """
+        Store the solution in the order book if the primal and dual problems are solved.
+        """
+        t = time.time()
         if options.PRIMAL and options.DUAL:
             self._build_solution()
             self._checkSolution()
+        self.timings['load'] = time.time() - t
 
     def _build_solution(self, results=None):
         """
@@ -386,7 +788,7 @@ class COMPLEX_DAM(DAM):
 
             # Obtain and save the volume
             xs = model.xs[i].value
-            bid.acceptance = xs
+            book.set_acceptance(i, xs)
 
             # Update volumes and prices
             if xs > options.EPS:
@@ -415,12 +817,12 @@ class COMPLEX_DAM(DAM):
 
             # Obtain and save the volume
             xb = model.xb[i].value
-            bid.acceptance = model.xb[i].value
+            book.set_acceptance(i, xb)
 
             if xb > options.EPS:
-                supplydemand = "SUPPLY" if bid.volumes[0] > 0 else "DEMAND"
                 for t, v in bid.volumes.items():
-                    book.volumes[bid.location][t] += v
+                    supplydemand = "SUPPLY" if v > 0 else "DEMAND"
+                    book.volumes[supplydemand][bid.location][t] += v * xb
 
         for i in model.cBids:
             # logging.info('building solution for complex %d' % i)
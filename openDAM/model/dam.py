@@ -11,10 +11,19 @@ from pyomo.opt import ProblemFormat, SolverStatus, TerminationCondition
 import logging
 
 from openDAM.model.OrdersBook import *
+from openDAM.model.Network import Network
 import openDAM.conf.options as options
+from openDAM.dataio.solve_artifacts import ArtifactCache
 
 from abc import ABCMeta, abstractmethod
 
+## Terminations of a solve which may leave the best feasible solution found in the variables of the model.
+LIMIT_TERMINATIONS = (TerminationCondition.maxTimeLimit, TerminationCondition.maxIterations,
+                      TerminationCondition.maxEvaluations, TerminationCondition.feasible)
+
+## Persistent solvers found unavailable by :py:meth:`DAM.persistent_solver`, which are not looked for again.
+UNAVAILABLE_PERSISTENT_SOLVERS = set()
+
 
 class DAM:
     """
@@ -33,6 +42,7 @@ class DAM:
         self.block_orders = blockOrders
 
         self.connections = connections
+        self.network = Network(connections)
         self.priceCap = priceCap  # TODO fix as a function of data and locationc
 
         # Generate ids for orders
@@ -41,9 +51,12 @@ class DAM:
         self.block_orders_ids = {}
 
         self.t_solve = 0.0
+        self.timings = {}  #: time in seconds of the phases of the last resolution, by phase name
         self.nbinvar = 0
 
         self.model = None
+        self.build_profile = None  #: :py:class:`BuildProfile` of the generation of the model
+        self.artifacts = None  #: :py:class:`ArtifactCache` of the day, see :py:meth:`artifact_cache`
 
     def create_order_book(self):
 
@@ -70,6 +83,7 @@ class DAM:
 
         if bid.type == 'CO':
             self.complex_single_orders.extend(newBidsIds)
+            self.orders.register_complex(newBidsIds)
         elif bid.type == 'PO':
             self.pun_orders_ids[bid] = newBidsIds[0]
         elif bid.type == 'BB':
@@ -96,11 +110,74 @@ class DAM:
         """
         pass
 
-    def exportModel(self):
+    def has_solution(self, results=None):
+        """
+        :param results: Pyomo results of the last solve, if any.
+        :return: True if a solution is loaded in the variables of the model. The solver plugins of Pyomo register it
+            in model.solutions, while the APPSI solvers, e.g. appsi_highs, only load it and report an optimal
+            termination, or a limit with the objective of the best feasible solution as bound of the problem.
+        """
+        if len(self.model.solutions) != 0:
+            return True
+        if results is None:
+            return False
+        condition = results.solver.termination_condition
+        if condition == TerminationCondition.optimal:
+            return True
+        if condition not in LIMIT_TERMINATIONS:
+            return False
+        problem = results.problem
+        incumbent = problem.lower_bound if problem.sense == maximize else problem.upper_bound
+        return incumbent is not None and abs(incumbent) != float('inf')
+
+    def persistent_solver(self):
+        """
+        Create a persistent interface of the solver and load the model in it.
+
+        The options of :py:data:`options.SOLVER` are translated to the format of the persistent interface.
+
+        :return: a Pyomo persistent solver, or None if the solver has none or it is not available, e.g. for GLPK or
+            CBC.
+        """
+        name = options.PERSISTENT_SOLVERS.get(options.SOLVER_NAME)
+        if name is None or name in UNAVAILABLE_PERSISTENT_SOLVERS:
+            return None
+        solver = SolverFactory(name)
+        if solver is None or not solver.available(exception_flag=False):
+            logging.info("Persistent solver %s not available, using %s." % (name, options.SOLVER_NAME))
+            UNAVAILABLE_PERSISTENT_SOLVERS.add(name)
+            return None
+
+        # Interactive options such as "mip tolerances mipgap" are given as "mip_tolerances_mipgap".
+        for key, val in options.SOLVER.options.items():
+            solver.options[key.replace(' ', '_')] = val
+
+        solver.set_instance(self.model)
+        return solver
+
+    def artifact_cache(self):
+        """
+        :return: the :py:class:`ArtifactCache` of the day in the folder options.ARTIFACT_CACHE, or None if the
+            option is None.
         """
-        Export the model in LP format.
+        if options.ARTIFACT_CACHE is None:
+            return None
+        if self.artifacts is None:
+            self.artifacts = ArtifactCache(options.ARTIFACT_CACHE, self)
+        return self.artifacts
+
+    def exportModel(self, filename="damClearing.lp"):
+        """
+        Export the model in LP format. The file is copied from the artifact cache if the same model was already
+        exported, see :py:meth:`artifact_cache`.
+
+        :param filename: path of the LP file.
         """
-        self.model.write(filename="damClearing.lp", format=ProblemFormat.cpxlp,
+        cache = self.artifact_cache()
+        if cache is not None:
+            cache.export_model(self, filename)
+            return
+        self.model.write(filename=filename, format=ProblemFormat.cpxlp,
                          io_options={"symbolic_solver_labels": True})
 
     def volumes(self, supplydemand='SUPPLY', location=None):
@@ -0,0 +1,235 @@
+"""
+Decomposition of a day into independent sub-markets, cleared separately and stitched back into the DAM object of the
+day.
+
+Periods are coupled by the block orders and the complex orders spanning several periods. Within a group of coupled
+periods, zones are coupled by the lines with a positive capacity in one of the periods, and, in the days with PUN
+orders, by the PUN price, which couples all the zones. Each group of periods and connected component of zones is a
+sub-market with its own order book, whose model is created and solved apart, possibly in another process.
+"""
+import copy
+import time
+import logging
+
+import numpy as np
+
+from openDAM.model.Line import Line
+from openDAM.model.complex_order_model import COMPLEX_DAM
+from openDAM.model.pun_dam_model import PUN_DAM
+
+
+def _groups(items, links):
+    """
+    Connected components of a graph, with a union-find.
+
+    :param items: nodes of the graph.
+    :param links: iterable of lists of nodes, all the nodes of a list being connected.
+    :return: list of the components as frozensets, sorted by smallest node.
+    """
+    parent = dict((i, i) for i in items)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for linked in links:
+        linked = list(linked)
+        root = find(linked[0])
+        for i in linked[1:]:
+            other = find(i)
+            if other != root:
+                parent[other] = root
+
+    components = {}
+    for i in items:
+        components.setdefault(find(i), set()).add(i)
+    return sorted((frozenset(c) for c in components.values()), key=min)
+
+
+def pieces(dam):
+    """
+    Independent sub-markets of a day.
+
+    :param dam: a DAM object whose order book is created.
+    :return: list of (periods, zones) frozensets, sorted by periods and zones. Only the pieces with orders are listed.
+    """
+    book = dam.orders
+    coupled = [list(b.volumes) for b in dam.block_orders if b.volumes]
+    coupled.extend(list(c.curves) for c in getattr(dam, 'complexOrders', []) if c.curves)
+    period_groups = _groups(sorted(book.periods), coupled)
+
+    zones = book.column('zone')
+    periods = book.column('period')
+    block_zones = np.repeat(zones[book.column('block_ids')], np.diff(book.column('block_offsets')))
+    order_zones = set(zip(periods.tolist(), zones.tolist()))
+    order_zones.update(zip(book.column('block_periods').tolist(), block_zones.tolist()))
+
+    result = []
+    for group in period_groups:
+        located = set(z for t, z in order_zones if t in group)
+        if isinstance(dam, PUN_DAM) and dam.punOrders:
+            # The PUN price is the average of the prices of the zones, weighted by the PUN orders.
+            components = [frozenset(dam.zones)]
+        else:
+            lines = [(l.from_id, l.to_id) for l in dam.connections
+                     if any(l.capacity_up.get(t, 0) > 0 or l.capacity_down.get(t, 0) > 0 for t in group)]
+            components = _groups(sorted(set(dam.zones) | located), lines)
+        result.extend((group, c) for c in components if c & located)
+    return result
+
+
+def sub_market(dam, periods, zones):
+    """
+    Create the DAM object of a sub-market, with copies of the orders and lines of the day so that the objects of the
+    day are not modified when the sub-market is solved.
+
+    :param dam: a DAM object whose order book is created.
+    :param periods: periods of the sub-market.
+    :param zones: zones of the sub-market.
+    :return: the DAM object of the sub-market, and a NumPy array of the ids in the order book of the day of the bids
+        of its order book.
+    """
+    curves = [c for c in dam.curves if c.period in periods and c.location in zones]
+    blocks = [b for b in dam.block_orders if b.location in zones and set(b.volumes) <= periods]
+    lines = [Line(l.line_id, l.from_id, l.to_id,
+                  dict((t, c) for t, c in l.capacity_up.items() if t in periods),
+                  dict((t, c) for t, c in l.capacity_down.items() if t in periods))
+             for l in dam.connections if l.from_id in zones and l.to_id in zones]
+    sub_zones = dict((z, dam.zones[z]) for z in zones if z in dam.zones)
+
+    memo = {}
+    if isinstance(dam, PUN_DAM):
+        orders = [p for p in dam.punOrders if p.period in periods and p.location in zones]
+        curves, blocks, orders = copy.deepcopy((curves, blocks, orders), memo)
+        sub = PUN_DAM(dam.day_id, sub_zones, curves, blocks, orders, lines, dam.priceCap)
+    else:
+        orders = [c for c in dam.complexOrders if c.location in zones and set(c.curves) <= periods]
+        curves, blocks, orders = copy.deepcopy((curves, blocks, orders), memo)
+        sub = COMPLEX_DAM(dam.day_id, sub_zones, curves, blocks, orders, lines, dam.priceCap)
+
+    # The copies of the bids of the day are found in the memo of deepcopy by the id of the original.
+    copies = dict((id(memo[id(b)]), i) for i, b in enumerate(dam.orders.bids) if id(b) in memo)
+    return sub, np.array([copies[id(b)] for b in sub.orders.bids], dtype=int)
+
+
+def _solve(args):
+    """
+    Solve a sub-market and strip the objects that cannot be sent back from a worker process.
+    """
+    solve, sub = args
+    solve(sub)
+    sub.model = None
+    sub.solver = None
+    sub.artifacts = None
+    sub.build_profile = None
+    return sub
+
+
+def clear(dam, solve, pool=None):
+    """
+    Clear a day, as independent sub-markets if it can be decomposed, see :py:func:`pieces`. The solution of the
+    sub-markets is stored in the order book, the lines and the complex orders of the day, and the welfare, solve time,
+    number of binary variables and absolute gap of the day are the sums of those of the sub-markets.
+
+    A day that cannot be decomposed is solved as a whole, and keeps its model.
+
+    :param dam: a DAM object whose order book is created.
+    :param solve: function creating the model of a DAM object and solving it, storing the solution in it. It must be
+        defined at the top level of a module when pool is not None.
+    :param pool: a multiprocessing pool in which the sub-markets are solved, None to solve them in this process.
+    :return: the number of sub-markets.
+    """
+    parts = pieces(dam)
+    if len(parts) <= 1:
+        solve(dam)
+        return 1
+
+    logging.info("Day %d decomposed in %d sub-markets." % (dam.day_id, len(parts)))
+    t = time.time()
+    subs = [sub_market(dam, periods, zones) for periods, zones in parts]
+    jobs = [(solve, sub) for sub, ids in subs]
+    solved = pool.map(_solve, jobs) if pool is not None else [_solve(job) for job in jobs]
+    stitch(dam, [(sub, ids) for sub, (unsolved, ids) in zip(solved, subs)])
+    dam.timings['decomposition'] = time.time() - t
+    return len(parts)
+
+
+def stitch(dam, subs):
+    """
+    Store the solutions of the sub-markets of a day in its DAM object.
+
+    :param dam: the DAM object of the day.
+    :param subs: list of the solved DAM objects of the sub-markets, with the ids of their bids in the order book of
+        the day, as returned by :py:func:`sub_market`.
+    """
+    book = dam.orders
+    periods = sorted(book.periods)
+    book.prices = {}
+    book.volumes = {'SUPPLY': {}, 'DEMAND': {}}
+    flows = {}
+    complex_orders = dict((c.complex_id, c) for c in getattr(dam, 'complexOrders', []))
+
+    dam.welfare = 0.0
+    dam.t_solve = 0.0
+    dam.nbinvar = 0
+    dam.timings = {}
+    dam.model = None
+    dam.build_profile = None
+    messages = []
+    for sub, ids in subs:
+        for i, bid in zip(ids.tolist(), sub.orders.bids):
+            book.set_acceptance(i, bid.acceptance)
+        for l, prices in (sub.orders.prices or {}).items():
+            book.prices.setdefault(l, {}).update(prices)
+        for side, volumes in (sub.orders.volumes or {}).items():
+            for l, by_period in volumes.items():
+                book.volumes[side].setdefault(l, {}).update(by_period)
+
+        sub_periods = sorted(sub.orders.periods)
+        for l in sub.connections:
+            line = flows.setdefault(l.line_id, {})
+            for name in ['flow_up', 'flow_down', 'congestion_up', 'congestion_down']:
+                line.setdefault(name, {}).update(zip(sub_periods, getattr(l, name, None) or []))
+
+        for c in getattr(sub, 'complexOrders', []):
+            original = complex_orders[c.complex_id]
+            volumes = dict(zip(sub_periods, c.volumes))
+            pi_lg = dict(zip(sub_periods, c.pi_lg))
+            original.acceptance = c.acceptance
+            original.surplus = c.surplus
+            original.volumes = [volumes.get(t, 0.0) for t in periods]
+            original.pi_lg = [pi_lg.get(t) for t in periods]
+            original.tentativeVolumes = c.tentativeVolumes
+            original.tentativeIncome = c.tentativeIncome
+            original.isPR = c.isPR
+
+        dam.welfare += getattr(sub, 'welfare', 0.0)
+        dam.t_solve += sub.t_solve
+        dam.nbinvar += sub.nbinvar
+        for name, t in sub.timings.items():
+            dam.timings[name] = dam.timings.get(name, 0.0) + t
+        if hasattr(sub, 'absolute_gap'):
+            dam.absolute_gap = getattr(dam, 'absolute_gap', 0.0) + sub.absolute_gap
+        if hasattr(sub, 'expansion'):
+            dam.expansion = getattr(dam, 'expansion', False) or sub.expansion
+        if hasattr(sub, 'solver_message'):
+            messages.append(sub.solver_message)
+    if messages:
+        dam.solver_message = '; '.join(messages)
+
+    # The zones without orders in a group of periods are in no sub-market, and have no price and no volume.
+    for z in dam.zones:
+        for t in periods:
+            book.prices.setdefault(z, {}).setdefault(t, 0.0)
+            book.volumes['SUPPLY'].setdefault(z, {}).setdefault(t, 0.0)
+            book.volumes['DEMAND'].setdefault(z, {}).setdefault(t, 0.0)
+
+    # Lines between sub-markets have no capacity in their periods, and lines have no flow in the periods without
+    # orders in their zones.
+    for l in dam.connections:
+        line = flows.get(l.line_id, {})
+        for name in ['flow_up', 'flow_down', 'congestion_up', 'congestion_down']:
+            values = line.get(name, {})
+            setattr(l, name, [values.get(t, 0.0) for t in periods])
@@ -1,4 +1,6 @@
 from openDAM.model.dam import DAM
+from openDAM.model.BuildProfile import BuildProfile
+from openDAM.dataio.solve_artifacts import solver_key
 
 from pyomo.core.base import Constraint, summation, Objective, minimize, ConstraintList, \
     ConcreteModel, Set, RangeSet, Reals, Binary, NonNegativeReals, Var, maximize, Suffix
@@ -10,9 +12,11 @@ import openDAM.conf.options as options
 
 import logging
 
+import copy
 import time
+import multiprocessing
 
-import itertools
+from collections import deque
 
 
 class PUN_DAM(DAM):
@@ -22,9 +26,15 @@ class PUN_DAM(DAM):
         self.punOrders = punOrders  #: a list of pun orders
         self.pun_orders_ids = {}  # ids of PUN orders
         self.pun_orders_by_period = None
+        self.pun_orders_by_merit_order = None  # PUN orders of each period sorted by merit order
+        self.pun_orders_by_price = None  # PUN orders of each period sorted by decreasing price
+        self.bids_by_zone_period = None  # ids of each kind of bids, indexed by (zone, period)
 
         self.relax_PUN = False
 
+        self.windows = []  #: PUN price windows solved by :py:meth:`window_search`, with the welfare of their solution
+        self.window_report = None  #: counts, best window and hit rates of the windows, see :py:meth:`window_hit_rates`
+
         self.loader = loader
 
         self.create_order_book()
@@ -35,6 +45,27 @@ class PUN_DAM(DAM):
         for po in self.punOrders:
             self.submit(po)
 
+        self._index_order_book()
+
+    def _index_order_book(self):
+        """
+        Build the indexes used by the constraint rules, once per order book.
+        """
+        book = self.orders
+
+        self.bids_by_zone_period = {'DEMAND': book.index('SB', 'DEMAND'),
+                                    'SUPPLY': book.index('SB', 'SUPPLY'),
+                                    'BLOCK': book.index('BB'),
+                                    'PUN': book.index('PO')}
+
+        self.pun_orders_by_period = dict(zip(book.periods, [[] for p in book.periods]))
+        for po in self.punOrders:
+            self.pun_orders_by_period[po.period].append(po)
+        self.pun_orders_by_merit_order = {p: sorted(orders, key=lambda k: k.merit_order)
+                                          for p, orders in self.pun_orders_by_period.items()}
+        self.pun_orders_by_price = {p: sorted(orders, key=lambda k: -k.price)
+                                    for p, orders in self.pun_orders_by_period.items()}
+
     def create_model(self, relax_PUN=False, ESTIMATED_PUN_PRICES_RANGES=None):
         """
         Model based on Iacopo Savelli's research.
@@ -55,16 +86,19 @@ class PUN_DAM(DAM):
         # Obtain the orders book
         book = self.orders
         pun_orders = self.punOrders
+        network = self.network
 
         # Convenience data structures
-        self.pun_orders_by_period = dict(zip(book.periods, [[] for p in book.periods]))
-        pun_zones = set()
-        for po in pun_orders:
-            self.pun_orders_by_period[po.period].append(po)
-            pun_zones.add(po.location)
+        pun_zones = set(po.location for po in pun_orders)
+        demand_by_zone_period = self.bids_by_zone_period['DEMAND']
+        supply_by_zone_period = self.bids_by_zone_period['SUPPLY']
+        block_by_zone_period = self.bids_by_zone_period['BLOCK']
+        pun_by_zone_period = self.bids_by_zone_period['PUN']
 
         # Create the optimization model
         model = ConcreteModel(name="DAM with PUN")
+        profile = BuildProfile(self.day_id, model)
+        profile.start('sets')
 
         # Sets
         model.periods = Set(initialize=book.periods)
@@ -72,30 +106,27 @@ class PUN_DAM(DAM):
         model.bids = Set(initialize=range(len(book.bids)))
         model.L = Set(initialize=self.zones.keys())
         model.Lpun = Set(initialize=pun_zones)
-        model.LpunExt = Set(initialize=[z for z in self.zones if z in pun_zones or self.zones[z].name == "ROSN"])
-        model.demandBids = Set(
-            initialize=[i for i in range(len(book.bids)) if
-                        (book.bids[i].type == 'SB' and book.bids[i].volume < 0)])
-        model.supplyBids = Set(
-            initialize=[i for i in range(len(book.bids)) if
-                        (book.bids[i].type == 'SB' and book.bids[i].volume > 0)])
-        model.bBids = Set(
-            initialize=[i for i in range(len(book.bids)) if book.bids[i].type == 'BB'])
-        model.punBids = Set(
-            initialize=[i for i in range(len(book.bids)) if book.bids[i].type == 'PO'])
+        LpunExt = frozenset(z for z in self.zones if z in pun_zones or self.zones[z].name == "ROSN")
+        model.LpunExt = Set(initialize=sorted(LpunExt))
+        model.demandBids = Set(initialize=book.ids('SB', 'DEMAND').tolist())
+        model.supplyBids = Set(initialize=book.ids('SB', 'SUPPLY').tolist())
+        model.bBids = Set(initialize=book.ids('BB').tolist())
+        model.punBids = Set(initialize=book.ids('PO').tolist())
         model.C = RangeSet(len(self.connections))
+        model.arcs = Set(initialize=network.zone_arcs(self.zones), dimen=2)  # Flows only exist along the lines
+        model.arcsPunExt = Set(initialize=network.zone_arcs(LpunExt), dimen=2)
         model.binary_powers = Set(initialize=range(options.BINARY_EXP_NUMBER))
 
         # Number of binary variables. Must be decreased if the binary is fixed.
         # ugk, uek, uwd, udd = 4*len(model.punBids)
         # bexp = len(model.Lpun)*len(model.binary_powers)*len(model.periods)
-        # uf = len(model.LpunExt)*len(model.LpunExt)*len(model.periods)
+        # uf = len(model.arcsPunExt)*len(model.periods)
         # ubp = len(model.bBids)
         self.nbinvar = 4 * len(model.punBids) \
                        + len(model.Lpun) * len(model.binary_powers) * len(model.periods) \
                        + len(model.bBids)
         if options.SPLIT:
-            self.nbinvar += len(model.LpunExt) * len(model.LpunExt) * len(model.periods)
+            self.nbinvar += len(model.arcsPunExt) * len(model.periods)
 
         self.nbinvar_initial = self.nbinvar
 
@@ -117,6 +148,7 @@ class PUN_DAM(DAM):
         M_udtk_upper = MAX_PRICE
         M_block_surplus = MAX_PRICE - MIN_PRICE
 
+        profile.start('variables')
         if options.DEBUG:
             logging.info("Defining variables")
         # Variables # TODO blocks
@@ -125,7 +157,7 @@ class PUN_DAM(DAM):
         model.rp = Var(model.bBids, domain=NonNegativeReals)  # Block bids acceptance
         model.ubp = Var(model.bBids, domain=Binary)
 
-        model.f = Var(model.L, model.L, model.periods, domain=Reals)
+        model.f = Var(model.arcs, model.periods, domain=Reals)
 
         model.dwk = Var(model.punBids, domain=NonNegativeReals)  # PUN
         model.vphikPUNw = Var(model.punBids, domain=NonNegativeReals)
@@ -140,7 +172,7 @@ class PUN_DAM(DAM):
             model.uwk = Var(model.punBids, domain=Binary)  # PUN
             model.udk = Var(model.punBids, domain=Binary)  # PUN
             if options.SPLIT:
-                model.uf = Var(model.LpunExt, model.LpunExt, model.periods, domain=Binary)
+                model.uf = Var(model.arcsPunExt, model.periods, domain=Binary)
 
             # Dual
             model.pi = Var(model.periods, domain=Reals)
@@ -158,8 +190,8 @@ class PUN_DAM(DAM):
         # Dual
         model.vphiknonPUNw = Var(model.demandBids, domain=NonNegativeReals)
         model.vphip = Var(model.supplyBids, domain=NonNegativeReals)
-        model.deltaMax = Var(model.L, model.L, model.periods, domain=NonNegativeReals)
-        model.etaij = Var(model.L, model.L, model.periods, domain=Reals)
+        model.deltaMax = Var(model.arcs, model.periods, domain=NonNegativeReals)
+        model.etaij = Var(model.arcs, model.periods, domain=Reals)
         model.vphibMax = Var(model.bBids, domain=NonNegativeReals)
         model.vphibMin = Var(model.bBids, domain=NonNegativeReals)
 
@@ -167,25 +199,19 @@ class PUN_DAM(DAM):
         model.ypMax = Var(model.bBids, domain=NonNegativeReals)
         model.ypMin = Var(model.bBids, domain=NonNegativeReals)
 
+        profile.start('flow_max')
         if options.DEBUG:
             logging.info("Calculating flow max")
 
-        model.flow_max = {}
-        for p in model.periods:
-            for (local, foreign) in model.L * model.L:
-                model.flow_max[local, foreign, p] = 0
-                for c in model.C:
-                    if self.connections[c - 1].from_id == local \
-                            and self.connections[c - 1].to_id == foreign:
-                        model.flow_max[local, foreign, p] = self.connections[c - 1].capacity_up[p]
-                        break
-                    elif self.connections[c - 1].from_id == foreign \
-                            and self.connections[c - 1].to_id == local:
-                        model.flow_max[local, foreign, p] = self.connections[c - 1].capacity_down[p]
-                        break
+        model.flow_max = dict(((local, foreign, p), network.capacity(local, foreign, p))
+                              for (local, foreign) in model.arcs for p in model.periods)
+        arcs_out = {}
+        for (local, foreign) in model.arcs:
+            arcs_out.setdefault(local, []).append(foreign)
 
         # Constraints
 
+        profile.start('p_block_itm')
         if options.DEBUG:
             logging.info("Creating Block binary variables relations constraints")
 
@@ -200,6 +226,7 @@ class PUN_DAM(DAM):
         if not relax_PUN:
             model.p_block_itm = Constraint(model.bBids, rule=p_block_itm_rule)
 
+        profile.start('pun_binary_relations')
         if options.DEBUG:
             logging.info("Creating PUN binary variables relations constraints")
 
@@ -273,16 +300,18 @@ class PUN_DAM(DAM):
         if not relax_PUN:
             model.p_pun_atm_quantity_dispatch = Constraint(model.punBids, rule=p_pun_atm_quantity_dispatch_rule)
 
+        profile.start('merit_order')
         if options.DEBUG:
             logging.info("Creating Merit order constraints")
         merit_order_idx = 0
         if not relax_PUN:
+            model.merit_order = ConstraintList()
             for p in model.periods:
-                pun_orders_sorted_by_mo = sorted(self.pun_orders_by_period[p], key=lambda k: k.merit_order)
+                pun_orders_sorted_by_mo = deque(self.pun_orders_by_merit_order[p])
 
-                previous_order = pun_orders_sorted_by_mo.pop(0) if pun_orders_sorted_by_mo else None
+                previous_order = pun_orders_sorted_by_mo.popleft() if pun_orders_sorted_by_mo else None
                 while previous_order and pun_orders_sorted_by_mo:
-                    next_order = pun_orders_sorted_by_mo.pop(0)
+                    next_order = pun_orders_sorted_by_mo.popleft()
                     if previous_order.price == MAX_PRICE:
                         previous_order = next_order
                         continue
@@ -290,22 +319,24 @@ class PUN_DAM(DAM):
                     mo_expr = model.ugk[self.pun_orders_ids[previous_order]] >= model.ugk[
                         self.pun_orders_ids[next_order]]
                     merit_order_idx += 1
-                    setattr(model, "merit_order_%d" % merit_order_idx, Constraint(expr=mo_expr))
+                    model.merit_order.add(mo_expr)
                     previous_order = next_order
 
         if options.DEBUG:
             logging.info("Created %d Merit order constraints" % merit_order_idx)
 
+        profile.start('price_order')
         if options.DEBUG:
             logging.info("Creating price order constraints")
         merit_order_idx = 0
         if not relax_PUN:
+            model.price_order = ConstraintList()
             for p in model.periods:
-                pun_orders_sorted_by_price = sorted(self.pun_orders_by_period[p], key=lambda k: -k.price)
+                pun_orders_sorted_by_price = deque(self.pun_orders_by_price[p])
 
-                previous_order = pun_orders_sorted_by_price.pop(0) if pun_orders_sorted_by_price else None
+                previous_order = pun_orders_sorted_by_price.popleft() if pun_orders_sorted_by_price else None
                 while previous_order and pun_orders_sorted_by_price:
-                    next_order = pun_orders_sorted_by_price.pop(0)
+                    next_order = pun_orders_sorted_by_price.popleft()
                     if previous_order.price == MAX_PRICE:
                         previous_order = next_order
                         continue
@@ -313,15 +344,16 @@ class PUN_DAM(DAM):
                     if previous_order.price > next_order.price:  # two orders can have the same price
                         horizontal_price = next_order.price
                         previous_id = self.pun_orders_ids[previous_order]
+                        stored_order = next_order
                         while horizontal_price == next_order.price:
                             next_id = self.pun_orders_ids[next_order]
                             mo_expr = (model.uek[next_id] <= model.ugk[previous_id] - model.ugk[next_id])
 
                             merit_order_idx += 1
-                            setattr(model, "price_order_%d" % merit_order_idx, Constraint(expr=mo_expr))
+                            model.price_order.add(mo_expr)
                             if pun_orders_sorted_by_price:
                                 stored_order = next_order
-                                next_order = pun_orders_sorted_by_price.pop(0)
+                                next_order = pun_orders_sorted_by_price.popleft()
                             else:
                                 break
                         next_order = stored_order
@@ -331,273 +363,72 @@ class PUN_DAM(DAM):
         if options.DEBUG:
             logging.info("Created %d price order constraints" % merit_order_idx)
 
+        profile.start('ATM_split_order')
         if options.DEBUG:
             logging.info("Creating ATM merit order constraints depending on market split")
 
         if not relax_PUN:
+            model.ATM_split_order = ConstraintList()
             order_idx = 0
             for p in model.periods:
-                for hBid in self.pun_orders_by_period[p]:
-                    # skip price=3000 case
-                    if hBid.price == MAX_PRICE:
-                        continue
-                    h = self.pun_orders_ids[hBid]
-                    for kBid in self.pun_orders_by_period[p]:
-                        # skip price=3000 case
-                        if kBid.price == MAX_PRICE:
-                            continue
-                        k = self.pun_orders_ids[kBid]
-                        if hBid.merit_order < kBid.merit_order \
-                                and hBid.price == kBid.price:
+                # Candidate (h, k) pairs only have the same price, skip price=3000 case
+                pun_orders_by_price = {}
+                for bid in self.pun_orders_by_period[p]:
+                    if bid.price != MAX_PRICE:
+                        pun_orders_by_price.setdefault(bid.price, []).append(bid)
+
+                for same_price_orders in pun_orders_by_price.values():
+                    for hBid in same_price_orders:
+                        h = self.pun_orders_ids[hBid]
+                        for kBid in same_price_orders:
+                            if hBid.merit_order >= kBid.merit_order:
+                                continue
+                            k = self.pun_orders_ids[kBid]
                             i = hBid.location
                             j = kBid.location
                             # same zone
                             if i == j:
                                 expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k]
-                                setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                model.ATM_split_order.add(expr)
                                 order_idx += 1
 
                                 expr = model.uek[h] >= model.uek[k]
-                                setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                model.ATM_split_order.add(expr)
                                 order_idx += 1
 
                                 expr = model.ddk[h] >= hBid.volume * model.udk[k]
-                                setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                model.ATM_split_order.add(expr)
                                 order_idx += 1
 
-                                #print book.bids[h].id, book.bids[k].id, self.zones[i].name
-
                                 continue
 
                             if options.SPLIT:
-                                # zone connected directly
-                                if model.flow_max[i, j, p] > 0 or model.flow_max[j, i, p] > 0:
+                                # zones connected directly, or with 1, 2, 3, or 4 middle zones. Unlike the former
+                                # scan of the 4-permutations of the middle zones, every path gets its constraints,
+                                # also with less than 4 other zones in LpunExt, and the longer paths whose first middle
+                                # zones already form a path are kept, see testNetwork.MarketSplitCase.
+                                if network.capacity(i, j, p) > 0 or network.capacity(j, i, p) > 0:
+                                    paths = [(i, j)]
+                                else:
+                                    paths = network.paths(i, j, p, LpunExt - frozenset([i, j]))
+
+                                for path in paths:
+                                    split = sum(model.uf[z1, z2, p] + model.uf[z2, z1, p]
+                                                for (z1, z2) in zip(path[:-1], path[1:]))
+
                                     expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k] \
-                                           - hBid.volume * model.uf[i, j, p] - hBid.volume * model.uf[
-                                               j, i, p]
-                                    setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                           - hBid.volume * split
+                                    model.ATM_split_order.add(expr)
                                     order_idx += 1
 
-                                    expr = model.uek[h] >= model.uek[k] \
-                                           - model.uf[i, j, p] - model.uf[j, i, p]
-                                    setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                    expr = model.uek[h] >= model.uek[k] - split
+                                    model.ATM_split_order.add(expr)
                                     order_idx += 1
 
-                                    expr = model.ddk[h] >= hBid.volume * model.udk[k] \
-                                           - hBid.volume * model.uf[i, j, p] - hBid.volume * model.uf[
-                                               j, i, p]
-                                    setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
+                                    expr = model.ddk[h] >= hBid.volume * model.udk[k] - hBid.volume * split
+                                    model.ATM_split_order.add(expr)
                                     order_idx += 1
 
-                                    #print book.bids[h].id, book.bids[k].id, self.zones[i].name, "->", self.zones[j].name
-
-                                    continue
-
-                                # zones connected with 1, 2, 3, or 4 middle zones
-                                remaining_zones = model.LpunExt.data() - set([i, j])
-
-                                middle_zones = set((z1, z2, z3, z4) for (z1, z2, z3, z4)
-                                                in itertools.product(remaining_zones, remaining_zones, remaining_zones, remaining_zones)
-                                                if z1 != z2 and z1 != z3 and z1 != z4 \
-                                                            and z2 != z3 and z2 != z4 \
-                                                                         and z3 != z4)
-                                processed = set()
-                                for (z1, z2, z3, z4) in middle_zones:
-                                    # one zone in the middle
-                                    if (model.flow_max[i, z1, p] > 0 and model.flow_max[z1, j, p] > 0) \
-                                            or \
-                                            (model.flow_max[j, z1, p] > 0 and model.flow_max[z1, i, p] > 0):
-
-                                        if (i,z1,j) in processed:
-                                            continue
-                                        else:
-                                            processed.add((i, z1, j))
-                                            processed.add((j, z1, i))
-
-                                        expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, j, p] - hBid.volume * \
-                                               model.uf[j, z1, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.uek[h] >= model.uek[k] \
-                                               - model.uf[i, z1, p] - model.uf[z1, i, p] \
-                                               - model.uf[z1, j, p] - model.uf[j, z1, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.ddk[h] >= hBid.volume * model.udk[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, j, p] - hBid.volume * \
-                                               model.uf[j, z1, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        #print book.bids[h].id, book.bids[k].id, self.zones[i].name, "->", self.zones[z1].name, "->", self.zones[j].name
-
-
-                                    # two zones in the middle
-                                    if (model.flow_max[i, z1, p] > 0 and model.flow_max[z1, z2, p] > 0 and
-                                        model.flow_max[
-                                            z2, j, p] > 0) \
-                                            or \
-                                            (model.flow_max[j, z2, p] > 0 and model.flow_max[z2, z1, p] > 0 and
-                                             model.flow_max[
-                                                 z1, i, p] > 0):
-
-                                        if (i,z1,z2,j) in processed:
-                                            continue
-                                        else:
-                                            processed.add((i, z1, z2, j))
-                                            processed.add((j, z2, z1, i))
-
-                                        expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, j, p] - hBid.volume * \
-                                               model.uf[j, z2, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.uek[h] >= model.uek[k] \
-                                               - model.uf[i, z1, p] - model.uf[z1, i, p] \
-                                               - model.uf[z1, z2, p] - model.uf[z2, z1, p] \
-                                               - model.uf[z2, j, p] - model.uf[j, z2, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.ddk[h] >= hBid.volume * model.udk[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, j, p] - hBid.volume * \
-                                               model.uf[j, z2, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        #print book.bids[h].id, book.bids[k].id, self.zones[i].name, "->", self.zones[z1].name, "->", \
-                                        #      self.zones[z2].name, "->", self.zones[j].name
-
-
-
-                                    # three zones in the middle
-                                    if (model.flow_max[i, z1, p] > 0 and model.flow_max[z1, z2, p] > 0 and
-                                        model.flow_max[
-                                            z2, z3, p] > 0 and model.flow_max[z3, j, p] > 0) \
-                                            or \
-                                            (model.flow_max[j, z3, p] > 0 and model.flow_max[z3, z2, p] > 0 and
-                                             model.flow_max[
-                                                 z2, z1, p] > 0 and model.flow_max[z1, i, p] > 0):
-
-                                        if (i,z1,z2,z3,j) in processed:
-                                            continue
-                                        else:
-                                            processed.add((i, z1, z2, z3, j))
-                                            processed.add((j, z3, z2, z1, i))
-
-                                        expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, z3, p] - hBid.volume * \
-                                               model.uf[z3, z2, p] \
-                                               - hBid.volume * model.uf[z3, j, p] - hBid.volume * \
-                                               model.uf[j, z3, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.uek[h] >= model.uek[k] \
-                                               - model.uf[i, z1, p] - model.uf[z1, i, p] \
-                                               - model.uf[z1, z2, p] - model.uf[z2, z1, p] \
-                                               - model.uf[z2, z3, p] - model.uf[z3, z2, p] \
-                                               - model.uf[z3, j, p] - model.uf[j, z3, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.ddk[h] >= hBid.volume * model.udk[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, z3, p] - hBid.volume * \
-                                               model.uf[z3, z2, p] \
-                                               - hBid.volume * model.uf[z3, j, p] - hBid.volume * \
-                                               model.uf[j, z3, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        #print book.bids[h].id, book.bids[k].id, self.zones[i].name, "->", self.zones[z1].name, "->", \
-                                        #    self.zones[z2].name, "->", self.zones[z3].name, "->", self.zones[j].name
-
-
-
-                                    # 4 zones in the middle
-                                    if (model.flow_max[i, z1, p] > 0 and model.flow_max[z1, z2, p] > 0 and
-                                        model.flow_max[
-                                            z2, z3, p] > 0 and model.flow_max[z3, z4, p] > 0 and model.flow_max[
-                                            z4, j, p] > 0) \
-                                            or \
-                                            (model.flow_max[j, z4, p] > 0 and model.flow_max[z4, z3, p] > 0 and
-                                             model.flow_max[
-                                                 z3, z2, p] > 0 and model.flow_max[z2, z1, p] > 0 and model.flow_max[
-                                                 z1, i, p] > 0):
-
-                                        if (i,z1,z2,z3,z4,j) in processed:
-                                            continue
-                                        else:
-                                            processed.add((i, z1, z2, z3, z4, j))
-                                            processed.add((j, z4, z3, z2, z1, i))
-
-                                        expr = model.dwk[h] + model.ddk[h] >= hBid.volume * model.uek[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, z3, p] - hBid.volume * \
-                                               model.uf[z3, z2, p] \
-                                               - hBid.volume * model.uf[z3, z4, p] - hBid.volume * \
-                                               model.uf[z4, z3, p] \
-                                               - hBid.volume * model.uf[z4, j, p] - hBid.volume * \
-                                               model.uf[j, z4, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.uek[h] >= model.uek[k] \
-                                               - model.uf[i, z1, p] - model.uf[z1, i, p] \
-                                               - model.uf[z1, z2, p] - model.uf[z2, z1, p] \
-                                               - model.uf[z2, z3, p] - model.uf[z3, z2, p] \
-                                               - model.uf[z3, z4, p] - model.uf[z4, z3, p] \
-                                               - model.uf[z4, j, p] - model.uf[j, z4, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        expr = model.ddk[h] >= hBid.volume * model.udk[k] \
-                                               - hBid.volume * model.uf[i, z1, p] - hBid.volume * \
-                                               model.uf[z1, i, p] \
-                                               - hBid.volume * model.uf[z1, z2, p] - hBid.volume * \
-                                               model.uf[z2, z1, p] \
-                                               - hBid.volume * model.uf[z2, z3, p] - hBid.volume * \
-                                               model.uf[z3, z2, p] \
-                                               - hBid.volume * model.uf[z3, z4, p] - hBid.volume * \
-                                               model.uf[z4, z3, p] \
-                                               - hBid.volume * model.uf[z4, j, p] - hBid.volume * \
-                                               model.uf[j, z4, p]
-                                        setattr(model, "ATM_split_order_%d" % order_idx, Constraint(expr=expr))
-                                        order_idx += 1
-
-                                        #print book.bids[h].id, book.bids[k].id, self.zones[i].name, "->", self.zones[z1].name, "->", \
-                                        #    self.zones[z2].name, "->", self.zones[z3].name, "->", \
-                                        #    self.zones[z4].name, "->", self.zones[j].name
-
-
-
             if options.DEBUG:
                 logging.info("Created %d ATM split constraints" % order_idx)
 
@@ -624,6 +455,7 @@ class PUN_DAM(DAM):
 
         # only loose definition of uf
         # it appears to be more efficient
+        profile.start('p_uf_def')
         def p_uf_def_rule(m, i, j, p):
             if m.flow_max[i, j, p] > 0:
                 return m.uf[i, j, p] <= (m.f[i, j, p] + m.flow_max[j, i, p]) / \
@@ -636,8 +468,9 @@ class PUN_DAM(DAM):
         if options.DEBUG:
             logging.info("Creating uf definitions")
         if options.SPLIT and not relax_PUN:
-            model.p_uf_def = Constraint(model.LpunExt, model.LpunExt, model.periods, rule=p_uf_def_rule)
+            model.p_uf_def = Constraint(model.arcsPunExt, model.periods, rule=p_uf_def_rule)
 
+        profile.start('p_pun_quantity')
         def p_pun_quantity_rule(m, b):
             if book.bids[b].price == MAX_PRICE and not relax_PUN:
                 return Constraint.Skip
@@ -647,12 +480,12 @@ class PUN_DAM(DAM):
         if not relax_PUN:
             model.p_pun_quantity = Constraint(model.punBids, rule=p_pun_quantity_rule)
 
+        profile.start('p_binary_expansion')
         def p_binary_expansion_rule(m, t, l):
             rhs = 0
 
-            for pun_bid in self.pun_orders_by_period[t]:
-                if pun_bid.location == l:
-                    rhs += m.ddk[self.pun_orders_ids[pun_bid]]
+            for b in pun_by_zone_period.get((l, t), []):
+                rhs += m.ddk[b]
 
             return 1e-3 * sum(m.bexp[t, j, l] * 2 ** j for j in model.binary_powers) == rhs
 
@@ -664,10 +497,8 @@ class PUN_DAM(DAM):
             lhs = 0
             rhs = m.imbalance[p]
 
-            for b in m.punBids:
-                pun_bid = book.bids[b]
-                if pun_bid.period != p:
-                    continue
+            for pun_bid in self.pun_orders_by_period[p]:
+                b = self.pun_orders_ids[pun_bid]
 
                 lhs += pun_bid.volume * m.yugPUNk[b]
                 lhs += pun_bid.price * m.ddk[b]
@@ -680,12 +511,14 @@ class PUN_DAM(DAM):
 
             return lhs == rhs
 
+        profile.start('p_pun_defintion')
         if options.DEBUG:
             logging.info("Creating PUN price constraint")
         if not relax_PUN:
             model.p_pun_defintion = Constraint(model.periods, rule=p_pun_defintion_rule)
 
         # Lower level
+        profile.start('lower_level')
         if options.DEBUG:
             logging.info("Creating lower level problem constraints")
 
@@ -709,12 +542,12 @@ class PUN_DAM(DAM):
         def p_max_flow_rule(m, local, foreign, p):
             return m.f[local, foreign, p] <= m.flow_max[local, foreign, p]
 
-        model.p_max_flow = Constraint(model.L, model.L, model.periods, rule=p_max_flow_rule)
+        model.p_max_flow = Constraint(model.arcs, model.periods, rule=p_max_flow_rule)
 
         def p_flows_rule(m, local, foreign, p):
             return m.f[local, foreign, p] == -m.f[foreign, local, p]
 
-        model.p_flows = Constraint(model.L, model.L, model.periods, rule=p_flows_rule)
+        model.p_flows = Constraint(model.arcs, model.periods, rule=p_flows_rule)
 
         def p_block_max_rule(m, b):
             return m.rp[b] <= m.ubp[b]
@@ -727,19 +560,20 @@ class PUN_DAM(DAM):
 
         model.p_block_min = Constraint(model.bBids, rule=p_block_min_rule)
 
+        profile.start('p_balance')
         def p_balance_rule(m, p, l):
-            demand = sum(m.dk[b] for b in model.demandBids if (book.bids[b].period == p and book.bids[b].location == l))
+            demand = sum(m.dk[b] for b in demand_by_zone_period.get((l, p), []))
 
-            demand += sum(m.dwk[b] for b in model.punBids if (book.bids[b].period == p and book.bids[b].location == l))
+            pun_bids = pun_by_zone_period.get((l, p), [])
+            demand += sum(m.dwk[b] for b in pun_bids)
             if not relax_PUN:
-                demand += sum((book.bids[b].volume * m.ugk[b] + m.ddk[b])
-                              for b in model.punBids if (book.bids[b].period == p and book.bids[b].location == l))
+                demand += sum((book.bids[b].volume * m.ugk[b] + m.ddk[b]) for b in pun_bids)
 
-            supply = sum(m.sp[b] for b in model.supplyBids if (book.bids[b].period == p and book.bids[b].location == l))
-            supply += sum(m.rp[b] * book.bids[b].volumes[p] for b in model.bBids if book.bids[b].location == l)
+            supply = sum(m.sp[b] for b in supply_by_zone_period.get((l, p), []))
+            supply += sum(m.rp[b] * book.bids[b].volumes[p] for b in block_by_zone_period.get((l, p), []))
 
             flow_out = 0
-            for foreign in model.L:
+            for foreign in arcs_out.get(l, []):
                 flow_out += m.f[l, foreign, p]
 
             return demand + flow_out == supply
@@ -747,6 +581,7 @@ class PUN_DAM(DAM):
         model.p_balance = Constraint(model.periods, model.L, rule=p_balance_rule)
 
         # Dual constraints
+        profile.start('dual')
         if options.DEBUG:
             logging.info("Creating dual constraints")
 
@@ -772,7 +607,7 @@ class PUN_DAM(DAM):
             return m.deltaMax[local, foreign, p] + m.etaij[local, foreign, p] \
                    + m.etaij[foreign, local, p] + m.pZi[local, p] == 0
 
-        model.d_flows = Constraint(model.L, model.L, model.periods, rule=d_flows_rule)
+        model.d_flows = Constraint(model.arcs, model.periods, rule=d_flows_rule)
 
         def d_block_rule(m, b):
             bid = book.bids[b]
@@ -783,6 +618,7 @@ class PUN_DAM(DAM):
         model.d_block = Constraint(model.bBids, rule=d_block_rule)
 
         # Linearization and auxiliary variables definition
+        profile.start('linearization')
         if options.DEBUG:
             logging.info("Creating linearization constraints")
 
@@ -936,6 +772,7 @@ class PUN_DAM(DAM):
         model.lin_ubp_min_second_LO = Constraint(model.bBids, rule=lin_ubp_min_second_rule_LO)
 
         # Strong duality
+        profile.start('strong_duality')
         if options.DEBUG:
             logging.info("Creating strong duality constraint")
 
@@ -960,9 +797,8 @@ class PUN_DAM(DAM):
                     for (j, l) in (model.binary_powers * model.Lpun):
                         expr -= 1e-3 * m.ybPzi[p, j, l] * 2 ** j
 
-                for local in model.L:
-                    for foreign in model.L:
-                        congestion += m.deltaMax[local, foreign, p] * m.flow_max[local, foreign, p]
+                for (local, foreign) in model.arcs:
+                    congestion += m.deltaMax[local, foreign, p] * m.flow_max[local, foreign, p]
 
             return expr + congestion
 
@@ -971,6 +807,7 @@ class PUN_DAM(DAM):
 
         model.strong_duality = Constraint(rule=strong_duality_rule)
 
+        profile.start('objective')
         if options.DEBUG:
             logging.info("Creating objective")
 
@@ -989,6 +826,7 @@ class PUN_DAM(DAM):
 
         # FIX PUN at 3000
 
+        profile.start('fix_window')
         self.fix_window(model, ESTIMATED_PUN_PRICES_RANGES)
 
         # Branching priorities.
@@ -1000,10 +838,19 @@ class PUN_DAM(DAM):
         # model.priority.set_value(model.udk, 1)
         # model.priority.set_value(model.bexp, 2)
 
+        profile.stop()
+        self.build_profile = profile
         self.model = model
         # model.pprint()
 
-    def fix_window(self, model, ESTIMATED_PUN_PRICES_RANGES=None):
+    def fix_window(self, model, ESTIMATED_PUN_PRICES_RANGES=None, solver=None):
+        """
+        Fix the PUN orders out of the estimated PUN price ranges, and free the others.
+
+        :param model: the model.
+        :param ESTIMATED_PUN_PRICES_RANGES: [min, max] PUN price by period, the whole price range if None.
+        :param solver: a persistent solver in which the model is loaded, updated with the new bounds of the variables.
+        """
         if options.DEBUG:
             logging.info("Fixing variables" + ", relaxed PUN" if self.relax_PUN else '')
 
@@ -1070,6 +917,15 @@ class PUN_DAM(DAM):
                 else:
                     model.uwk[p].fixed = False
 
+        if solver is not None:
+            if relax_PUN:
+                pun_vars = [model.uwk]
+            else:
+                pun_vars = [model.dkpi, model.ddk, model.ugk, model.uek, model.uwk, model.udk, model.dwk]
+            for p in model.punBids:
+                for var in pun_vars:
+                    solver.update_var(var[p])
+
     def solve(self, VERBOSE=False, strategy='Simple'):
         """
         Solve the PUN problem
@@ -1078,16 +934,53 @@ class PUN_DAM(DAM):
         logging.info('Solving day %d' % self.day_id)
         self.t_solve_init = time.time()
 
+        # A solution of the same model with the same solver settings and strategy is reused from the artifact cache.
+        cache = self.artifact_cache()
+        solution = 'solution_%s_%s' % (strategy, solver_key())
+        if cache is not None and strategy != "NEOS":
+            stored = cache.load_values(self.model, solution)
+            if stored is not None:
+                logging.info("Solution read from the artifact cache.")
+                self._build_solution()
+                self.absolute_gap = stored['absolute_gap']
+                self.t_solve = stored['t_solve']
+                return
+
+        self.timings = {}
+        t = time.time()
+        results = None
         if strategy == "NEOS":
             self.solve_with_neos()
         elif strategy == "Advanced":
-            self.advanced_solve(VERBOSE)
+            results = self.advanced_solve(VERBOSE)
         else:  # Simple
-            self.simple_solve(VERBOSE)
+            results = self.simple_solve(VERBOSE)
+        self.timings['solve'] = time.time() - t - self.timings.get('load', 0.0)
+
+        if cache is not None and strategy != "NEOS" and self.has_solution(results):
+            cache.save_values(self.model, solution, absolute_gap=self.absolute_gap, t_solve=self.t_solve)
 
     def simple_solve(self, VERBOSE):
         """
         Simple strategy: just call the solver
+
+        :return: the Pyomo results of the solve.
+        """
+        results = self.solve_model(VERBOSE)
+
+        if self.has_solution(results):
+            self.t_solve = time.time() - self.t_solve_init
+            logging.info("Time: %.2f" % self.t_solve)
+            self._build_solution(results)
+        else:
+            self.exportModel()
+        return results
+
+    def solve_model(self, VERBOSE):
+        """
+        Solve the model with options.SOLVER, and again with a relaxed feasibility tolerance if it is infeasible.
+
+        :return: the Pyomo results of the last solve.
         """
         results = options.SOLVER.solve(self.model, tee=VERBOSE)
 
@@ -1100,13 +993,7 @@ class PUN_DAM(DAM):
             results = options.SOLVER.solve(self.model, tee=VERBOSE)
             logging.info("Restoring feasibility parameter.")
             options.SOLVER.options["simplex tolerances feasibility"] = feas
-
-        if len(self.model.solutions) != 0:
-            self.t_solve = time.time() - self.t_solve_init
-            logging.info("Time: %.2f" % self.t_solve)
-            self._build_solution(results)
-        else:
-            self.exportModel()
+        return results
 
     def solve_with_neos(self):
         """
@@ -1150,67 +1037,140 @@ class PUN_DAM(DAM):
         First solve without the PUN constraints. Determine a weighted average price approximationfor the PUN
         Second, solve on a reduced price window around those prices
         Finally, solve over the remaining possibilities, with a good starting point obtained at step 2.
-        """
 
-        logging.info("Advanced solution method (ASM)")
+        Phases 2 and 3 share a persistent solver instance when one is available for the solver, see
+        :py:meth:`persistent_solver`: only the fixings of :py:meth:`fix_window` are pushed to the solver between
+        them, and the solution of phase 2 is given in memory as MIP start. Otherwise the file-based solver is called
+        with a warm start file.
 
-        logging.info("ASM phase 1 of 3: Solving model with PUN relaxed")
-        # Create a copy
-        dam_relaxed = self.loader.read_day(self.day_id)
-        dam_relaxed.create_model(relax_PUN=True)
+        With options.PUN_WINDOW_SEARCH, phase 2 searches the window among candidates aligned on the steps of the PUN
+        curves, see :py:meth:`window_search`, and the best incumbent found is the MIP start of phase 3.
 
-        # reset time to exclude model generation
-        self.t_solve_init = time.time()
-        logging.info("Reset time to exclude model generation.")
+        :return: the Pyomo results of the solve of phase 3.
+        """
 
-        dam_relaxed.solve(VERBOSE=True, strategy='Simple')
+        logging.info("Advanced solution method (ASM)")
 
-        # Retrieve relaxed PUN prices from relaxed model
-        relaxed_prices_by_period = dam_relaxed.prices(0)
-        pun_prices = dam_relaxed.pun_prices()
-        estimated_pun_prices_ranges = {}
-        for p, v in relaxed_prices_by_period.iteritems():
-            estimated_pun_prices_ranges[p] = [v - 1.0, v + 1.0]
+        # The relaxed PUN prices and the incumbent of phase 2 do not depend on the settings of the solver of phase 3,
+        # and are reused from the artifact cache when it is enabled, as well as its files.
+        cache = self.artifact_cache()
+        relaxed_prices_by_period = cache.load_prices('relaxed_prices') if cache is not None else None
+
+        if relaxed_prices_by_period is None:
+            logging.info("ASM phase 1 of 3: Solving model with PUN relaxed")
+            # The relaxed model is built from the order book of this market, the model with PUN is restored after.
+            model = self.model
+            build_profile = self.build_profile
+            nbinvar_initial = self.nbinvar_initial
+            self.create_model(relax_PUN=True)
+
+            # reset time to exclude model generation
+            self.t_solve_init = time.time()
+            logging.info("Reset time to exclude model generation.")
+
+            try:
+                # The solution of the relaxed model is not stored in the order book, which holds the solution of
+                # the model with PUN.
+                results = self.solve_model(VERBOSE=True)
+                if not self.has_solution(results):
+                    self.exportModel()
+                    raise Exception('No solution found when clearing the day-ahead energy market with PUN relaxed.')
+
+                # Retrieve relaxed PUN prices from relaxed model
+                relaxed_prices_by_period = self.relaxed_pun_prices()
+            finally:
+                self.model = model
+                self.build_profile = build_profile
+                self.relax_PUN = False
+                self.nbinvar = self.nbinvar_initial = nbinvar_initial
+
+            if cache is not None:
+                cache.save_prices('relaxed_prices', relaxed_prices_by_period)
+        else:
+            logging.info("ASM phase 1 of 3: Relaxed PUN prices read from the artifact cache")
 
-        logging.info("Estimated PUN price ranges : %s" % estimated_pun_prices_ranges)
+        solver = self.persistent_solver()
+        warm_file = cache.file_name("warmstart.sol") if cache is not None else "warmstart.sol"
+        search = options.PUN_WINDOW_SEARCH > 0
+        incumbent = 'incumbent_search' if search else 'incumbent'
 
-        logging.info("ASM phase 2 of 3: Solving model on restricted price window")
+        if cache is not None and cache.load_values(self.model, incumbent) is not None:
+            logging.info("ASM phase 2 of 3: Incumbent read from the artifact cache")
+            heuristic_sol = True
+        elif search:
+            logging.info("ASM phase 2 of 3: Searching the PUN price window")
+
+            heuristic_sol = self.window_search(relaxed_prices_by_period)
+            if heuristic_sol:
+                self.t_solve = time.time() - self.t_solve_init
+                logging.info("Time: %.2f" % self.t_solve)
+                if cache is not None:
+                    cache.save_values(self.model, incumbent)
+        else:
+            estimated_pun_prices_ranges = {}
+            for p, v in relaxed_prices_by_period.items():
+                estimated_pun_prices_ranges[p] = [v - 1.0, v + 1.0]
 
-        self.fix_window(self.model, estimated_pun_prices_ranges)
-        heuristic_sol = False
-        warm_file = "warmstart.sol"
+            logging.info("Estimated PUN price ranges : %s" % estimated_pun_prices_ranges)
+            logging.info("ASM phase 2 of 3: Solving model on restricted price window")
 
-        stored_gap = options.SOLVER.options["mip tolerances mipgap"]
-        options.SOLVER.options["mip tolerances mipgap"] = 1e-6
-        options.SOLVER.solve(self.model, tee=VERBOSE, keepfiles=True, solnfile=warm_file)
-        options.SOLVER.options["mip tolerances mipgap"] = stored_gap
+            self.fix_window(self.model, estimated_pun_prices_ranges, solver)
+            heuristic_sol = False
 
-        if len(self.model.solutions) != 0:
-            heuristic_sol = True
-            self.t_solve = time.time() - self.t_solve_init
-            logging.info("Time: %.2f" % self.t_solve)
+            if solver is not None:
+                stored_gap = solver.options["mip_tolerances_mipgap"]
+                solver.options["mip_tolerances_mipgap"] = 1e-6
+                results = solver.solve(tee=VERBOSE)
+                solver.options["mip_tolerances_mipgap"] = stored_gap
+            else:
+                stored_gap = options.SOLVER.options["mip tolerances mipgap"]
+                options.SOLVER.options["mip tolerances mipgap"] = 1e-6
+                results = options.SOLVER.solve(self.model, tee=VERBOSE, keepfiles=True, solnfile=warm_file)
+                options.SOLVER.options["mip tolerances mipgap"] = stored_gap
+
+            if self.has_solution(results):
+                heuristic_sol = True
+                self.t_solve = time.time() - self.t_solve_init
+                logging.info("Time: %.2f" % self.t_solve)
+                if cache is not None:
+                    cache.save_values(self.model, incumbent)
 
         logging.info("ASM phase 3 of 3: Proving optimality")
 
         self.nbinvar = self.nbinvar_initial
 
-        self.fix_window(self.model)
-        results = options.SOLVER.solve(self.model, tee=VERBOSE, keepfiles=False,
-                             solnfile="full.sol", logfile="full.log",
-                             warmstart=heuristic_sol, warmstart_file=warm_file)
-
-        if len(self.model.solutions) != 0:
+        self.fix_window(self.model, solver=solver)
+        if solver is not None:
+            # The solution of phase 2 is still loaded in the variables of the model.
+            results = solver.solve(tee=VERBOSE, warmstart=heuristic_sol)
+        else:
+            # The incumbent of the window search is only in the variables of the model, from which the solver plugin
+            # writes the MIP start. The APPSI solvers, e.g. appsi_highs, take neither files nor MIP starts.
+            kwargs = {}
+            if hasattr(options.SOLVER, 'warm_start_capable'):
+                kwargs = dict(keepfiles=False,
+                              solnfile=cache.file_name("full.sol") if cache is not None else "full.sol",
+                              logfile=cache.file_name("full.log") if cache is not None else "full.log")
+                if options.SOLVER.warm_start_capable():
+                    kwargs.update(warmstart=heuristic_sol, warmstart_file=None if search else warm_file)
+            results = options.SOLVER.solve(self.model, tee=VERBOSE, **kwargs)
+
+        if self.has_solution(results):
             self.t_solve = time.time() - self.t_solve_init
             logging.info("Time: %.2f" % self.t_solve)
             self._build_solution(results)
+            if search:
+                self.window_hit_rates()
         else:
             self.exportModel()
             raise Exception('No solution found when clearing the day-ahead energy market.')
+        return results
 
     def _build_solution(self, results=None):
         """
         Store the solution of the day-ahead market in the order book.
         """
+        t_load = time.time()
         model = self.model
         book = self.orders
 
@@ -1225,8 +1185,6 @@ class PUN_DAM(DAM):
 
         book.volumes = {s: {l: {t: 0.0 for t in book.periods} for l in model.L} for s in ['SUPPLY', 'DEMAND']}
 
-        pun_matched = {l: {t: 0.0 for t in book.periods} for l in model.Lpun}
-
         self.welfare = value(model.obj)
         logging.info("welfare: %.2f" % value(self.welfare))
 
@@ -1244,7 +1202,7 @@ class PUN_DAM(DAM):
 
             # Obtain and save the volume
             volume = model.dk[i].value
-            bid.acceptance = abs(volume / bid.volume)
+            book.set_acceptance(i, abs(volume / bid.volume))
 
             # Update volumes and prices
             if volume > options.EPS:
@@ -1257,21 +1215,20 @@ class PUN_DAM(DAM):
 
             # Obtain and save the volume
             volume = model.dwk[i].value if self.relax_PUN else model.dkpi[i].value
-            bid.acceptance = abs(volume / bid.volume)
+            book.set_acceptance(i, abs(volume / bid.volume))
 
             # Update volumes and prices
             if volume > options.EPS:
                 # Compute the total volumes exchanged
                 t = bid.period
                 book.volumes["DEMAND"][bid.location][t] -= volume
-                pun_matched[bid.location][t] += volume
 
         for i in model.supplyBids:
             bid = book.bids[i]
 
             # Obtain and save the volume
             volume = model.sp[i].value
-            bid.acceptance = abs(volume / bid.volume)
+            book.set_acceptance(i, abs(volume / bid.volume))
 
             # Update volumes and prices
             if volume > options.EPS:
@@ -1283,7 +1240,7 @@ class PUN_DAM(DAM):
             bid = book.bids[i]
 
             # Obtain and save the volume
-            bid.acceptance = model.rp[i].value
+            book.set_acceptance(i, model.rp[i].value)
 
             # Update volumes and prices
             if bid.acceptance > options.EPS:
@@ -1313,14 +1270,33 @@ class PUN_DAM(DAM):
         if not self.relax_PUN:
             book.prices.update({0: {t: model.pi[t].value for t in book.periods}})  # PUN is zone 0 by convention
         else:
-            # compute average price over pun zones
-            average_price = {}
-            for t in book.periods:
-                total_pun_macthed = sum([pun_matched[l][t] for l in model.Lpun])
-                average_price[t] = sum([model.pZi[l, t].value * pun_matched[l][t] for l in model.Lpun]) \
-                                   / total_pun_macthed
+            book.prices.update({0: self.relaxed_pun_prices()})
+
+        self.timings['load'] = time.time() - t_load
 
-            book.prices.update({0: {t: average_price[t] for t in book.periods}})
+    def relaxed_pun_prices(self):
+        """
+        Average price of the PUN zones in the solution of the model with PUN relaxed, weighted by the volumes of the
+        PUN orders matched in each zone. The order book is not modified.
+
+        :return: dict period -> price.
+        """
+        model = self.model
+        book = self.orders
+        pun_matched = {l: {t: 0.0 for t in book.periods} for l in model.Lpun}
+        for i in model.punBids:
+            bid = book.bids[i]
+            volume = model.dwk[i].value
+            if volume > options.EPS:
+                pun_matched[bid.location][bid.period] += volume
+
+        # compute average price over pun zones
+        average_price = {}
+        for t in book.periods:
+            total_pun_macthed = sum([pun_matched[l][t] for l in model.Lpun])
+            average_price[t] = sum([model.pZi[l, t].value * pun_matched[l][t] for l in model.Lpun]) \
+                               / total_pun_macthed
+        return average_price
 
     def pun_prices(self):
         """Determine pun price range based on PUN orders acceptance"""
@@ -1334,7 +1310,7 @@ class PUN_DAM(DAM):
 
             # Obtain and save the volume
             volume = model.dwk[i].value if self.relax_PUN else model.dkpi[i].value
-            bid.acceptance = abs(volume / bid.volume)
+            book.set_acceptance(i, abs(volume / bid.volume))
             if bid.acceptance > 0:
                 pun_prices[bid.period][1] = min(pun_prices[bid.period][1], bid.price)
             else:
@@ -1354,9 +1330,7 @@ class PUN_DAM(DAM):
         pun_prices = {t: list(self.priceCap) for t in book.periods}
 
         for p in book.periods:
-            pun_orders_sorted_by_price = sorted(self.pun_orders_by_period[p], key=lambda k: -k.price)
-
-            for bid in pun_orders_sorted_by_price:
+            for bid in self.pun_orders_by_price[p]:
 
                 if bid.price > prices[p]:
                     pun_prices[p][1] = bid.price
@@ -1368,3 +1342,182 @@ class PUN_DAM(DAM):
                     break
 
         return pun_prices
+
+    def window_candidates(self, prices, width=0, count=1):
+        """
+        Candidate PUN price windows aligned on the steps of the PUN curves.
+
+        :param prices: a PUN price by period, e.g. the relaxed PUN prices.
+        :param width: number of steps of the PUN curve added on both sides of the step containing the price, see
+            :py:meth:`pun_price_step`.
+        :param count: maximum number of candidates: the window around the step of the price, then the windows shifted
+            by one step down and up, by two steps, etc.
+        :return: list of distinct windows, [min, max] PUN price by period.
+        """
+        steps = self.pun_price_step(prices)
+        levels = dict((t, sorted(set(list(self.priceCap) + [bid.price for bid in orders])))
+                      for t, orders in self.pun_orders_by_price.items())
+
+        candidates = []
+        for shift in [0] + [s for d in range(1, count) for s in (-d, d)]:
+            window = {}
+            for t, (low, high) in steps.items():
+                prices_t = levels[t]
+                last = len(prices_t) - 1
+                first, end = prices_t.index(low) - width + shift, prices_t.index(high) + width + shift
+                # A window shifted out of the price range is moved back into it, keeping its width if possible.
+                offset = max(0, -first) - max(0, end - last)
+                window[t] = [prices_t[max(0, first + offset)], prices_t[min(last, end + offset)]]
+            if window not in candidates:
+                candidates.append(window)
+                if len(candidates) == count:
+                    break
+        return candidates
+
+    def window_search(self, prices):
+        """
+        Search the PUN price window of phase 2 of the Advanced strategy, in rounds of options.PUN_WINDOW_CANDIDATES
+        windows from :py:meth:`window_candidates`, solved concurrently in options.PUN_WINDOW_SEARCH worker processes,
+        each creating its own model of the day. The first round is around the relaxed PUN prices, and each following
+        round is around the PUN prices of the best incumbent with twice the width, until a round does not improve
+        the incumbent or after options.PUN_WINDOW_ROUNDS rounds.
+
+        The windows are solved in this process when options.PUN_WINDOW_SEARCH is 1 or when the day is cleared in a
+        daemonic worker process, which cannot start processes.
+
+        :param prices: relaxed PUN price by period.
+        :return: True if an incumbent was found, in which case it is loaded in the variables of the model.
+        """
+        t = time.time()
+        pool = None
+        if options.PUN_WINDOW_SEARCH > 1:
+            if multiprocessing.current_process().daemon:
+                logging.info("Window search in the process of the day, which cannot start worker processes.")
+            else:
+                day = copy.copy(self)
+                day.model = None
+                day.build_profile = None
+                day.artifacts = None
+                day.loader = None
+                pool = multiprocessing.Pool(options.PUN_WINDOW_SEARCH, _init_window_worker,
+                                            (day, options.SOLVER_NAME, dict(options.SOLVER.options)))
+
+        self.windows = []
+        best = None
+        best_window = None
+        width = 0
+        try:
+            for r in range(options.PUN_WINDOW_ROUNDS):
+                tried = [w for w, welfare in self.windows]
+                windows = [w for w in self.window_candidates(prices, width, options.PUN_WINDOW_CANDIDATES)
+                           if w not in tried]
+                if pool is not None:
+                    solutions = pool.map(_solve_window, windows)
+                else:
+                    solutions = [self.solve_window(w) for w in windows]
+
+                improved = False
+                for window, solution in zip(windows, solutions):
+                    self.windows.append((window, solution[0] if solution is not None else None))
+                    if solution is not None and (best is None or solution[0] > best[0] + options.EPS):
+                        best = solution
+                        best_window = window
+                        improved = True
+                logging.info("Window search round %d: %d windows, best welfare %s" %
+                             (r + 1, len(windows), best[0] if best is not None else None))
+
+                if best is not None:
+                    if not improved:
+                        break
+                    prices = best[1]
+                width = max(1, 2 * width)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if best is not None:
+            values = best[2]
+            for v in self.model.component_data_objects(Var):
+                v.set_value(values.get(v.name), skip_validation=True)
+        self.window_report = {'windows': len(self.windows),
+                              'solved': sum(1 for w, welfare in self.windows if welfare is not None),
+                              'best': best_window}
+        self.timings['window_search'] = time.time() - t
+        return best is not None
+
+    def solve_window(self, window, VERBOSE=False):
+        """
+        Solve the model with the PUN orders out of a price window fixed, see :py:meth:`fix_window`.
+
+        :param window: [min, max] PUN price by period.
+        :param VERBOSE: True to print the output of the solver.
+        :return: the welfare, the PUN price by period and the values of the variables by name of the solution, or
+            None if the solver found none.
+        """
+        model = self.model
+        self.fix_window(model, window)
+
+        # The incumbent is only a MIP start, but an optimal one in the window is the best one.
+        stored_gap = options.SOLVER.options.get("mip tolerances mipgap")
+        if stored_gap is not None:
+            options.SOLVER.options["mip tolerances mipgap"] = 1e-6
+        try:
+            results = options.SOLVER.solve(model, tee=VERBOSE)
+        except RuntimeError as e:
+            # The APPSI solvers raise when they cannot load a solution, e.g. in an infeasible window.
+            logging.info("No solution in the window: %s" % e)
+            return None
+        finally:
+            if stored_gap is not None:
+                options.SOLVER.options["mip tolerances mipgap"] = stored_gap
+
+        if not self.has_solution(results):
+            return None
+        return value(model.obj), dict((t, model.pi[t].value) for t in model.periods), \
+            dict((v.name, v.value) for v in model.component_data_objects(Var))
+
+    def window_hit_rates(self):
+        """
+        Add to window_report the share of the windows of the last :py:meth:`window_search` that contain the PUN price
+        of the solution in each period, and whether the window of the best incumbent contains all of them.
+        """
+        if self.window_report is None or not self.windows:
+            return
+        prices = self.prices(0)
+
+        def hits(window):
+            return dict((t, low - options.EPS <= prices[t] <= high + options.EPS) for t, (low, high) in window.items())
+
+        report = self.window_report
+        report['hit_rate'] = dict((t, sum(hits(w)[t] for w, welfare in self.windows) / float(len(self.windows)))
+                                  for t in sorted(self.orders.periods))
+        report['best_hit'] = report['best'] is not None and all(hits(report['best']).values())
+        logging.info("Day %d: %d PUN price windows, %d solved, hit rate by period %s, best window %s." % (
+            self.day_id, report['windows'], report['solved'],
+            ', '.join('%s: %.2f' % (t, r) for t, r in report['hit_rate'].items()),
+            'hit' if report['best_hit'] else 'missed'))
+
+
+# State of a worker process of the pool of PUN_DAM.window_search, only set by _init_window_worker: the windows solved in
+# the process of the day use its own model.
+_window_worker = {}
+
+
+def _init_window_worker(dam, solver_name, solver_options):
+    """
+    Give a worker process of the window search the day, whose model it creates on its first window, and the solver
+    settings of the run.
+    """
+    if options.SOLVER_NAME != solver_name:
+        options.SOLVER_NAME = solver_name
+        options.SOLVER = SolverFactory(solver_name)
+    options.SOLVER.options.update(solver_options)
+    _window_worker['dam'] = dam
+
+
+def _solve_window(window):
+    dam = _window_worker['dam']
+    if dam.model is None:
+        dam.create_model()
+    return dam.solve_window(window)
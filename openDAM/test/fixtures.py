@@ -0,0 +1,68 @@
+"""
+Days shared by the test cases.
+"""
+from openDAM.model.ComplexOrder import ComplexOrder
+from openDAM.model.Line import Line
+from openDAM.model.PunOrder import PunOrder
+from openDAM.model.StepCurve import StepCurve
+from openDAM.model.Zone import Zone
+from openDAM.model.complex_order_model import COMPLEX_DAM
+from openDAM.model.pun_dam_model import PUN_DAM
+
+
+def complex_day(blocks=(), periods=(1, 2), linked=False, zones=(1, 2, 3), missing=(), complex_orders=()):
+    """
+    A day with three zones: zones 1 and 2 are linked by a line, zone 3 is isolated unless linked is True. Each zone
+    has a supply and a demand curve in each period, except the (period, zone) in missing. Other zones of zones have
+    no orders.
+    """
+    zones = dict((z, Zone(z, u'Z%d' % z, 0, 3000)) for z in zones)
+    curves = []
+    for t in periods:
+        for z in (1, 2, 3):
+            if (t, z) in missing:
+                continue
+            cost = 10.0 * z + t
+            curves.append(StepCurve([(0.0, cost), (50.0, cost), (50.0, cost + 20.0), (100.0, cost + 20.0)], t, z))
+            curves.append(StepCurve([(0.0, 80.0 - z), (-60.0, 80.0 - z), (-60.0, 5.0), (-90.0, 5.0)], t, z))
+    lines = [Line(1, 1, 2, dict((t, 20.0) for t in periods), dict((t, 10.0) for t in periods))]
+    if linked:
+        lines.append(Line(2, 2, 3, dict((t, 5.0) for t in periods), dict((t, 5.0) for t in periods)))
+    return COMPLEX_DAM(20180110, zones, curves, list(blocks), list(complex_orders), lines)
+
+
+def mic_order(complex_id, zone, price, fixed_term, periods=(1, 2)):
+    """
+    A supply complex order of 30 MW at price in each period, with a minimum income condition of fixed_term.
+    """
+    curves = dict((t, StepCurve([(0.0, price), (30.0, price)], t, zone)) for t in periods)
+    return ComplexOrder(complex_id, curves, FT=fixed_term, location=zone)
+
+
+def pun_day(price=40.0, pun_prices=(100.0, 50.0, 100.0 / 3)):
+    """
+    A day with two zones linked by a line, a supply curve in each zone and three PUN orders per period, of the prices
+    pun_prices in merit order.
+    """
+    zones = {1: Zone(1, u'NORD', 0, 3000), 2: Zone(2, u'SUD', 0, 3000)}
+    curves = []
+    for t in (1, 2):
+        curves.append(StepCurve([(0.0, 10.0), (50.0, 10.0), (50.0, 60.0), (100.0, 60.0)], t, 1))
+        curves.append(StepCurve([(0.0, price), (80.0, price)], t, 2))
+    pun_orders = [PunOrder(3 * t + i, 1 + i % 2, t, i + 1, 30.0 + 10.0 * t, pun_prices[i])
+                  for t in (1, 2) for i in range(3)]
+    lines = [Line(1, 1, 2, {1: 20.0, 2: 20.0}, {1: 10.0, 2: 10.0})]
+    return PUN_DAM(20180110, zones, curves, [], pun_orders, lines)
+
+
+def ring_day(n=6):
+    """
+    A day with n PUN zones on a ring, with the chords 2-5 and 3-6, a supply curve and a PUN order per zone. The PUN
+    orders of zones 1 and 4 have the same price, and these zones are only connected through middle zones.
+    """
+    zones = dict((z, Zone(z, u'Z%d' % z, 0, 3000)) for z in range(1, n + 1))
+    curves = [StepCurve([(0.0, 10.0 * z), (30.0, 10.0 * z)], 1, z) for z in zones]
+    pun_orders = [PunOrder(z, z, 1, z, 20.0, 55.0 if z in (1, 4) else 30.0 + z) for z in zones]
+    lines = [Line(z, z, z % n + 1, {1: 5.0}, {1: 5.0}) for z in zones]
+    lines += [Line(n + 1, 2, 5, {1: 5.0}, {1: 5.0}), Line(n + 2, 3, 6, {1: 5.0}, {1: 5.0})]
+    return PUN_DAM(1, zones, curves, [], pun_orders, lines)
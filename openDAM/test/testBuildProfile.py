@@ -0,0 +1,47 @@
+import unittest
+
+from pyomo.core.base import ConcreteModel, Constraint, ConstraintList, Var, Set
+
+from openDAM.model.BuildProfile import BuildProfile
+
+
+class BuildProfileCase(unittest.TestCase):
+
+    def test_blocks(self):
+        """
+        Each block counts the components, constraints and variables created since the previous block, including
+        those added to the components of earlier blocks.
+        """
+        model = ConcreteModel()
+        profile = BuildProfile(7, model)
+
+        profile.start('variables')
+        model.I = Set(initialize=[1, 2, 3])
+        model.x = Var(model.I)
+        model.y = Var()
+
+        profile.start('constraints')
+        model.c = Constraint(model.I, rule=lambda m, i: m.x[i] <= i)
+        model.c_list = ConstraintList()
+        model.c_list.add(model.y >= 0)
+        model.c_list.add(model.y <= 1)
+
+        profile.start('empty')
+
+        profile.start('grown')
+        model.c_list.add(model.y <= 2)
+        model.z = Var()
+        model.c_list.add(model.z >= 0)
+        profile.stop()
+
+        self.assertEqual([block[0] for block in profile.blocks], ['variables', 'constraints', 'empty', 'grown'])
+        self.assertEqual([block[3:] for block in profile.blocks], [(2, 0, 4), (2, 5, 0), (0, 0, 0), (1, 2, 1)])
+
+        lines = profile.lines('PUN')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith('7,PUN,constraints,'))
+        self.assertTrue(lines[1].endswith(',2,5,0\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from openDAM.dataio.create_dam_db_from_csv import create_tables, load_csv_chunks, set_offline_pragmas, \
+    restore_pragmas
+
+
+class CreateDamDBCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.conn = sqlite3.connect('%s/days.sqlite3' % self.path)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.path)
+
+    def write_csv(self, table, lines):
+        with open('%s/%s.csv' % (self.path, table), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def test_blank_integer(self):
+        """
+        Empty cells of integer columns are stored as NULL, the others as integers.
+        """
+        self.write_csv('COMPLEXORDERS', [
+            'DAY_ID,COMPLEX_ID,ZONE_ID,TYPE,FIXED_TERM,VARIABLE_TERM,RAMP_UP,RAMP_DOWN,SCHEDULED_STOP_PERIODS',
+            '1,1,2,SUPPLY,100.0,10.0,,5.0,',
+            '1,2,2,SUPPLY,50.0,,1.0,5.0,3'])
+        create_tables(self.conn, ['COMPLEXORDERS'])
+        stats = load_csv_chunks(self.conn, self.path, ['COMPLEXORDERS'], jobs=1, chunksize=1)
+        self.assertEqual(stats['COMPLEXORDERS'][0], 2)
+        rows = self.conn.execute('SELECT COMPLEX_ID, VARIABLE_TERM, RAMP_UP, SCHEDULED_STOP_PERIODS, '
+                                 'typeof(SCHEDULED_STOP_PERIODS) FROM COMPLEXORDERS ORDER BY COMPLEX_ID').fetchall()
+        self.assertEqual(rows, [(1, 10.0, None, None, 'null'), (2, None, 1.0, 3, 'integer')])
+
+    def test_insert_error(self):
+        """
+        When an insert fails, the error is raised and the reader threads stop instead of waiting for room in the
+        queue of chunks.
+        """
+        self.write_csv('DAYS', ['DAY_ID,NPERIODS'] + ['%d,24' % d for d in range(50)])
+        threads = threading.active_count()
+        with self.assertRaises(sqlite3.OperationalError):
+            load_csv_chunks(self.conn, self.path, ['DAYS'], jobs=1, chunksize=1)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_offline_build(self):
+        """
+        The database built offline is back in the default rollback journal mode, without side files.
+        """
+        self.write_csv('DAYS', ['DAY_ID,NPERIODS', '1,24'])
+        set_offline_pragmas(self.conn)
+        create_tables(self.conn, ['DAYS'])
+        load_csv_chunks(self.conn, self.path, ['DAYS'])
+        self.conn.commit()
+        restore_pragmas(self.conn)
+        self.conn.close()
+
+        self.conn = sqlite3.connect('%s/days.sqlite3' % self.path)
+        self.assertEqual(self.conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        self.assertEqual(self.conn.execute('SELECT * FROM DAYS').fetchall(), [(1, 24)])
+        self.assertFalse(os.path.exists('%s/days.sqlite3-wal' % self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
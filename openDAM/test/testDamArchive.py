@@ -0,0 +1,49 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from openDAM.dataio.create_dam_db_from_csv import create_tables, insert_in_table
+from openDAM.dataio.dam_db_loader import Loader
+from openDAM.dataio.dam_archive import convert, ArchiveLoader
+
+
+class DamArchiveCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        conn = sqlite3.connect('%s/days.sqlite3' % self.path)
+        create_tables(conn)
+        for day in [3, 1]:
+            insert_in_table(conn, 'DAYS', [(day, 2)])
+            insert_in_table(conn, 'ZONES', [(day, 2, u'SUD', 0, 3000), (day, 1, u'NORD', 0, 3000)])
+            insert_in_table(conn, 'CURVES', [(day, 1, 1, 1, u'SUPPLY'), (day, 2, 1, 1, u'DEMAND')])
+            insert_in_table(conn, 'CURVE_DATA', [(day, 1, 2, 10.0, 5.0), (day, 1, 1, 0, 5.0),
+                                                 (day, 2, 1, 0, 50.0 + day), (day, 2, 2, 8.0, 50.0 + day)])
+        insert_in_table(conn, 'COMPLEXORDERS', [(3, 1, 1, u'SUPPLY', 100.0, 10.0, None, 5.0, 0)])
+        insert_in_table(conn, 'COMPLEXORDER_DATA', [(3, 1, p, k, q, 20.0) for p in [2, 1]
+                                                    for k, q in [(2, 4.0), (1, 0)]])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_read_day_rows(self):
+        """
+        The rows sliced in the archive are those queried in the database, NULL and empty tables included.
+        """
+        counts = convert('%s/days.sqlite3' % self.path, '%s/archive' % self.path, chunksize=3)
+        self.assertEqual(counts['CURVE_DATA'], 8)
+        loader = Loader(self.path, 'days.sqlite3')
+        archive = ArchiveLoader('%s/archive' % self.path)
+        self.assertEqual(archive.get_all_days(), [1, 3])
+        for day in [1, 3]:
+            self.assertEqual(archive.read_day_rows(day), loader.read_day_rows(day))
+        self.assertEqual(archive.read_day_rows(3)['COMPLEXORDERS'][0][5], None)
+        self.assertEqual(archive.read_day_rows(2)['CURVES'], [])
+        self.assertEqual(len(archive.read_day(3).complexOrders), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from openDAM.dataio.create_dam_db_from_csv import create_tables, insert_in_table
+from openDAM.dataio.dam_db_loader import Loader
+from openDAM.dataio.dam_results_db import SQLiteResultsWriter
+from openDAM.dataio.day_snapshot import SnapshotCache, rows_to_arrays, arrays_to_rows, content_hash
+
+
+class DaySnapshotCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.db_file = '%s/days.sqlite3' % self.path
+        conn = sqlite3.connect(self.db_file)
+        conn.execute('CREATE TABLE PUNORDERS (DAY_ID INTEGER, PUN_ID INTEGER, ZONE TEXT, PRICE NUMBER, RAMP NUMBER)')
+        conn.executemany('INSERT INTO PUNORDERS VALUES (?, ?, ?, ?, ?)',
+                         [(1, 1, u'NORD', 10.5, None), (1, 2, u'SUD', 20.0, 3.0), (2, 3, u'NORD', 30.0, 1.0)])
+        conn.commit()
+        conn.close()
+        self.queries = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self, day):
+        self.queries += 1
+        conn = sqlite3.connect(self.db_file)
+        rows = OrderedDict([('PUNORDERS', conn.execute('SELECT PUN_ID, ZONE, PRICE, RAMP FROM PUNORDERS '
+                                                       'WHERE DAY_ID = ? ORDER BY PUN_ID', (day,)).fetchall()),
+                            ('EMPTY', [])])
+        conn.close()
+        return rows
+
+    def test_round_trip(self):
+        """
+        Rows are stored by column and read back with the same values, NULL included.
+        """
+        rows = self.read(1)
+        arrays = rows_to_arrays(rows)
+        self.assertEqual(arrays['PUNORDERS.1'].tolist(), [u'NORD', u'SUD'])
+        self.assertEqual(arrays['PUNORDERS.3.null'].tolist(), [True, False])
+        self.assertEqual(arrays_to_rows(arrays, list(rows.keys())), rows)
+        self.assertNotEqual(content_hash(arrays), content_hash(rows_to_arrays(self.read(2))))
+
+    def test_cache(self):
+        """
+        A snapshot is used until the database is modified, and rebuilt if the rows of the day changed.
+        """
+        cache = SnapshotCache('%s/snapshots' % self.path, self.db_file)
+        expected = self.read(1)
+        self.queries = 0
+        self.assertEqual(cache.rows(1, self.read), expected)
+        self.assertEqual(cache.rows(1, self.read), expected)
+        self.assertEqual((cache.hits, cache.misses, self.queries), (1, 1, 1))
+
+        conn = sqlite3.connect(self.db_file)
+        conn.execute('UPDATE PUNORDERS SET PRICE = 40.0 WHERE PUN_ID = 1')
+        conn.commit()
+        conn.close()
+        os.utime(self.db_file, (0, 1))
+        self.assertEqual(cache.rows(1, self.read)[u'PUNORDERS'][0], (1, u'NORD', 40.0, None))
+        self.assertEqual(cache.rows(1, self.read)[u'PUNORDERS'][0], (1, u'NORD', 40.0, None))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertFalse([f for f in os.listdir(cache.folder) if f.endswith('.tmp')])
+
+    def test_results_keep_snapshot(self):
+        """
+        Writing results or other days in the database keeps the snapshot of a day, modifying its rows does not.
+        """
+        db_file = '%s/dam.sqlite3' % self.path
+        conn = sqlite3.connect(db_file)
+        create_tables(conn)
+        for day in [1, 2]:
+            insert_in_table(conn, 'DAYS', [(day, 1)])
+            insert_in_table(conn, 'ZONES', [(day, 1, u'NORD', 0, 3000)])
+            insert_in_table(conn, 'CURVES', [(day, 1, 1, 1, u'SUPPLY'), (day, 2, 1, 1, u'DEMAND')])
+            insert_in_table(conn, 'CURVE_DATA', [(day, 1, 1, 0, 5.0), (day, 1, 2, 10.0, 5.0),
+                                                 (day, 2, 1, 0, 50.0), (day, 2, 2, 8.0, 50.0)])
+        conn.commit()
+        conn.close()
+        snapshots = '%s/snapshots' % self.path
+
+        def read(day):
+            loader = Loader(self.path, 'dam.sqlite3', snapshots=snapshots)
+            rows = loader.snapshots.rows(day, loader.read_day_rows, loader.day_signature)
+            loader.conn.close()
+            return rows, (loader.snapshots.hits, loader.snapshots.misses)
+
+        expected = read(1)[0]
+        with SQLiteResultsWriter(db_file, run=u'run') as writer:
+            writer.write({'RESULTS_DAYS': [(1, u'COMPLEX', 10.0, 0.1, 0, 0, 0.0, u'optimal')],
+                          'RESULTS_PRICES': [(1, 1, u'NORD', 1, 5.0, 8.0, 8.0)]})
+        conn = sqlite3.connect(db_file)
+        conn.execute('UPDATE CURVE_DATA SET PRICE = 40.0 WHERE DAY_ID = 2')
+        conn.commit()
+        conn.close()
+        os.utime(db_file, (0, 1))
+        self.assertEqual(read(1), (expected, (1, 0)))
+        self.assertEqual(read(1), (expected, (1, 0)))
+
+        conn = sqlite3.connect(db_file)
+        conn.execute('UPDATE CURVE_DATA SET PRICE = 40.0 WHERE DAY_ID = 1 AND CURVE_ID = 2')
+        conn.commit()
+        conn.close()
+        os.utime(db_file, (0, 2))
+        rows, counts = read(1)
+        self.assertEqual(counts, (0, 1))
+        self.assertEqual(rows['CURVE_DATA'][2], (2, 0, 40.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
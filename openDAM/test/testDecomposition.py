@@ -0,0 +1,126 @@
+import multiprocessing
+import unittest
+
+import openDAM.conf.options as options
+from openDAM.dataio.dam_results_csv import results_lines
+from openDAM.model import decomposition
+from openDAM.model.BlockBid import BlockBid
+from openDAM.test.fixtures import complex_day, pun_day
+
+
+def solve(dam):
+    dam.create_model()
+    dam.solve()
+
+
+class DecompositionCase(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = options.BACKEND
+        options.BACKEND = 'matrix'
+
+    def tearDown(self):
+        options.BACKEND = self.backend
+
+    def test_pieces(self):
+        """
+        Lines couple zones, block orders couple periods, and the PUN price couples all the zones of a period.
+        """
+        self.assertEqual(decomposition.pieces(complex_day()), [
+            (frozenset([1]), frozenset([1, 2])), (frozenset([1]), frozenset([3])),
+            (frozenset([2]), frozenset([1, 2])), (frozenset([2]), frozenset([3]))])
+
+        block = BlockBid(1, {1: 10.0, 2: 10.0}, 30.0, 3)
+        self.assertEqual(decomposition.pieces(complex_day([block])), [
+            (frozenset([1, 2]), frozenset([1, 2])), (frozenset([1, 2]), frozenset([3]))])
+
+        self.assertEqual(decomposition.pieces(pun_day()), [
+            (frozenset([1]), frozenset([1, 2])), (frozenset([2]), frozenset([1, 2]))])
+
+    def test_sub_market(self):
+        """
+        Sub-markets hold copies of the orders of the day, mapped to their ids in the order book of the day.
+        """
+        dam = complex_day()
+        sub, ids = decomposition.sub_market(dam, frozenset([2]), frozenset([3]))
+        self.assertEqual(len(sub.orders.bids), 4)
+        self.assertEqual(sub.connections, [])
+        for i, bid in zip(ids.tolist(), sub.orders.bids):
+            original = dam.orders.bids[i]
+            self.assertIsNot(bid, original)
+            self.assertEqual((bid.period, bid.location, bid.price, bid.volume),
+                             (2, 3, original.price, original.volume))
+
+        sub, ids = decomposition.sub_market(dam, frozenset([1]), frozenset([1, 2]))
+        self.assertEqual([(l.capacity_up, l.capacity_down) for l in sub.connections], [({1: 20.0}, {1: 10.0})])
+
+    def test_clear(self):
+        """
+        The decomposed day has the same solution as the whole day.
+        """
+        whole = complex_day()
+        solve(whole)
+
+        dam = complex_day()
+        self.assertEqual(decomposition.clear(dam, solve), 4)
+        self.assertAlmostEqual(dam.welfare, whole.welfare, 4)
+        for z in (1, 2, 3):
+            for t in (1, 2):
+                self.assertAlmostEqual(dam.prices(z)[t], whole.prices(z)[t], 4)
+                self.assertAlmostEqual(dam.volumes('SUPPLY', z)[t], whole.volumes('SUPPLY', z)[t], 4)
+                self.assertAlmostEqual(dam.volumes('DEMAND', z)[t], whole.volumes('DEMAND', z)[t], 4)
+        for bid, other in zip(dam.orders.bids, whole.orders.bids):
+            self.assertAlmostEqual(bid.acceptance, other.acceptance, 4)
+        self.assertEqual(len(dam.connections[0].flow_up), 2)
+        for a, b in zip(dam.connections[0].flow_up + dam.connections[0].flow_down,
+                        whole.connections[0].flow_up + whole.connections[0].flow_down):
+            self.assertAlmostEqual(a, b, 4)
+
+    def test_pool(self):
+        """
+        Sub-markets solved in worker processes give the same solution.
+        """
+        whole = complex_day()
+        solve(whole)
+
+        dam = complex_day()
+        pool = multiprocessing.Pool(2)
+        try:
+            self.assertEqual(decomposition.clear(dam, solve, pool), 4)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertAlmostEqual(dam.welfare, whole.welfare, 4)
+        for t in (1, 2):
+            self.assertAlmostEqual(dam.prices(3)[t], whole.prices(3)[t], 4)
+
+    def test_orderless_zones(self):
+        """
+        The zones without orders in some periods, or in the whole day, have a zero price and zero volumes in them.
+        """
+        dam = complex_day(zones=(1, 2, 3, 4), missing=[(2, 3)])
+        self.assertEqual(decomposition.clear(dam, solve), 3)
+        for z in (1, 2, 3, 4):
+            for side in ('SUPPLY', 'DEMAND'):
+                self.assertEqual(sorted(dam.volumes(side, z)), [1, 2])
+        self.assertEqual(dam.prices(4), {1: 0.0, 2: 0.0})
+        self.assertEqual(dam.prices(3)[2], 0.0)
+        self.assertEqual(dam.volumes('SUPPLY', 3)[2], 0.0)
+        self.assertNotEqual(dam.prices(3)[1], 0.0)
+
+        lines = results_lines(dam)['prices']
+        self.assertEqual(len(lines), 4 * 2)
+        self.assertIn('20180110,4,Z4,2,0.000000,0.000,0.000\n', lines)
+
+    def test_single_piece(self):
+        """
+        A day that cannot be decomposed is solved as a whole.
+        """
+        dam = complex_day(periods=(1,), linked=True)
+        self.assertEqual(len(decomposition.pieces(dam)), 1)
+        self.assertEqual(decomposition.clear(dam, solve), 1)
+        self.assertIsNotNone(dam.model)
+
+
+if __name__ == '__main__':
+    unittest.main()
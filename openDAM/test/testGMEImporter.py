@@ -0,0 +1,152 @@
+import io
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import zipfile
+
+from lxml import etree
+
+from openDAM.dataio.create_dam_db_from_csv import create_tables
+from openDAM.dataio.GME_xml_importer import iter_records, record_fields, import_dates, GMEImporter, OrdersList, Order
+
+XML = b'''<?xml version="1.0" standalone="yes"?>
+<NewDataSet>
+  <Prezzi>
+    <Data>20180110</Data>
+    <Ora>1</Ora>
+    <PUN>50,1</PUN>
+  </Prezzi>
+  <Prezzi>
+    <Data>20180110</Data>
+    <Ora>2</Ora>
+    <PUN>48,7</PUN>
+  </Prezzi>
+</NewDataSet>
+'''
+
+
+def xml_file(tag, records):
+    """
+    :return: the content of a raw data file with one record element per dict of fields.
+    """
+    return (u'<?xml version="1.0" standalone="yes"?>\n<NewDataSet>\n%s</NewDataSet>\n' % u''.join(
+        u'  <%s>%s</%s>\n' % (tag, u''.join(u'<%s>%s</%s>' % (k, v, k) for k, v in sorted(r.items())), tag)
+        for r in records)).encode('utf-8')
+
+
+def write_raw_files(path, date):
+    """
+    Write the raw data files of a date with two periods, the zones NORD and SUD and one line between them.
+    """
+    offers = []
+    for period in [1, 2]:
+        for zone, purpose, price, volume, unit, merit in [
+                (u'NORD', u'OFF', 10.0, 50.0, u'UP_A', 1), (u'SUD', u'OFF', 30.0 + period, 40.0, u'UP_B', 2),
+                (u'NORD', u'BID', 60.0, 20.0, u'UP_C', 3), (u'SUD', u'BID', 0.0, 15.0, u'PUN_D', 4),
+                (u'NORD', u'BID', 70.0, 10.0, u'PUN_E', 5)]:
+            offers.append(dict(STATUS_CD=u'ACC', PURPOSE_CD=purpose, INTERVAL_NO=period, ENERGY_PRICE_NO=price,
+                               ADJ_QUANTITY_NO=volume, ZONE_CD=zone, MERIT_ORDER_NO=merit, UNIT_REFERENCE_NO=unit,
+                               AWARDED_QUANTITY_NO=volume / 2))
+    with zipfile.ZipFile(u'%s/%sMGPOffertePubbliche.zip' % (path, date), 'w') as zip_file:
+        zip_file.writestr(u'%sMGPOffertePubbliche.xml' % date, xml_file(u'OfferteOperatori', offers))
+    files = dict(
+        LimitiTransito=[dict(Ora=p, Da=a, A=b, Limite=u'%d,5' % l) for p in [1, 2]
+                        for a, b, l in [(u'NORD', u'SUD', 100), (u'SUD', u'NORD', 200)]],
+        Quantita=[dict(dict((u'%s_%s' % (z, s), u'1,0') for z in [u'XFRA', u'XAUS', u'BSP']
+                            for s in [u'ACQUISTI', u'VENDITE']), Ora=p) for p in [1, 2]],
+        Prezzi=[dict(dict((z, u'%d,0' % (40 + p)) for z in [u'BSP', u'NORD', u'SUD', u'XAUS', u'XFRA', u'PUN', u'NAT']),
+                     Data=date, Ora=p) for p in [1, 2]])
+    for tag, records in files.items():
+        with open(u'%s/%sMGP%s.xml' % (path, date, tag), 'wb') as f:
+            f.write(xml_file(tag, records))
+
+
+class GMEImporterCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.dates = ['20180110', '20180111', '20180112']
+        for date in self.dates:
+            write_raw_files(self.path, date)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_iter_records(self):
+        """
+        Streamed records have the same fields as those of the parsed tree.
+        """
+        tree = etree.parse(io.BytesIO(XML))
+        expected = [record_fields(r) for r in tree.xpath(u'/NewDataSet/Prezzi')]
+        self.assertEqual(expected[1], {'Data': '20180110', 'Ora': '2', 'PUN': '48,7'})
+        self.assertEqual(list(iter_records(io.BytesIO(XML), u'Prezzi')), expected)
+
+    def test_iter_records_fields(self):
+        """
+        Only the selected fields are extracted.
+        """
+        records = list(iter_records(io.BytesIO(XML), u'Prezzi', fields=(u'Ora', u'PUN')))
+        self.assertEqual(records, [{'Ora': '1', 'PUN': '50,1'}, {'Ora': '2', 'PUN': '48,7'}])
+
+    def test_curves(self):
+        """
+        Orders are stored by column, and give one step curve per zone and period.
+        """
+        orders = OrdersList()
+        for zone, period, price, volume in [(u'NORD', 1, 10.0, 5.0), (u'SUD', 1, 20.0, 1.0), (u'NORD', 1, 30.0, 2.0),
+                                            (u'NORD', 2, 15.0, 3.0)]:
+            o = Order()
+            o.zone, o.period, o.price, o.volume = zone, period, price, volume
+            orders.add(o)
+        self.assertEqual(len(orders), 4)
+        self.assertEqual(orders.columns()['id'].tolist(), [1, 2, 3, 4])
+        self.assertEqual(orders.zones, set([u'NORD', u'SUD']))
+
+        importer = GMEImporter.__new__(GMEImporter)
+        importer.date = '20180110'
+        importer.zone_id = {u'NORD': 1, u'SUD': 2}
+        curves, curve_data = importer.curves(orders, u'DEMAND', 4, False)
+        self.assertEqual(curves, [[20180110, 5, 1, 1, u'DEMAND'], [20180110, 6, 1, 2, u'DEMAND'],
+                                  [20180110, 7, 2, 1, u'DEMAND']])
+        self.assertEqual(curve_data[:4], [[20180110, 5, 1, 0, 30.0], [20180110, 5, 2, 2.0, 30.0],
+                                          [20180110, 5, 3, 2.0, 10.0], [20180110, 5, 4, 7.0, 10.0]])
+
+        curves, curve_data = importer.curves(orders, u'SUPPLY', 0, True)
+        self.assertEqual(curves[1], [2018011002, 2, 1, 1, u'SUPPLY'])
+        self.assertEqual(curve_data[:2], [[2018011001, 1, 1, 0, 10.0], [2018011001, 1, 2, 5.0, 10.0]])
+
+    def test_tables(self):
+        """
+        The rows of a date give the lines, the PUN orders of the PUN zones and the curves of each zone and period.
+        """
+        importer = GMEImporter(self.path, '20180110', streaming=True)
+        nord, sud = importer.zone_id[u'NORD'], importer.zone_id[u'SUD']
+        tables = importer.tables()
+        self.assertEqual(tables[u'DAYS'], [[20180110, 2]])
+        self.assertEqual(tables[u'LINES'], [[20180110, 1, nord, sud]])
+        self.assertEqual(tables[u'LINE_DATA'], [[20180110, 1, 1, 200.5, 100.5], [20180110, 1, 2, 200.5, 100.5]])
+        self.assertEqual([row[2:] for row in tables[u'PUNORDERS']],
+                         [(nord, 1, 5, 10.0, 70.0), (nord, 2, 5, 10.0, 70.0), (sud, 1, 4, 15.0, 3000.0),
+                          (sud, 2, 4, 15.0, 3000.0)])
+        self.assertEqual(len(tables[u'CURVES']), 2 * (4 + 5))  # demand of NORD and of the coupling zones, supply
+        self.assertEqual(tables[u'AWARDED_PUN'][u'AWARDED_QUANTITY'].tolist(), [7.5, 5.0, 7.5, 5.0])
+        self.assertEqual(tables[u'REAL_PRICES'][u'PUN'].tolist(), [41.0, 42.0])
+
+    def test_import_dates_jobs(self):
+        """
+        The database does not depend on the number of jobs reading the dates.
+        """
+        dumps = []
+        for jobs in [1, 2]:
+            conn = sqlite3.connect(u'%s/jobs%d.sqlite3' % (self.path, jobs))
+            create_tables(conn)
+            import_dates(conn, self.path, self.dates, streaming=True, jobs=jobs, batch=2)
+            dumps.append(list(conn.iterdump()))
+            conn.close()
+        self.assertEqual(dumps[0], dumps[1])
+        self.assertEqual(len([line for line in dumps[0] if line.startswith(u'INSERT INTO "DAYS"')]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+import openDAM.conf.options as options
+from openDAM.dataio.create_dam_db_from_csv import create_tables
+from openDAM.dataio.dam_db_loader import Loader
+from openDAM.dataio.generate_market import generate, generate_day, network
+from openDAM.model.complex_order_model import COMPLEX_DAM
+from openDAM.model.pun_dam_model import PUN_DAM
+
+
+class GenerateMarketCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def create_db(self, name, days, **size):
+        conn = sqlite3.connect('%s/%s' % (self.path, name))
+        create_tables(conn)
+        counts = generate(conn, days, seed=7, **size)
+        conn.close()
+        return counts
+
+    def test_complex_day(self):
+        """
+        The generated days are read by the loader, with the requested number of curves, steps and orders.
+        """
+        counts = self.create_db('complex.sqlite3', 2, zones=3, periods=4, steps=5, blocks=2, complex_orders=2)
+        self.assertEqual(counts['CURVES'], 2 * 3 * 4 * 2)
+        self.assertEqual(counts['CURVE_DATA'], 2 * 3 * 4 * 2 * 10)
+        self.assertEqual(counts['LINES'], 2 * 2)
+
+        loader = Loader(self.path, 'complex.sqlite3')
+        self.assertEqual(loader.get_all_days(), [1, 2])
+        dam = loader.read_day(2)
+        self.assertIsInstance(dam, COMPLEX_DAM)
+        self.assertEqual(len(dam.complexOrders), 6)
+        self.assertEqual(len(dam.block_orders), 6)
+        self.assertEqual(len(dam.orders.ids('SB')), 3 * 4 * 2 * 5 + 6 * 4 * 4)
+        self.assertEqual(sorted(dam.orders.periods), [1, 2, 3, 4])
+
+    def test_solve_complex_day(self):
+        """
+        A complex day with the default number of block orders is cleared.
+        """
+        self.create_db('blocks.sqlite3', 1, zones=2, periods=4, steps=5, complex_orders=1)
+        dam = Loader(self.path, 'blocks.sqlite3').read_day(1)
+        self.assertEqual(len(dam.block_orders), 2 * 10)
+        backend = options.BACKEND
+        options.BACKEND = 'matrix'
+        try:
+            dam.create_model()
+            dam.solve()
+        finally:
+            options.BACKEND = backend
+        acceptances = [round(dam.orders.bids[dam.block_orders_ids[block]].acceptance, 5)
+                       for block in dam.block_orders]
+        self.assertEqual(set(acceptances), set([0.0, 1.0]))
+
+    def test_pun_day(self):
+        """
+        PUN orders are in merit order of decreasing price in each period.
+        """
+        self.create_db('pun.sqlite3', 1, zones=2, periods=3, steps=2, blocks=0, pun_orders=5)
+        dam = Loader(self.path, 'pun.sqlite3').read_day(1)
+        self.assertIsInstance(dam, PUN_DAM)
+        for t, orders in dam.pun_orders_by_merit_order.items():
+            self.assertEqual([o.merit_order for o in orders], [1, 2, 3, 4, 5])
+            prices = [o.price for o in orders]
+            self.assertEqual(prices, sorted(prices, reverse=True))
+
+    def test_seed(self):
+        """
+        A day only depends on the seed and on its id.
+        """
+        def day(seed, day_id):
+            return generate_day(day_id, np.random.RandomState([seed, day_id]), zones=2, periods=2, steps=3)
+
+        first, second, other = day(1, 5), day(1, 5), day(2, 5)
+        for table in first:
+            for a, b in zip(first[table], second[table]):
+                np.testing.assert_array_equal(a, b)
+        self.assertFalse(np.array_equal(first['CURVE_DATA'][4], other['CURVE_DATA'][4]))
+
+    def test_network(self):
+        self.assertEqual(len(network(5, 'chain')[0]), 4)
+        self.assertEqual(len(network(5, 'ring')[0]), 5)
+        self.assertEqual(network(5, 'star')[0].tolist(), [1, 1, 1, 1])
+        from_ids, to_ids = network(5, 'mesh', 3, np.random.RandomState(0))
+        self.assertEqual(len(set(zip(from_ids.tolist(), to_ids.tolist()))), 7)
+        with self.assertRaises(ValueError):
+            network(5, 'torus')
+
+    def test_complex_and_pun(self):
+        with self.assertRaises(ValueError):
+            generate_day(1, np.random.RandomState(0), complex_orders=1, pun_orders=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
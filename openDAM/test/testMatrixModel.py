@@ -0,0 +1,244 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pyomo.core.base import Constraint, Var, Objective
+from pyomo.repn import generate_standard_repn
+
+import openDAM.conf.options as options
+from openDAM.model.BlockBid import BlockBid
+from openDAM.model.MatrixModel import MatrixModel, MAXIMIZE, MINIMIZE
+from openDAM.test.fixtures import complex_day
+from openDAM.test.testComplexOrders import InitTestCase
+
+
+def _number(x):
+    return float('%.9g' % x)
+
+
+def _canonical_row(terms, lo, hi):
+    """
+    Row as a hashable tuple, independent of the order of the terms and of the sign of the row.
+
+    :param terms: dict variable key -> coefficient.
+    :param lo: lower bound, -inf if none.
+    :param hi: upper bound, inf if none.
+    """
+    terms = sorted((k, _number(c)) for k, c in terms.items() if c != 0)
+    if terms and terms[0][1] < 0:
+        terms = [(k, -c) for k, c in terms]
+        lo, hi = -hi, -lo
+    return tuple(terms), _number(lo), _number(hi)
+
+
+def pyomo_rows(model):
+    rows = []
+    for c in model.component_data_objects(Constraint, active=True):
+        repn = generate_standard_repn(c.body)
+        terms = {}
+        for v, coef in zip(repn.linear_vars, repn.linear_coefs):
+            key = (v.parent_component().name, v.index())
+            terms[key] = terms.get(key, 0.0) + coef
+        lo = -np.inf if c.lower is None else c.lower() - repn.constant
+        hi = np.inf if c.upper is None else c.upper() - repn.constant
+        rows.append(_canonical_row(terms, lo, hi))
+    return sorted(rows)
+
+
+def pyomo_columns(model):
+    columns = {}
+    for v in model.component_data_objects(Var):
+        columns[(v.parent_component().name, v.index())] = (
+            -np.inf if v.lb is None else v.lb, np.inf if v.ub is None else v.ub, v.is_integer() or v.is_binary())
+    return columns
+
+
+def pyomo_objective(model):
+    obj = next(model.component_data_objects(Objective, active=True))
+    repn = generate_standard_repn(obj.expr)
+    terms = {}
+    for v, coef in zip(repn.linear_vars, repn.linear_coefs):
+        key = (v.parent_component().name, v.index())
+        terms[key] = terms.get(key, 0.0) + coef
+    return obj.sense == 1, dict((k, _number(c)) for k, c in terms.items() if c != 0)
+
+
+def matrix_keys(model):
+    keys = []
+    for var in model._vars:
+        keys.extend((var.name, k) for k in var.keys)
+    return keys
+
+
+def matrix_rows(model):
+    keys = matrix_keys(model)
+    A = model.matrix()
+    lo, hi = model.row_bounds()
+    rows = []
+    for r in range(A.shape[0]):
+        start, end = A.indptr[r], A.indptr[r + 1]
+        terms = dict((keys[c], v) for c, v in zip(A.indices[start:end], A.data[start:end]))
+        rows.append(_canonical_row(terms, lo[r], hi[r]))
+    return sorted(rows)
+
+
+def matrix_columns(model):
+    return dict((k, (model.lb[i], model.ub[i], model.integer[i])) for i, k in enumerate(matrix_keys(model)))
+
+
+def matrix_objective(model):
+    keys = matrix_keys(model)
+    return model.sense == MINIMIZE, dict((keys[i], _number(c)) for i, c in enumerate(model.cost) if c != 0)
+
+
+class MatrixModelCase(unittest.TestCase):
+
+    def setUp(self):
+        model = MatrixModel(name='test', sense=MAXIMIZE)
+        self.x = model.add_var('x', [1, 2], 0.0, [4.0, 3.0])
+        self.y = model.add_var('y', [(1, 'a')], 0.0, 1.0, integer=True)
+        c = model.add_constraints('c')
+        c.add([self.x.col(1), self.x.col(2), self.x.col(1)], [0.5, 1.0, 0.5], hi=5.0)
+        c.add([self.x.col(2), self.y.col((1, 'a'))], [1.0, -10.0], lo=-np.inf, hi=0.0)
+        model.set_objective([self.x.col(1), self.x.col(2), self.y.col((1, 'a'))], [1.0, 2.0, -1.0])
+        self.model = model
+
+    def test_matrix(self):
+        """
+        Coefficients of a column in a row are summed.
+        """
+        A = self.model.matrix().toarray()
+        np.testing.assert_array_equal(A, [[1.0, 1.0, 0.0], [0.0, 1.0, -10.0]])
+        lo, hi = self.model.row_bounds()
+        np.testing.assert_array_equal(hi, [5.0, 0.0])
+        self.assertEqual(self.model.col_names(), ['x(1)', 'x(2)', 'y(1_a)'])
+
+    def test_add_var_twice(self):
+        with self.assertRaises(ValueError):
+            self.model.add_var('x', [3])
+
+    def test_write(self):
+        path = os.path.join(tempfile.mkdtemp(), 'model.lp')
+        self.model.write(path)
+        with open(path) as f:
+            lp = f.read()
+        self.assertTrue(lp.startswith('\\'))
+        for section in ('maximize', 'subject to', 'bounds', 'generals', 'end'):
+            self.assertIn(section, lp.lower())
+
+    def test_solve(self):
+        """
+        Optimum is x = (2, 3) with y = 1, and with y = 0 when y is fixed.
+        """
+        self.assertTrue(self.model.solve())
+        self.assertAlmostEqual(self.x[1].value, 2.0, 6)
+        self.assertAlmostEqual(self.x[2].value, 3.0, 6)
+        self.assertAlmostEqual(self.y[(1, 'a')].value, 1.0, 6)
+        self.assertAlmostEqual(self.model.obj, 7.0, 6)
+
+        y = self.y[(1, 'a')]
+        y.fixed = True
+        y.value = 0
+        self.assertTrue(self.model.solve())
+        self.assertAlmostEqual(self.x[2].value, 0.0, 6)
+        self.assertAlmostEqual(self.model.obj, 4.0, 6)
+
+
+class BlockMatrixModelCase(unittest.TestCase):
+    """
+    Block orders in the matrix model of the complex orders problem.
+    """
+
+    def setUp(self):
+        self.backend = options.BACKEND
+
+    def tearDown(self):
+        options.BACKEND = self.backend
+
+    @staticmethod
+    def day():
+        return complex_day([BlockBid(1, {1: 10.0, 2: 10.0}, 30.0, 3), BlockBid(2, {1: -10.0, 2: -10.0}, 70.0, 1),
+                            BlockBid(3, {1: 5.0, 2: 5.0}, 2000.0, 3)])
+
+    def test_same_model(self):
+        """
+        The matrix model has the same rows, columns and objective as the Pyomo model.
+        """
+        options.BACKEND = 'pyomo'
+        dam = self.day()
+        dam.create_model()
+        pyomo_model = dam.model
+
+        options.BACKEND = 'matrix'
+        dam = self.day()
+        dam.create_model()
+        self.assertEqual(matrix_columns(dam.model), pyomo_columns(pyomo_model))
+        self.assertEqual(matrix_objective(dam.model), pyomo_objective(pyomo_model))
+        self.assertEqual(matrix_rows(dam.model), pyomo_rows(pyomo_model))
+
+    def test_solve(self):
+        """
+        The blocks in the money are accepted and their volumes are matched in each of their periods.
+        """
+        options.BACKEND = 'matrix'
+        dam = self.day()
+        dam.create_model()
+        dam.solve()
+        blocks = [bid for bid in dam.orders.bids if bid.type == 'BB']
+        self.assertEqual([round(bid.acceptance, 5) for bid in blocks], [1.0, 1.0, 0.0])
+        for t in (1, 2):
+            for zone, side, volume in [(3, 'SUPPLY', 10.0), (1, 'DEMAND', -10.0)]:
+                bids = sum(bid.volume * bid.acceptance for bid in dam.orders.bids if bid.type == 'SB'
+                           and (bid.location, bid.period) == (zone, t) and (bid.volume > 0) == (side == 'SUPPLY'))
+                self.assertAlmostEqual(dam.volumes(side, zone)[t], bids + volume, 4)
+
+
+class ComplexMatrixModelCase(InitTestCase):
+    """
+    The matrix model of the complex orders problem has the same rows, columns and objective as the Pyomo model.
+    """
+
+    def tearDown(self):
+        options.BACKEND = 'pyomo'
+
+    def compare(self, day_id):
+        options.BACKEND = 'pyomo'
+        dam = self.loader.read_day(day_id)
+        dam.create_model()
+        pyomo_model = dam.model
+
+        options.BACKEND = 'matrix'
+        dam = self.loader.read_day(day_id)
+        dam.create_model()
+        matrix_model = dam.model
+        self.assertIsInstance(matrix_model, MatrixModel)
+
+        self.assertEqual(matrix_columns(matrix_model), pyomo_columns(pyomo_model))
+        self.assertEqual(matrix_objective(matrix_model), pyomo_objective(pyomo_model))
+        self.assertEqual(matrix_rows(matrix_model), pyomo_rows(pyomo_model))
+
+    def test_1_same_model(self):
+        self.compare(1)
+
+    def test_2_same_model(self):
+        self.compare(2)
+
+    def test_1_solve(self):
+        """
+        Same acceptance of the complex orders as in testComplexOrders.test_1_unmodified.
+        """
+        options.BACKEND = 'matrix'
+        dam = self.loader.read_day(1)
+        dam.create_model()
+        dam.solve()
+
+        for co in dam.complexOrders:
+            if co.complex_id == 1:
+                self.assertAlmostEqual(co.acceptance, 0, 5)
+            elif co.complex_id == 2:
+                self.assertAlmostEqual(co.acceptance, 1, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from itertools import product
+
+from pyomo.opt import SolverFactory
+
+import openDAM.conf.options as options
+from openDAM.model.Line import Line
+from openDAM.model.Network import Network
+from openDAM.test.fixtures import ring_day
+from openDAM.test.testWindowSearch import highs_available
+
+
+class BaselineNetwork(Network):
+    """
+    Network giving the paths of the market split constraints as PUN_DAM enumerated them before the Network class: a
+    scan of the 4-permutations of the middle zones, which yields no path with less than 4 middle zones available, and
+    skips the longer paths of a permutation whose shorter path was already seen.
+    """
+
+    def paths(self, source, target, period, via, max_edges=5):
+        def connected(path):
+            return all(self.capacity(a, b, period) > 0 for a, b in zip(path[:-1], path[1:]))
+
+        paths = []
+        processed = set()
+        for middle_zones in set(z for z in product(via, via, via, via) if len(set(z)) == 4):
+            for n in range(1, 5):
+                path = (source,) + middle_zones[:n] + (target,)
+                if connected(path) or connected(path[::-1]):
+                    if path in processed:
+                        break
+                    processed.add(path)
+                    processed.add(path[::-1])
+                    paths.append(path)
+        return paths
+
+
+class NetworkCase(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Chain 1 -> 2 -> 3 -> 4 at period 1, plus a line 1 -> 4 that can only be used from 4 to 1.
+        """
+        self.network = Network([Line(1, 1, 2, {1: 10.0}, {1: 0.0}),
+                                Line(2, 2, 3, {1: 10.0}, {1: 0.0}),
+                                Line(3, 3, 4, {1: 10.0}, {1: 0.0}),
+                                Line(4, 1, 4, {1: 0.0}, {1: 5.0}),
+                                Line(5, 2, 1, {1: 99.0}, {1: 99.0})])
+
+    def test_capacities(self):
+        """
+        The first line between two zones defines the capacities in both directions.
+        """
+        self.assertEqual(self.network.capacity(1, 2, 1), 10.0)
+        self.assertEqual(self.network.capacity(2, 1, 1), 0.0)
+        self.assertEqual(self.network.capacity(4, 1, 1), 5.0)
+        self.assertEqual(self.network.capacity(1, 3, 1), 0)
+        self.assertEqual(self.network.successors(1), {1: [2], 2: [3], 3: [4], 4: [1]})
+
+    def test_paths(self):
+        """
+        Paths must follow the capacities, all in the forward or all in the reverse direction.
+        """
+        network = self.network
+        self.assertEqual(network.paths(1, 3, 1, frozenset([2, 4])), [(1, 2, 3), (1, 4, 3)])
+        self.assertEqual(network.paths(3, 1, 1, frozenset([2, 4])), [(3, 2, 1), (3, 4, 1)])
+        self.assertEqual(network.paths(1, 3, 1, frozenset([4])), [(1, 4, 3)])
+        self.assertEqual(network.paths(2, 4, 1, frozenset([1])), [(2, 1, 4)])
+        self.assertEqual(network.paths(2, 4, 1, frozenset()), [])
+        self.assertEqual(network.paths(1, 4, 1, frozenset([2, 3]), max_edges=2), [(1, 4)])
+        self.assertEqual(network.paths(1, 4, 1, frozenset([2, 3])), [(1, 4), (1, 2, 3, 4)])
+
+    def test_sparse(self):
+        """
+        Arcs are the ordered pairs of zones linked by a line, even without capacity, and each zone lists its lines.
+        """
+        network = self.network
+        self.assertEqual(network.arcs, [(1, 2), (1, 4), (2, 1), (2, 3), (3, 2), (3, 4), (4, 1), (4, 3)])
+        self.assertEqual(network.zone_arcs(set([1, 2, 4])), [(1, 2), (1, 4), (2, 1), (4, 1)])
+        self.assertEqual(network.incidence[1], [(1, 1), (4, 1), (5, -1)])
+        self.assertEqual(network.incidence[4], [(3, -1), (4, -1)])
+
+
+class MarketSplitCase(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = (options.SOLVER_NAME, options.SOLVER)
+
+    def tearDown(self):
+        options.SOLVER_NAME, options.SOLVER = self.settings
+
+    def test_baseline_paths(self):
+        """
+        The paths of the market split constraints include those of the baseline enumeration, and the longer paths it
+        skipped.
+        """
+        dam = ring_day()
+        via = frozenset([2, 3, 5, 6])
+        paths = dam.network.paths(1, 4, 1, via)
+        baseline = BaselineNetwork(dam.connections).paths(1, 4, 1, via)
+        self.assertTrue(set(baseline) < set(paths))
+        self.assertEqual(len(paths), 8)
+        self.assertEqual(BaselineNetwork(dam.connections).paths(1, 4, 1, frozenset([2, 3, 5])), [])
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_baseline_results(self):
+        """
+        The day clears as with the paths of the baseline enumeration.
+        """
+        options.SOLVER_NAME = 'appsi_highs'
+        options.SOLVER = SolverFactory('appsi_highs')
+        dams = []
+        for network in (None, BaselineNetwork):
+            dam = ring_day()
+            if network is not None:
+                dam.network = network(dam.connections)
+            dam.create_model()
+            dam.solve(strategy='Simple')
+            dams.append(dam)
+        dam, baseline = dams
+        self.assertAlmostEqual(dam.welfare, baseline.welfare, 4)
+        for zone in baseline.orders.prices:
+            self.assertAlmostEqual(dam.orders.prices[zone][1], baseline.orders.prices[zone][1], 4)
+        for bid, other in zip(dam.orders.bids, baseline.orders.bids):
+            self.assertAlmostEqual(bid.acceptance, other.acceptance, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
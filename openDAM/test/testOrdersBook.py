@@ -0,0 +1,71 @@
+import unittest
+
+from openDAM.model.OrdersBook import *
+from openDAM.model.StepCurve import StepCurve
+from openDAM.model.PunOrder import PunOrder
+
+
+class OrdersBookCase(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrdersBook()
+        self.book.extend(StepCurve(points=[(0.0, 10.0), (5.0, 10.0), (5.0, 20.0), (8.0, 20.0)], period=1,
+                                   location=1).collect())
+        self.book.extend(StepCurve(points=[(0.0, 40.0), (-4.0, 40.0)], period=2, location=2).collect())
+        self.book.append(BlockBid(1, volumes={1: 2.0, 2: 3.0}, price=15.0, location=1))
+        self.book.append(PunOrder(1, 2, 1, 1, 6.0, 50.0))
+
+    def test_columns(self):
+        """
+        Columns mirror the attributes of the bid objects, block bids store their total volume.
+        """
+        book = self.book
+        self.assertEqual(book.column('type').tolist(), ['SB', 'SB', 'SB', 'BB', 'PO'])
+        self.assertEqual(book.column('zone').tolist(), [1, 1, 2, 1, 2])
+        self.assertEqual(book.column('period').tolist(), [1, 1, 2, NO_PERIOD, 1])
+        self.assertEqual(book.column('volume').tolist(), [5.0, 3.0, -4.0, 5.0, 6.0])
+        self.assertEqual(book.column('block_offsets').tolist(), [0, 2])
+        self.assertEqual(book.column('block_volumes').tolist(), [2.0, 3.0])
+
+    def test_ids(self):
+        book = self.book
+        self.assertEqual(book.ids('SB').tolist(), [0, 1, 2])
+        self.assertEqual(book.ids('SB', 'SUPPLY').tolist(), [0, 1])
+        self.assertEqual(book.ids('SB', 'DEMAND').tolist(), [2])
+        self.assertEqual(book.ids('BB').tolist(), [3])
+        self.assertEqual(book.ids('PO').tolist(), [4])
+
+    def test_index(self):
+        """
+        Bids grouped by (zone, period), block bids appearing in each of their periods.
+        """
+        book = self.book
+        self.assertEqual(book.index('SB', 'SUPPLY'), {(1, 1): [0, 1]})
+        self.assertEqual(book.index('SB', 'DEMAND'), {(2, 2): [2]})
+        self.assertEqual(book.index('BB'), {(1, 1): [3], (1, 2): [3]})
+        self.assertEqual(book.index('PO', by=('period',)), {1: [4]})
+
+    def test_invalidation(self):
+        """
+        Appending a bid rebuilds the columns, acceptances are written through to the bid objects.
+        """
+        book = self.book
+        book.set_acceptance(0, 0.5)
+        self.assertEqual(book.column('acceptance')[0], 0.5)
+        book.set_acceptance(1, 1.0)
+        self.assertEqual(book.bids[1].acceptance, 1.0)
+        self.assertEqual(book.column('acceptance')[1], 1.0)
+
+        book.extend(StepCurve(points=[(0.0, 5.0), (1.0, 5.0)], period=2, location=1).collect())
+        self.assertEqual(book.ids('SB', 'SUPPLY').tolist(), [0, 1, 5])
+
+    def test_complex_ids(self):
+        book = self.book
+        book.register_complex([0, 1])
+        book.register_complex([2])
+        self.assertEqual(book.complex_ids(0), [0, 1])
+        self.assertEqual(book.complex_ids(1), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import openDAM.conf.options as options
+from openDAM.dataio.dam_results_csv import CSV_writer, repair, results_lines, FILE_NAMES, HEADERS
+from openDAM.test.fixtures import complex_day
+
+
+def day_lines(day):
+    return dict(welfare=['%d,1.0,2.00,0,0, 0.00\n' % day], prices=['%d,1,NORD,1,50.0,1.0,1.0\n' % day],
+                pun=['%d,1,0.5\n' % day, '%d,2,0.0\n' % day])
+
+
+class ResultsCSVCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self, writer, name):
+        with open('%s/%s' % (writer.path, FILE_NAMES[name])) as f:
+            return f.read()
+
+    def test_flush_days(self):
+        """
+        The results are written every flush_days days, and when the files are closed.
+        """
+        writer = CSV_writer(self.path, flush_days=2)
+        self.assertEqual(self.read(writer, 'pun'), HEADERS['pun'])
+        writer.write(day_lines(1))
+        self.assertEqual(self.read(writer, 'welfare'), HEADERS['welfare'])
+        writer.write(day_lines(2))
+        self.assertEqual(self.read(writer, 'pun'), HEADERS['pun'] + '1,1,0.5\n1,2,0.0\n2,1,0.5\n2,2,0.0\n')
+        writer.write(day_lines(3))
+        writer.close_files()
+        writer.close_files()
+        self.assertEqual(self.read(writer, 'welfare').count('\n'), 4)
+
+    def test_repair(self):
+        """
+        The days missing from the welfare file, written last, and the truncated lines are removed.
+        """
+        with CSV_writer(self.path) as writer:
+            writer.write(day_lines(1))
+        with open('%s/%s' % (writer.path, FILE_NAMES['pun']), 'a') as f:
+            f.write('2,1,0.5\n2,2,0.')
+        with open('%s/%s' % (writer.path, FILE_NAMES['welfare']), 'a') as f:
+            f.write('2,1.0,2.0')
+
+        self.assertEqual(repair(writer.path), set([1]))
+        self.assertEqual(self.read(writer, 'pun'), HEADERS['pun'] + '1,1,0.5\n1,2,0.0\n')
+        self.assertEqual(self.read(writer, 'welfare'), HEADERS['welfare'] + day_lines(1)['welfare'][0])
+        self.assertFalse([f for f in os.listdir(writer.path) if f.endswith('.tmp')])
+
+    def test_complex_welfare(self):
+        """
+        The welfare line of a complex day has no expansion and a missing gap, which COMPLEX_DAM does not report.
+        """
+        backend = options.BACKEND
+        options.BACKEND = 'matrix'
+        try:
+            dam = complex_day()
+            dam.create_model()
+            dam.solve()
+        finally:
+            options.BACKEND = backend
+        line = results_lines(dam)['welfare'][0]
+        self.assertTrue(line.startswith('20180110,%f,' % dam.welfare))
+        self.assertTrue(line.endswith(',0,0, nan\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import pandas
+
+from openDAM.dataio.dam_results_db import SQLiteResultsWriter, ParquetResultsWriter, RESULTS_TABLES, \
+    compare_real_prices, results_frame
+
+try:
+    import pyarrow
+    PARQUET = True
+except ImportError:
+    try:
+        import fastparquet
+        PARQUET = True
+    except ImportError:
+        PARQUET = False
+
+
+def day_rows(day):
+    rows = dict((table, []) for table in RESULTS_TABLES)
+    rows['RESULTS_DAYS'].append((day, 'PUN', 100.0, 1.5, 12, None, 0.0, None))
+    rows['RESULTS_PRICES'].extend([(day, 1, u'NORD', 1, 50.0, 10.0, -10.0), (day, 1, u'NORD', 2, 45.0, 8.0, -8.0),
+                                   (day, 0, u'PUN', 1, 52.0, 0.0, -3.0)])
+    rows['RESULTS_PUN'].append((day, 7, 3.0))
+    return rows
+
+
+class ResultsDBCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_sqlite(self):
+        """
+        The rows of a day are stored in typed columns, and replace those of the same run and day.
+        """
+        db_file = '%s/results.sqlite3' % self.path
+        with SQLiteResultsWriter(db_file, 'run') as writer:
+            writer.write(day_rows(20180110))
+            writer.write(day_rows(20180110))
+            writer.write(day_rows(20180111))
+        conn = sqlite3.connect(db_file)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM RESULTS_PRICES").fetchone()[0], 6)
+        self.assertEqual(conn.execute("SELECT typeof(PERIOD), typeof(PRICE) FROM RESULTS_PRICES").fetchone(),
+                         ('integer', 'real'))
+        self.assertEqual(conn.execute("SELECT * FROM RESULTS_PUN WHERE DAY_ID=20180111").fetchall(),
+                         [('run', 20180111, 7, 3.0)])
+
+    def test_compare_real_prices(self):
+        """
+        The computed prices are joined with the wide REAL_PRICES table of the GME importer.
+        """
+        db_file = '%s/results.sqlite3' % self.path
+        with SQLiteResultsWriter(db_file, 'run') as writer:
+            writer.write(day_rows(20180110))
+        conn = sqlite3.connect(db_file)
+        pandas.DataFrame(dict(DAY_ID=['20180110', '20180110'], Period=[1, 2], NORD=[49.0, 44.0], SUD=[1.0, 2.0],
+                              PUN=[51.0, 50.0])).to_sql('REAL_PRICES', conn)
+        prices = compare_real_prices(conn, 'run').sort_values(['ZONE_NAME', 'PERIOD'])
+        self.assertEqual(prices['ZONE_NAME'].tolist(), [u'NORD', u'NORD', u'PUN'])
+        self.assertEqual(prices['REAL_PRICE'].tolist(), [49.0, 44.0, 51.0])
+
+    def test_results_frame(self):
+        """
+        Integer columns with missing values are kept as floats.
+        """
+        df = results_frame('RESULTS_DAYS', day_rows(1)['RESULTS_DAYS'])
+        self.assertEqual(df['NBIN'].dtype, 'int64')
+        self.assertEqual(df['EXPANSION'].dtype, 'object')
+
+    @unittest.skipIf(not PARQUET, 'pyarrow or fastparquet is required')
+    def test_parquet(self):
+        """
+        The days are stored in partitions that are read back as one table.
+        """
+        writer = ParquetResultsWriter(self.path, 'run')
+        writer.write(day_rows(20180110))
+        writer.write(day_rows(20180111))
+        prices = pandas.read_parquet('%s/RESULTS_PRICES' % self.path)
+        self.assertEqual(len(prices), 6)
+        self.assertEqual(sorted(set(prices['DAY_ID'].astype(int))), [20180110, 20180111])
+
+    @unittest.skipIf(not PARQUET, 'pyarrow or fastparquet is required')
+    def test_parquet_rewrite(self):
+        """
+        Rewriting a day without rows in a table removes the rows of the previous write from that table.
+        """
+        writer = ParquetResultsWriter(self.path, 'run')
+        writer.write(day_rows(20180110))
+        writer.write(day_rows(20180111))
+        rows = day_rows(20180111)
+        rows['RESULTS_PUN'] = []
+        writer.write(rows)
+        pun = pandas.read_parquet('%s/RESULTS_PUN' % self.path)
+        self.assertEqual(pun['DAY_ID'].astype(int).tolist(), [20180110])
+        self.assertEqual(len(pandas.read_parquet('%s/RESULTS_PRICES' % self.path)), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
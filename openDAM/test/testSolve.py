@@ -0,0 +1,164 @@
+import unittest
+
+from pyomo.core.base import maximize
+from pyomo.opt import SolverFactory, SolverResults, TerminationCondition
+
+import openDAM.conf.options as options
+from openDAM.model import dam as dam_module
+from openDAM.test.fixtures import complex_day, mic_order, pun_day
+from openDAM.test.testWindowSearch import highs_available
+
+
+def results(condition, incumbent=None):
+    """
+    :return: Pyomo results of a solve of a maximization problem, as reported by the APPSI solvers.
+    """
+    results = SolverResults()
+    results.solver.termination_condition = condition
+    results.problem.sense = maximize
+    results.problem.lower_bound = incumbent
+    return results
+
+
+def mic_day():
+    return complex_day(complex_orders=[mic_order(1, 1, 12.0, 400.0), mic_order(2, 3, 20.0, 100.0)])
+
+
+class SolveCase(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = (options.SOLVER_NAME, options.SOLVER, options.BACKEND, options.PUN_WINDOW_SEARCH)
+
+    def tearDown(self):
+        options.SOLVER_NAME, options.SOLVER, options.BACKEND, options.PUN_WINDOW_SEARCH = self.settings
+
+    @staticmethod
+    def use_solver(name):
+        options.SOLVER_NAME = name
+        options.SOLVER = SolverFactory(name)
+
+    def test_has_solution(self):
+        """
+        A solution is loaded by an optimal solve, or by a solve stopped by a limit after a feasible solution was
+        found.
+        """
+        dam = pun_day()
+        dam.create_model()
+        self.assertFalse(dam.has_solution())
+        self.assertTrue(dam.has_solution(results(TerminationCondition.optimal, 120.0)))
+        self.assertTrue(dam.has_solution(results(TerminationCondition.maxTimeLimit, 120.0)))
+        self.assertTrue(dam.has_solution(results(TerminationCondition.feasible, 120.0)))
+        self.assertFalse(dam.has_solution(results(TerminationCondition.maxTimeLimit)))
+        self.assertFalse(dam.has_solution(results(TerminationCondition.maxTimeLimit, float('-inf'))))
+        self.assertFalse(dam.has_solution(results(TerminationCondition.infeasible, 120.0)))
+
+    def test_price_order(self):
+        """
+        The PUN orders of a lower price than the previous ones are ordered after them, the last order of a period
+        included.
+        """
+        dam = pun_day(pun_prices=(100.0, 100.0, 50.0))
+        dam.create_model()
+        self.assertEqual(len(dam.model.price_order), 2)
+
+    def test_persistent_solver_unavailable(self):
+        """
+        A persistent solver that is not available is only looked for once.
+        """
+        name = options.PERSISTENT_SOLVERS['cplex']
+        if SolverFactory(name).available(exception_flag=False):
+            self.skipTest('%s is available' % name)
+        options.SOLVER_NAME = 'cplex'
+        dam = mic_day()
+        dam.create_model()
+        dam_module.UNAVAILABLE_PERSISTENT_SOLVERS.discard(name)
+        self.assertIsNone(dam.persistent_solver())
+        self.assertIn(name, dam_module.UNAVAILABLE_PERSISTENT_SOLVERS)
+        self.assertIsNone(dam.persistent_solver())
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_resolve(self):
+        """
+        Each resolution of a model with other fixed complex orders gives the solution of a new model solved with
+        them.
+        """
+        self.use_solver('cplex' if SolverFactory('cplex_persistent').available(exception_flag=False) else
+                        'appsi_highs')
+        options.BACKEND = 'pyomo'
+        dam = mic_day()
+        dam.create_model()
+        for fixed in [{}, {1: 0}, {1: 0, 2: 1}, {}]:
+            dam.resolve(fixedComplexOrders=fixed)
+            fresh = mic_day()
+            fresh.create_model()
+            fresh.solve(fixedComplexOrders=fixed)
+            self.assertAlmostEqual(dam.welfare, fresh.welfare, 4)
+            for order, other in zip(dam.complexOrders, fresh.complexOrders):
+                self.assertAlmostEqual(order.acceptance, other.acceptance, 5)
+                for v, w in zip(order.volumes, other.volumes):
+                    self.assertAlmostEqual(v, w, 4)
+        self.assertIsNot(dam.solver, None)
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_relaxed_prices(self):
+        """
+        The solution of the model with PUN relaxed gives the PUN prices without being stored in the order book, and
+        the Advanced strategy clears the day as the Simple one.
+        """
+        self.use_solver('appsi_highs')
+        dam = pun_day()
+        dam.create_model(relax_PUN=True)
+        self.assertTrue(dam.has_solution(dam.solve_model(False)))
+        prices = dam.relaxed_pun_prices()
+        self.assertEqual(sorted(prices), [1, 2])
+        self.assertIsNone(dam.orders.prices)
+        self.assertEqual(set(bid.acceptance for bid in dam.orders.bids), set([None]))
+
+        options.PUN_WINDOW_SEARCH = 1
+        simple = pun_day()
+        simple.create_model()
+        simple.solve(strategy='Simple')
+        dam = pun_day()
+        dam.create_model()
+        dam.solve(strategy='Advanced')
+        self.assertAlmostEqual(dam.welfare, simple.welfare, 4)
+        for bid, other in zip(dam.orders.bids, simple.orders.bids):
+            self.assertAlmostEqual(bid.acceptance, other.acceptance, 4)
+
+    def test_fix_complex_orders(self):
+        """
+        Only the complex orders whose fixing changed are returned, to be updated in the persistent solver.
+        """
+        options.BACKEND = 'pyomo'
+        dam = mic_day()
+        dam.create_model()
+        self.assertEqual(dam._fix_complex_orders({}), [])
+        self.assertEqual(dam._fix_complex_orders({1: 0}), [1])
+        self.assertEqual(dam._fix_complex_orders({1: 0}), [])
+        self.assertEqual(sorted(dam._fix_complex_orders({1: 1, 2: 0})), [1, 2])
+        self.assertEqual(dam._fix_complex_orders({2: 0}), [1])
+        self.assertFalse(dam.model.xc[1].fixed)
+        self.assertEqual((dam.model.xc[2].fixed, dam.model.xc[2].value), (True, 0))
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_timings(self):
+        """
+        The timings hold the phases of the last resolution of the model.
+        """
+        self.use_solver('appsi_highs')
+        options.BACKEND = 'pyomo'
+        dam = mic_day()
+        dam.create_model()
+        self.assertEqual(list(dam.timings), ['build'])
+        dam.solve()
+        self.assertEqual(set(dam.timings), {'build', 'solve', 'load'})
+        dam.resolve(fixedComplexOrders={1: 0})
+        phases = {'build', 'solve', 'load'} | ({'write'} if dam.solver else set())
+        self.assertEqual(set(dam.timings), phases)
+        self.assertTrue(all(t >= 0.0 for t in dam.timings.values()))
+        dam.create_model()
+        self.assertEqual(list(dam.timings), ['build'])
+
+
+if __name__ == '__main__':
+    unittest.main()
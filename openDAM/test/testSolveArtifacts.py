@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyomo.core.base import Var
+from pyomo.opt import SolverFactory
+
+import openDAM.conf.options as options
+from openDAM.dataio.solve_artifacts import ArtifactCache, model_key, solver_key
+from openDAM.test.fixtures import pun_day
+from openDAM.test.testWindowSearch import highs_available
+
+
+class SolveArtifactsCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.path)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.path)
+
+    def test_model_key(self):
+        """
+        The key only depends on the content of the day and on the model options.
+        """
+        key = model_key(pun_day())
+        self.assertEqual(model_key(pun_day()), key)
+        self.assertNotEqual(model_key(pun_day(price=45.0)), key)
+        eps = options.EPS
+        try:
+            options.EPS = 1e-5
+            self.assertNotEqual(ArtifactCache('cache', pun_day()).key, key)
+        finally:
+            options.EPS = eps
+
+    def test_solver_key(self):
+        """
+        Solutions are keyed by the solver settings, which are not part of the key of the model.
+        """
+        key = solver_key()
+        gap = options.MATRIX_SOLVER_OPTIONS['mip_rel_gap']
+        try:
+            options.MATRIX_SOLVER_OPTIONS['mip_rel_gap'] = 1e-3
+            self.assertNotEqual(solver_key(), key)
+        finally:
+            options.MATRIX_SOLVER_OPTIONS['mip_rel_gap'] = gap
+        self.assertEqual(solver_key(), key)
+
+    def test_prices(self):
+        cache = ArtifactCache('cache', pun_day())
+        self.assertIsNone(cache.load_prices('relaxed_prices'))
+        cache.save_prices('relaxed_prices', {1: 52.5, 2: 60.0})
+        self.assertEqual(ArtifactCache('cache', pun_day()).load_prices('relaxed_prices'), {1: 52.5, 2: 60.0})
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_values(self):
+        """
+        The values of the variables are loaded back into a new model of the same day, with the scalars.
+        """
+        dam = pun_day()
+        dam.create_model()
+        for i, v in enumerate(dam.model.pi.values()):
+            v.value = 10.0 * i
+        cache = ArtifactCache('cache', dam)
+        cache.save_values(dam.model, 'incumbent', absolute_gap=0.5)
+
+        other = pun_day()
+        other.create_model()
+        self.assertEqual(cache.load_values(other.model, 'incumbent'), {'absolute_gap': 0.5})
+        self.assertEqual([v.value for v in other.model.pi.values()], [10.0 * i for i in range(len(other.model.pi))])
+        self.assertIsNone(other.model.dkpi[other.model.punBids.first()].value)
+
+    def test_export_model(self):
+        """
+        The LP file is written once in the cache, and copied by the next exports of the same model.
+        """
+        options.ARTIFACT_CACHE = 'cache'
+        try:
+            dam = pun_day()
+            dam.create_model()
+            dam.exportModel()
+            self.assertEqual(dam.artifacts.misses, 1)
+            with open('damClearing.lp') as f:
+                lp = f.read()
+            os.remove('damClearing.lp')
+
+            other = pun_day()
+            other.create_model()
+            other.exportModel('day.lp')
+            self.assertEqual(other.artifacts.hits, 1)
+            with open('day.lp') as f:
+                self.assertEqual(f.read(), lp)
+        finally:
+            options.ARTIFACT_CACHE = None
+
+    def test_cached_solution(self):
+        """
+        A day whose solution is in the cache for the same solver settings and strategy is not solved again.
+        """
+        options.ARTIFACT_CACHE = 'cache'
+        try:
+            dam = pun_day()
+            dam.create_model()
+            for v in dam.model.component_data_objects(Var):
+                v.value = 0.0
+            for t in dam.model.periods:
+                dam.model.pi[t].value = 50.0 + t
+            dam.artifact_cache().save_values(dam.model, 'solution_Simple_%s' % solver_key(), absolute_gap=0.0,
+                                             t_solve=2.5)
+
+            other = pun_day()
+            other.create_model()
+            other.solve(strategy='Simple')
+            self.assertEqual(other.t_solve, 2.5)
+            self.assertEqual(other.absolute_gap, 0.0)
+            self.assertEqual(other.prices(0), {1: 51.0, 2: 52.0})
+        finally:
+            options.ARTIFACT_CACHE = None
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_saved_solution(self):
+        """
+        The solution of a solver that only loads it in the variables, e.g. appsi_highs, is saved in the cache.
+        """
+        settings = (options.SOLVER_NAME, options.SOLVER)
+        options.ARTIFACT_CACHE = 'cache'
+        try:
+            options.SOLVER_NAME = 'appsi_highs'
+            options.SOLVER = SolverFactory('appsi_highs')
+            dam = pun_day()
+            dam.create_model()
+            dam.solve(strategy='Simple')
+            self.assertEqual(len(dam.model.solutions), 0)
+
+            other = pun_day()
+            other.create_model()
+            self.assertIsNotNone(other.artifact_cache().load_values(other.model, 'solution_Simple_%s' % solver_key()))
+            other.solve(strategy='Simple')
+            self.assertEqual(other.t_solve, dam.t_solve)
+            self.assertEqual(other.prices(0), dam.prices(0))
+        finally:
+            options.ARTIFACT_CACHE = None
+            options.SOLVER_NAME, options.SOLVER = settings
+
+
+if __name__ == '__main__':
+    unittest.main()
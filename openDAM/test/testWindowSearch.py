@@ -0,0 +1,76 @@
+import unittest
+
+from pyomo.opt import SolverFactory
+import pyomo.environ  # Registers the solvers
+
+import openDAM.conf.options as options
+from openDAM.test.fixtures import pun_day
+
+CENTRE = {1: [100.0 / 3, 50.0], 2: [100.0 / 3, 50.0]}
+
+
+def highs_available():
+    solver = SolverFactory('appsi_highs')
+    return solver is not None and solver.available(exception_flag=False)
+
+
+class WindowSearchCase(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = (options.SOLVER_NAME, options.SOLVER, options.PUN_WINDOW_SEARCH, options.PUN_WINDOW_CANDIDATES,
+                         options.PUN_WINDOW_ROUNDS)
+
+    def tearDown(self):
+        (options.SOLVER_NAME, options.SOLVER, options.PUN_WINDOW_SEARCH, options.PUN_WINDOW_CANDIDATES,
+         options.PUN_WINDOW_ROUNDS) = self.settings
+
+    def test_candidates(self):
+        """
+        Windows are aligned on the prices of the PUN orders, 100, 50 and 33.3 in each period, and the price cap.
+        """
+        dam = pun_day()
+        self.assertEqual(dam.window_candidates({1: 40.0, 2: 40.0}, 0, 4), [
+            CENTRE, {1: [0, 100.0 / 3], 2: [0, 100.0 / 3]}, {1: [50.0, 100.0], 2: [50.0, 100.0]},
+            {1: [100.0, 3000], 2: [100.0, 3000]}])
+        self.assertEqual(dam.window_candidates({1: 40.0, 2: 40.0}, 1, 4), [
+            {1: [0, 100.0], 2: [0, 100.0]}, {1: [100.0 / 3, 3000], 2: [100.0 / 3, 3000]}])
+
+        # A window shifted out of the price range is moved back into it.
+        self.assertEqual(dam.window_candidates({1: 50.0, 2: 20.0}, 0, 2), [
+            {1: [50.0, 50.0], 2: [0, 100.0 / 3]}, {1: [100.0 / 3, 100.0 / 3], 2: [0, 100.0 / 3]}])
+
+    def test_hit_rates(self):
+        dam = pun_day()
+        dam.windows = [(CENTRE, 10.0), ({1: [0, 100.0 / 3], 2: [0, 100.0 / 3]}, 9.0),
+                       ({1: [50.0, 100.0], 2: [0, 100.0 / 3]}, None)]
+        dam.window_report = {'windows': 3, 'solved': 2, 'best': CENTRE}
+        dam.orders.prices = {0: {1: 40.0, 2: 20.0}}
+        dam.window_hit_rates()
+        self.assertEqual(dam.window_report['hit_rate'], {1: 1.0 / 3, 2: 2.0 / 3})
+        self.assertFalse(dam.window_report['best_hit'])
+
+    @unittest.skipUnless(highs_available(), "HiGHS is not available")
+    def test_search(self):
+        """
+        The best incumbent of the windows is loaded in the model, whether they are solved in this process or in
+        worker processes.
+        """
+        options.SOLVER_NAME = 'appsi_highs'
+        options.SOLVER = SolverFactory('appsi_highs')
+        options.PUN_WINDOW_CANDIDATES = 2
+        options.PUN_WINDOW_ROUNDS = 1
+        for workers in (1, 2):
+            options.PUN_WINDOW_SEARCH = workers
+            dam = pun_day()
+            dam.create_model()
+            self.assertTrue(dam.window_search({1: 40.0, 2: 40.0}))
+            self.assertEqual(dam.window_report['windows'], 2)
+            self.assertEqual(dam.window_report['solved'], 2)
+            self.assertEqual(dam.window_report['best'], CENTRE)
+            for t in (1, 2):
+                self.assertTrue(100.0 / 3 <= dam.model.pi[t].value <= 50.0)
+            self.assertIn('window_search', dam.timings)
+
+
+if __name__ == '__main__':
+    unittest.main()